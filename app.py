@@ -1,8 +1,9 @@
-import chess
-import chess.svg
+from functools import partial
+
 import streamlit as st
 import streamlit_antd_components as sac
 
+from engine_analysis import display_engine_analysis, get_analysis_pool, upcoming_positions
 from utils import *
 
 
@@ -10,7 +11,21 @@ def main():
     
     st.set_page_config(page_title='Interactive Chess Board', layout='wide')
     st.title('Interactive Chess Board Visualisation')
-    game_data = load_data()
+    # With CHESS_PROFILE=1, every rerun is timed stage by stage and shown in a sidebar debug panel
+    start_profile()
+    # With CHESS_DATASET_DIR set, games are streamed from a partitioned dataset instead of held in memory
+    streaming = DATASET_DIR is not None
+    with profile_stage('load'):
+        if streaming:
+            game_data = None
+            # The dataset is fingerprinted once per rerun, and its version passed to every streamed view
+            data_version = dataset_dir_version(DATASET_DIR)
+            filter_index = get_streaming_cube(DATASET_DIR, data_version)
+        else:
+            game_data = load_data()
+            filter_index = get_filter_index(game_data)
+            data_version = game_data.attrs.get('version')
+            prewarm_board_svgs(game_data, game_data.attrs.get('version'))
     category_descriptions = {
         'Rapid': '10-60 minutes per player; balances deep strategic thinking with time pressure.',
         'Blitz': '3-10 minutes per player; emphasizes quick thinking and immediate decision-making.',
@@ -18,7 +33,7 @@ def main():
     }
 
     st.sidebar.markdown('<h2 style="font-weight: bold; font-size: 25px; color : #9C7A97;">Plot Filters</h3>', unsafe_allow_html=True)
-    category = st.sidebar.selectbox('Select Time Control Category', game_data['time_control_category'].unique())
+    category = st.sidebar.selectbox('Select Time Control Category', filter_index['categories'])
     if category in category_descriptions:
         description_html = f'<p style="font-style: italic; font-size: 10px;">{category_descriptions[category]}</p>'
         st.sidebar.markdown(description_html, unsafe_allow_html=True)
@@ -27,21 +42,27 @@ def main():
     description_timeInc = f'<p style="font-style: italic; font-size: 10px;">Time increment adds extra seconds per move </p>'
     st.sidebar.markdown(description_timeInc, unsafe_allow_html=True)
     
-    if enable_selectbox:
-        # Define the specific increments you want to include
-        specific_increments = [1, 2, 5, 10, 15,20, 30]
-        # Filter the unique increments to include only the specified values
-        increments_filtered = [increment for increment in game_data['increment'].unique() if increment in specific_increments]
-        # Sort the filtered increments before displaying them
-        sorted_increments = sorted(increments_filtered)
-
     time_increment = None
     if enable_selectbox:
+        # Define the specific increments you want to include
         specific_increments = [1, 2, 5, 10, 15, 20, 30]
-        increments_filtered = [increment for increment in game_data['increment'].unique() if increment in specific_increments]
-        time_increment = st.sidebar.selectbox('Select Time Increment', sorted(increments_filtered))
+        # Filter the indexed increments (already sorted) to include only the specified values
+        increments_filtered = [increment for increment in filter_index['increments'] if increment in specific_increments]
+        time_increment = st.sidebar.selectbox('Select Time Increment', increments_filtered)
     include_rating = st.sidebar.checkbox("Include rating?")
-    rating = st.sidebar.slider('Select The Rating Range', min_value=0, max_value=game_data['white_rating'].max(), step=100, value=(0, game_data['white_rating'].max()), disabled=not include_rating)
+    rating = st.sidebar.slider('Select The Rating Range', min_value=0, max_value=filter_index['max_rating'], step=100, value=(0, filter_index['max_rating']), disabled=not include_rating)
+    is_rated = None if filter_rated_plot == "All" else filter_rated_plot == "Rated"
+    increment_filter = time_increment if enable_selectbox and time_increment else None
+    rating_filter = tuple(rating) if include_rating else None
+    # Rating windows are counted on prefix-summed rating histograms, whatever the size of the dataset
+    with profile_stage('rating_window'):
+        if streaming:
+            rating_histograms = get_streamed_rating_histograms(DATASET_DIR, increment_filter, data_version)
+        else:
+            rating_histograms = get_rating_histograms(game_data, increment_filter)
+        if include_rating:
+            window_games = int(rating_window_results(rating_histograms, category, is_rated, rating_filter).sum())
+            st.sidebar.caption(f'{window_games:,} games have a player rated in this range')
     st.sidebar.markdown('<h2 style="font-weight: bold; font-size: 20px; color: #7EA2AA;">Additional Filters</h3>', unsafe_allow_html=True)
     st.sidebar.markdown('<h2 style="font-style: italic; font-size: 10px;">These additinal filters control the list of games in the chess board tab</h3>', unsafe_allow_html=True)
     filter_winner = st.sidebar.selectbox("Filter Games by Winner", ["All", "White", "Black"], key="winner_filter")
@@ -49,37 +70,34 @@ def main():
 
 
 
-    # Apply filters to the data
-    filtered_data = game_data[game_data['time_control_category'] == category]
-    if filter_rated_plot != "All":
-        is_rated = filter_rated_plot == "Rated"
-        filtered_data = filtered_data[filtered_data['rated'] == is_rated]
-
-    if enable_selectbox and time_increment:
-        filtered_data = filtered_data[filtered_data['increment'] == time_increment]
-
-    if include_rating:
-        lower, upper = rating
-        filtered_data = filtered_data[(filtered_data['white_rating'].between(lower, upper)) |
-                                    (filtered_data['black_rating'].between(lower, upper))]
+    # Roll up the opening statistics for the selected filters
+    with profile_stage('filters'):
+        if streaming:
+            filtered_stats = stream_opening_stats(DATASET_DIR, category, is_rated, increment_filter, rating_filter, data_version)
+        else:
+            filtered_stats = opening_stats(game_data, category, is_rated, increment_filter, rating_filter)
         
     tab1, tab2 = st.tabs(["Statistical Plots", "Opening Details & Chess Board Display"])
     
-    with tab1:
+    with tab1, profile_stage('statistical_plots'):
         st.session_state.active_tab = "tab1"
+        # Figures are shared by every session that picks the same filters
+        figures = None if filtered_stats.empty else statistics_figures(filtered_stats, data_version, category, is_rated, increment_filter, rating_filter)
+        if filtered_stats.empty:
+            st.sidebar.write("No data available for the selected category.")
         col1, col2 = st.columns(2)
         with col1:
             # Check if there is data to plot
-            if not filtered_data.empty:
-                fig3, most_played = plot_most_played_openings(filtered_data)
+            if not filtered_stats.empty:
+                fig3, most_played = figures['most_played'], figures['most_played_openings']
                 if fig3:
-                    st.plotly_chart(fig3, use_container_width=True)
+                    display_figure(fig3)
                 else:
                     st.write("No plot available with these filters.")
 
-                fig2 = plot_top_openings(filtered_data)
+                fig2 = figures['top_openings']
                 if fig2:
-                    st.plotly_chart(fig2, use_container_width=True)
+                    display_figure(fig2)
                 else:
                     st.write("No plot available with these filters.")
             else:
@@ -87,33 +105,65 @@ def main():
         
         with col2:
             # Check if there is data to plot
-            if not filtered_data.empty:
-                fig4 = plot_opening_vs_game_duration(filtered_data, most_played)
+            if not filtered_stats.empty:
+                fig4 = figures['duration']
                 if fig4:
-                    st.plotly_chart(fig4, use_container_width=True)
+                    display_figure(fig4)
                 else:
                     st.write("No plot available with these filters.")
 
-                fig1 = plot_winning_rates(filtered_data)
+                fig1 = figures['winning_rates']
                 if fig1:
-                    st.plotly_chart(fig1, use_container_width=True)
+                    display_figure(fig1)
                 else:
                     st.write("No plot available with these filters.")
             else:
                 st.write("No plot available with these filters.")
 
+        # Game-level charts are fed from the per-game move features, which need the in-memory dataset
+        if not streaming and not filtered_stats.empty:
+            feature_figures = game_figures(game_data, data_version, category, is_rated, increment_filter, rating_filter, tuple(most_played['Opening Name']))
+            col8, col9 = st.columns(2)
+            with col8:
+                fig5 = feature_figures['phases']
+                if fig5:
+                    display_figure(fig5)
+            with col9:
+                fig6 = feature_figures['castling']
+                if fig6:
+                    display_figure(fig6)
 
-            
-    with tab2:
+        # Rating charts are answered from the rating histograms, in both modes
+        if not filtered_stats.empty:
+            rating_charts = rating_figures(rating_histograms, data_version, category, is_rated, increment_filter, rating_filter)
+            col10, col11 = st.columns(2)
+            with col10:
+                fig7 = rating_charts['ratings']
+                if fig7:
+                    display_figure(fig7)
+            with col11:
+                fig8 = rating_charts['rating_gap']
+                if fig8:
+                    display_figure(fig8)
+
+
+    with tab2, profile_stage('opening_details'):
         col3, col4 = st.columns(2)
 
             
         with col4:
-            selected_opening = st.selectbox('Select an Opening to view details:', sorted(game_data['opening_name'].unique()))
-            opening_games = game_data[game_data['opening_name'] == selected_opening]
+            selected_opening = st.selectbox('Select an Opening to view details:', filter_index['openings'])
+            # The games of an opening are prepared on a background pool, along with those of the neighbouring openings
+            if streaming:
+                artifacts = get_opening_artifacts(data_version, partial(stream_opening_games, DATASET_DIR, limit=OPENING_GAMES_ROWS), selected_opening, filter_index['openings'])
+            else:
+                artifacts = get_opening_artifacts(data_version, partial(get_opening_games, game_data, limit=OPENING_GAMES_ROWS), selected_opening, filter_index['openings'])
+            opening_games = artifacts['games']
             # Display the filtered games
             display_data = opening_games[['id','rated', 'turns', 'white_rating', 'black_rating', 'winner', 'victory_status','time_control_category']].reset_index(drop=True)
-            moves = get_move_list(game_data, selected_opening)
+            if len(opening_games) == OPENING_GAMES_ROWS:
+                st.write(f"Only the first {OPENING_GAMES_ROWS} games of this opening are listed.")
+            moves = artifacts['moves']
             if 'selected_opening' not in st.session_state or st.session_state.selected_opening != selected_opening:
                 st.session_state['moves'] = moves
                 st.session_state['current_move_index'] = 0
@@ -122,7 +172,11 @@ def main():
             if 'current_move_index' not in st.session_state or st.session_state.selected_opening != selected_opening:
                 st.session_state.current_move_index = 0
                 st.session_state.selected_opening = selected_opening
-            display_opening_details(game_data, selected_opening)
+            # Opening summaries are served from the precomputed opening table, not from the games
+            opening_table = get_streamed_opening_table(DATASET_DIR, data_version) if streaming else get_opening_table(game_data)
+            summary = opening_summary(opening_table, data_version, selected_opening)
+            display_opening_details(summary['details'])
+            display_opening_rollups(summary['rollups'])
             sac.tabs([
                 sac.TabsItem(label='Opening move'),
                 sac.TabsItem(label='Winners Percentage'),
@@ -131,12 +185,12 @@ def main():
     
             if st.session_state['tabs'] is not None:
                     if st.session_state['tabs'] == 'Opening move':
-                        display_moves_list(game_data, selected_opening,game_data)
+                        display_moves_list(summary['move_pairs'])
                     if st.session_state['tabs'] == 'Time control':
-                        plot_time_control_cat(game_data, selected_opening)
+                        plot_time_control_cat(summary['time_control'], selected_opening)
                     if st.session_state.get('tabs') == 'Winners Percentage':
                         include_draws = st.checkbox('Include draws in the win rates', value=True)
-                        plot_winners_cat(include_draws, game_data, selected_opening)
+                        plot_winners_cat(include_draws, summary['winners'][include_draws], selected_opening)
                     if st.session_state.get('tabs') == 'List Of Games':
                         if not opening_games.empty:
 
@@ -168,7 +222,7 @@ def main():
                                 ]
                             else:
                                 rating_lower_bound = 0
-                                rating_upper_bound = game_data['white_rating'].max()
+                                rating_upper_bound = filter_index['max_rating']
                                 
                             if filtered_games.empty:
                                 st.write("No existing games match the selected filters.")
@@ -199,9 +253,13 @@ def main():
 
                                 
             game_ID = st.selectbox('Select the Game By ID', display_data['id'].unique())
-            game_moves = game_data[game_data['id'] == game_ID]['moves']
+            # Only the moves of the game being viewed are decoded
+            if streaming:
+                game_moves = decode_moves(opening_games[opening_games['id'] == game_ID])
+            else:
+                game_moves = decode_moves(get_game(game_data, game_ID))
             st.dataframe(game_moves, hide_index=True, width = 550)
-        with col3:
+        with col3, profile_stage('board'):
             coltemp1, col5, col6, col7, coltemp2 = st.columns([3, 5, 4, 5, 4]) #coltemp1 and coltemp2 are only for esthetic purpose
             current_move = st.session_state['moves'][st.session_state['current_move_index']]
             
@@ -220,15 +278,25 @@ def main():
             with col6:
                     st.write(current_move)
                     
-            if 'moves' in st.session_state:
-                    board, last_move = update_chess_board(st.session_state['moves'], st.session_state['current_move_index'])
-                    if last_move is not None:
-                            move_arrow = [chess.svg.Arrow(last_move.from_square, last_move.to_square, color="#D00000")]
-            else:
-                move_arrow = None
+            board, last_move = update_chess_board(st.session_state['moves'], st.session_state['current_move_index'])
+            move_arrow = last_move_arrows(last_move)
 
             chess_svg = display_chess_board(board, arrows=move_arrow)
             st.image(chess_svg, caption='Current Board', output_format='SVG', width=450)
+            # Engine searches run on a background pool; set CHESS_ENGINE to a UCI engine to enable them
+            analysis_pool = get_analysis_pool()
+            if analysis_pool is not None:
+                upcoming = upcoming_positions(st.session_state['moves'], st.session_state['current_move_index'])
+                display_engine_analysis(analysis_pool, board.fen(), upcoming)
+            if streaming:
+                st.write("Continuations and transpositions need the in-memory dataset.")
+            else:
+                st.markdown('<h2 style="font-style: italic; font-size: 15px;">Continuations played from this position</h3>', unsafe_allow_html=True)
+                display_continuations(get_opening_trie(game_data), st.session_state['moves'][:st.session_state['current_move_index'] + 1])
+                st.markdown('<h2 style="font-style: italic; font-size: 15px;">Games through this exact position</h3>', unsafe_allow_html=True)
+                display_transpositions(game_data, get_position_index(game_data), board)
+
+    display_profile_panel(finish_profile())
             
 
 
@@ -0,0 +1,414 @@
+"""
+Headless benchmark of the dashboard's data and rendering hot paths.
+
+Synthetic datasets with the games_revisited.csv schema are generated for each requested size, then
+loading, the sidebar filter chain, the tab-1 aggregations, board navigation and SVG rendering are
+timed outside of a Streamlit session. Latency percentiles and peak memory are written as JSON so
+runs can be compared over time.
+
+Usage:
+    python benchmark.py [--sizes 20000 1000000 10000000] [--repeat 20] [--output bench.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import threading
+import time
+import tracemalloc
+
+import chess
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.fragment import MemoryFragmentStorage
+from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+from streamlit.runtime.scriptrunner import ScriptRunContext, add_script_run_ctx
+from streamlit.runtime.state import SafeSessionState, SessionState
+
+import utils
+
+
+OPENINGS = [
+    ('Sicilian Defense', 'B20', ['e4', 'c5']),
+    ('French Defense', 'C00', ['e4', 'e6']),
+    ('Caro-Kann Defense', 'B10', ['e4', 'c6']),
+    ("Queen's Gambit", 'D06', ['d4', 'd5', 'c4']),
+    ('Italian Game', 'C50', ['e4', 'e5', 'Nf3', 'Nc6', 'Bc4']),
+    ('Ruy Lopez', 'C60', ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5']),
+    ('English Opening', 'A10', ['c4']),
+    ("King's Indian Defense", 'E60', ['d4', 'Nf6', 'c4', 'g6']),
+    ('Scandinavian Defense', 'B01', ['e4', 'd5']),
+    ('Van\'t Kruijs Opening', 'A00', ['e3'])
+]
+FILTER_COMBINATIONS = [
+    {'category': 'Blitz'},
+    {'category': 'Rapid', 'rated': True},
+    {'category': 'Bullet', 'rated': False, 'increment': 0},
+    {'category': 'Blitz', 'rating': (1200, 1800)},
+    {'category': 'Rapid', 'rated': True, 'increment': 5, 'rating': (1500, 2000)},
+    {'category': 'Blitz', 'rating': (1250, 1750)}
+]
+
+
+######################################################################################################
+##################################         DATASETS           ########################################
+
+def random_game_pool(size, seed):
+    """
+    Plays random legal games starting from the benchmark openings.
+
+    Parameters:
+        size (int): Number of games to play.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: 'moves', 'turns', 'opening_name', 'opening_eco' and 'opening_ply' of each game.
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(size):
+        name, eco, prefix = rng.choice(OPENINGS)
+        board = chess.Board()
+        moves = list(prefix)
+        for move in prefix:
+            board.push_san(move)
+        for _ in range(rng.randint(10, 100)):
+            if board.is_game_over():
+                break
+            move = rng.choice(list(board.legal_moves))
+            moves.append(board.san(move))
+            board.push(move)
+        games.append({'moves': ' '.join(moves), 'turns': len(moves), 'opening_name': name, 'opening_eco': eco, 'opening_ply': len(prefix)})
+    return pd.DataFrame(games)
+
+def synthetic_games(rows, seed=0, pool_size=2000):
+    """
+    Generates a synthetic games table with the games_revisited.csv schema.
+
+    Move lists are sampled from a pool of random legal games so that board replay works on them.
+
+    Parameters:
+        rows (int): Number of games.
+        seed (int): Seed of the random generators.
+        pool_size (int): Number of distinct legal games the move lists are sampled from.
+
+    Returns:
+        pd.DataFrame: The synthetic games.
+    """
+    rng = np.random.default_rng(seed)
+    pool = random_game_pool(pool_size, seed)
+    picks = rng.integers(0, len(pool), rows)
+    white_rating = rng.normal(1600, 300, rows).clip(700, 2800).astype(np.int64)
+    black_rating = rng.normal(1600, 300, rows).clip(700, 2800).astype(np.int64)
+    initial_time = rng.choice([1, 2, 3, 5, 8, 10, 15, 20, 30, 45], rows)
+    increment = rng.choice([0, 0, 0, 1, 2, 5, 10, 15, 30], rows)
+    created_at = pd.Timestamp('2017-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit='s')
+    return pd.DataFrame({
+        'id': [f'g{index:08d}' for index in range(rows)],
+        'rated': rng.random(rows) < 0.8,
+        'turns': pool['turns'].to_numpy()[picks],
+        'victory_status': rng.choice(['resign', 'mate', 'outoftime', 'draw'], rows, p=[0.55, 0.3, 0.1, 0.05]),
+        'winner': rng.choice(['white', 'black', 'draw'], rows, p=[0.5, 0.45, 0.05]),
+        'white_rating': white_rating,
+        'black_rating': black_rating,
+        'moves': pool['moves'].to_numpy()[picks],
+        'opening_eco': pool['opening_eco'].to_numpy()[picks],
+        'opening_name': pool['opening_name'].to_numpy()[picks],
+        'opening_ply': pool['opening_ply'].to_numpy()[picks],
+        'created_at_datetime': created_at.astype(str),
+        'last_move_at_datetime': (created_at + pd.to_timedelta(rng.integers(60, 3600, rows), unit='s')).astype(str),
+        'rating_diff': white_rating - black_rating,
+        'rating_diff_abs': np.abs(white_rating - black_rating),
+        'initial_time': initial_time,
+        'increment': increment,
+        'time_control_category': np.select([initial_time < 3, initial_time < 10, initial_time < 30], ['Bullet', 'Blitz', 'Rapid'], default='Other'),
+        'increment_boolean': increment != 0
+    })
+
+def dataset_path(workdir, rows, seed):
+    """
+    Returns the path of a synthetic dataset, generating it if it does not exist yet.
+
+    Parameters:
+        workdir (str): Directory holding the synthetic datasets.
+        rows (int): Number of games.
+        seed (int): Seed of the random generators.
+
+    Returns:
+        str: Path of the dataset CSV.
+    """
+    path = os.path.join(workdir, f'games_{rows}_{seed}.csv')
+    if not os.path.exists(path):
+        os.makedirs(workdir, exist_ok=True)
+        synthetic_games(rows, seed).to_csv(path, index=False)
+    return path
+
+
+######################################################################################################
+##################################         MEASUREMENT        ########################################
+
+def attach_script_run_context():
+    """
+    Attaches a Streamlit script run context to the current thread.
+
+    Streamlit caches are bypassed when no script is running, so without a context every cached
+    function would be measured cold. The context mirrors the one ScriptRunner creates for a session.
+    """
+    ctx = ScriptRunContext(
+        session_id='benchmark',
+        _enqueue=lambda message: None,
+        query_string='',
+        session_state=SafeSessionState(SessionState(), lambda: None),
+        uploaded_file_mgr=MemoryUploadedFileManager('/_stcore/upload_file'),
+        main_script_path=os.path.abspath(__file__),
+        page_script_hash='',
+        user_info={'email': None},
+        fragment_storage=MemoryFragmentStorage()
+    )
+    add_script_run_ctx(threading.current_thread(), ctx)
+
+def summarize(samples):
+    """
+    Summarizes latency samples.
+
+    Parameters:
+        samples (list of float): Latencies, in seconds.
+
+    Returns:
+        dict: Sample count, mean, p50, p90, p99 and max latencies, in milliseconds.
+    """
+    latencies = np.array(samples) * 1000
+    return {
+        'samples': len(latencies),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p90_ms': float(np.percentile(latencies, 90)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max())
+    }
+
+def measure(function, repeat, setup=None):
+    """
+    Times a function and measures the peak memory it allocates.
+
+    Timings are taken without tracing; peak memory is measured in one extra traced call.
+
+    Parameters:
+        function (callable): The code to measure, called without arguments.
+        repeat (int): Number of timed calls.
+        setup (callable, optional): Called before each call, outside of the measurement.
+
+    Returns:
+        dict: Latency summary and 'peak_memory_bytes'.
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {**summarize(samples), 'peak_memory_bytes': peak}
+
+
+######################################################################################################
+##################################         HOT PATHS          ########################################
+
+def mask_filter(data, category, rated=None, increment=None, rating=None):
+    """
+    Applies the sidebar filters with chained boolean masks, as app.main originally did.
+
+    Kept as the baseline the filter index is compared against.
+
+    Parameters:
+        data (pd.DataFrame): Game data.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+
+    Returns:
+        pd.DataFrame: The matching games.
+    """
+    filtered = data[data['time_control_category'] == category]
+    if rated is not None:
+        filtered = filtered[filtered['rated'] == rated]
+    if increment is not None:
+        filtered = filtered[filtered['increment'] == increment]
+    if rating is not None:
+        lower, upper = rating
+        filtered = filtered[filtered['white_rating'].between(lower, upper) | filtered['black_rating'].between(lower, upper)]
+    return filtered
+
+def build_figures(data, filters):
+    """
+    Builds the four tab-1 figures for a filter combination.
+
+    Parameters:
+        data (pd.DataFrame): Game data loaded with load_data.
+        filters (dict): Keyword arguments of opening_stats.
+    """
+    stats = utils.opening_stats(data, **filters)
+    if stats.empty:
+        return
+    _, most_played = utils.plot_most_played_openings(stats)
+    utils.plot_top_openings(stats)
+    utils.plot_winning_rates(stats, filters['category'])
+    utils.plot_opening_vs_game_duration(stats, most_played)
+
+def shared_figures(data, filters):
+    """
+    Fetches the tab-1 figures for a filter combination the way the app does, through the shared result cache.
+
+    Parameters:
+        data (pd.DataFrame): Game data loaded with load_data.
+        filters (dict): Keyword arguments of opening_stats.
+    """
+    stats = utils.opening_stats(data, **filters)
+    if not stats.empty:
+        utils.statistics_figures(stats, data.attrs.get('version'), filters['category'], filters.get('rated'), filters.get('increment'), filters.get('rating'))
+
+def rating_charts(histograms, filters):
+    """
+    Answers the rating distribution and rating difference charts for a filter combination from the rating histograms.
+
+    Parameters:
+        histograms (dict): Rating histograms of the dataset, see utils.get_rating_histograms.
+        filters (dict): Keyword arguments of opening_stats.
+    """
+    utils.rating_distribution(histograms, filters['category'], filters.get('rated'), filters.get('rating'))
+    utils.rating_gap_rates(histograms, filters['category'], filters.get('rated'), filters.get('rating'))
+
+def navigation_scripts(moves, seed):
+    """
+    Builds the move-index sequences replayed by the navigation benchmarks.
+
+    Parameters:
+        moves (list of str): Moves of the game navigated.
+        seed (int): Seed of the random jumps.
+
+    Returns:
+        dict: Script name -> list of move indexes.
+    """
+    rng = random.Random(seed)
+    last = len(moves) - 1
+    return {
+        'forward': list(range(last + 1)),
+        'backward': list(range(last, -1, -1)),
+        'random_jumps': [rng.randint(0, last) for _ in range(last + 1)]
+    }
+
+def bench_size(csv_path, repeat, seed):
+    """
+    Benchmarks every hot path on one dataset.
+
+    Parameters:
+        csv_path (str): Path of the dataset CSV.
+        repeat (int): Number of timed calls per measurement.
+        seed (int): Seed of the navigation scripts.
+
+    Returns:
+        dict: Measurement name -> latency and memory summary.
+    """
+    results = {}
+    parquet_path = utils.columnar_path(csv_path)
+
+    def cold_csv():
+        st.cache_resource.clear()
+        if os.path.exists(parquet_path):
+            os.remove(parquet_path)
+
+    results['load_data.csv'] = measure(lambda: utils.load_data(csv_path), max(1, repeat // 10), setup=cold_csv)
+    results['load_data.parquet'] = measure(lambda: utils.load_data(csv_path), max(1, repeat // 10), setup=st.cache_resource.clear)
+    results['load_data.cached'] = measure(lambda: utils.load_data(csv_path), repeat)
+    data = utils.load_data(csv_path)
+
+    results['build_filter_index'] = measure(lambda: utils.get_filter_index(data), 1, setup=utils.build_filter_index.clear)
+    results['build_opening_cube'] = measure(lambda: utils.get_opening_cube(data), 1, setup=utils.build_opening_cube.clear)
+    results['build_rating_histograms'] = measure(lambda: utils.get_rating_histograms(data), 1, setup=utils.build_rating_histograms.clear)
+    index = utils.get_filter_index(data)
+    utils.get_opening_cube(data)
+    for filters in FILTER_COMBINATIONS:
+        name = ','.join(f'{key}={value}' for key, value in filters.items())
+        results[f'filter.masks[{name}]'] = measure(lambda: mask_filter(data, **filters), repeat)
+        results[f'filter.index[{name}]'] = measure(lambda: utils.filter_games(data, **filters), repeat, setup=index['cache'].clear)
+        results[f'figures[{name}]'] = measure(lambda: build_figures(data, filters), repeat)
+        results[f'figures.shared[{name}]'] = measure(lambda: shared_figures(data, filters), repeat)
+        histograms = utils.get_rating_histograms(data, filters.get('increment'))
+        results[f'rating_window[{name}]'] = measure(lambda: utils.rating_window_results(histograms, filters['category'], filters.get('rated'), filters.get('rating')), repeat)
+        results[f'rating_charts[{name}]'] = measure(lambda: rating_charts(histograms, filters), repeat)
+
+    version = data.attrs.get('version')
+    results['build_opening_table'] = measure(lambda: utils.build_opening_table(data, version), 1, setup=utils.build_opening_table.clear)
+    table = utils.build_opening_table(data, version)
+    def summarize():
+        for opening in index['openings'][:5]:
+            utils.opening_summary(table, version, opening)
+    results['opening_summary'] = measure(summarize, repeat, setup=utils.opening_summary.clear)
+
+    moves = max((utils.get_move_list(utils.get_opening_games(data, opening)) for opening in index['openings'][:5]), key=len, default=[])
+    for script, indexes in navigation_scripts(moves, seed).items():
+        def navigate():
+            for move_index in indexes:
+                utils.update_chess_board(moves, move_index)
+        results[f'navigation.{script}'] = measure(navigate, max(1, repeat // 10), setup=utils.build_position_timeline.clear)
+
+    boards = [utils.update_chess_board(moves, move_index) for move_index in range(len(moves))]
+    def render():
+        for board, last_move in boards:
+            utils.display_chess_board(board, arrows=utils.last_move_arrows(last_move))
+    results['render.cold'] = measure(render, max(1, repeat // 10), setup=utils.render_board_svg.clear)
+    results['render.warm'] = measure(render, repeat)
+    return results
+
+def run(sizes, repeat, workdir, seed):
+    """
+    Runs the benchmark for every dataset size.
+
+    Parameters:
+        sizes (list of int): Dataset sizes, in games.
+        repeat (int): Number of timed calls per measurement.
+        workdir (str): Directory holding the synthetic datasets.
+        seed (int): Seed of the synthetic data and navigation scripts.
+
+    Returns:
+        dict: The benchmark report.
+    """
+    attach_script_run_context()
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'seed': seed,
+        'sizes': {}
+    }
+    for rows in sizes:
+        report['sizes'][str(rows)] = bench_size(dataset_path(workdir, rows, seed), repeat, seed)
+    report['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard hot paths on synthetic datasets.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20_000, 1_000_000, 10_000_000], help='dataset sizes, in games')
+    parser.add_argument('--repeat', type=int, default=20, help='timed calls per measurement')
+    parser.add_argument('--workdir', default='bench_data', help='directory holding the synthetic datasets')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+    report = json.dumps(run(args.sizes, args.repeat, args.workdir, args.seed), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
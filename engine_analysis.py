@@ -0,0 +1,345 @@
+"""
+Evaluates board positions on a pool of UCI engines, for the engine line of the board tab.
+
+An asyncio loop on a daemon thread drives the engine processes, so searches never block the
+Streamlit script thread. Evaluations are kept in an on-disk SQLite cache shared by every session.
+
+Set CHESS_ENGINE to the command line of a UCI engine (a Stockfish binary, or stub_engine.py) to
+enable the analysis; a stockfish binary on the PATH is used otherwise.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import shlex
+import shutil
+import sqlite3
+import threading
+import time
+
+import chess
+import chess.engine
+import streamlit as st
+from cachetools import LRUCache
+
+from utils import build_position_timeline, record_cache_access
+
+
+ENGINE_COMMAND = os.environ.get('CHESS_ENGINE') or shutil.which('stockfish')
+ANALYSIS_DEPTH = 16
+ANALYSIS_WORKERS = int(os.environ.get('CHESS_ENGINE_WORKERS', 2))
+ANALYSIS_TIMEOUT = 30
+ANALYSIS_MAX_PENDING = 64
+ANALYSIS_CACHE_PATH = os.environ.get('CHESS_ANALYSIS_CACHE', 'engine_analysis.sqlite')
+ANALYSIS_CACHE_SIZE = 200_000
+ANALYSIS_RETRY_DELAY = 30
+ANALYSIS_MAX_RETRY_DELAY = 3600
+ANALYSIS_FAILURES_SIZE = 10_000
+PREFETCH_PLIES = 4
+
+analysis_logger = logging.getLogger('chess.engine_analysis')
+
+def open_analysis_cache(path=ANALYSIS_CACHE_PATH):
+    """
+    Opens the on-disk cache of engine evaluations, creating it if needed.
+
+    Parameters:
+        path (str): Path of the SQLite database.
+
+    Returns:
+        sqlite3.Connection: Connection usable from any thread, provided access is serialized.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('''CREATE TABLE IF NOT EXISTS analysis (
+        fen TEXT NOT NULL, depth INTEGER NOT NULL, score INTEGER, mate INTEGER, pv TEXT NOT NULL,
+        last_used REAL NOT NULL, PRIMARY KEY (fen, depth))''')
+    connection.execute('CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis (last_used)')
+    return connection
+
+def read_analysis(connection, fen, depth):
+    """
+    Returns the deepest cached evaluation of a position searched to at least the given depth.
+
+    Parameters:
+        connection (sqlite3.Connection): Cache opened with open_analysis_cache.
+        fen (str): Position to look up.
+        depth (int): Minimum search depth.
+
+    Returns:
+        dict: 'depth', 'score' (centipawns for White), 'mate' (moves to mate for White) and 'pv'
+        (UCI moves), or None if the position was not analysed.
+    """
+    row = connection.execute('SELECT depth, score, mate, pv FROM analysis WHERE fen = ? AND depth >= ? ORDER BY depth DESC LIMIT 1',
+                             (fen, depth)).fetchone()
+    if row is None:
+        return None
+    connection.execute('UPDATE analysis SET last_used = ? WHERE fen = ? AND depth = ?', (time.time(), fen, row[0]))
+    return {'depth': row[0], 'score': row[1], 'mate': row[2], 'pv': row[3].split()}
+
+def write_analysis(connection, fen, depth, result, max_entries=ANALYSIS_CACHE_SIZE):
+    """
+    Stores an evaluation in the cache, evicting the least recently used ones beyond max_entries.
+
+    Parameters:
+        connection (sqlite3.Connection): Cache opened with open_analysis_cache.
+        fen (str): Position that was analysed.
+        depth (int): Search depth of the analysis.
+        result (dict): Evaluation, as returned by read_analysis.
+        max_entries (int): Number of evaluations to keep.
+    """
+    connection.execute('INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?, ?)',
+                       (fen, depth, result['score'], result['mate'], ' '.join(result['pv']), time.time()))
+    connection.execute('DELETE FROM analysis WHERE last_used <= (SELECT last_used FROM analysis ORDER BY last_used DESC LIMIT 1 OFFSET ?)',
+                       (max_entries,))
+
+async def analyse_position(pool, fen, depth):
+    """
+    Evaluates a position on the first free engine of the pool and stores the result in the cache.
+
+    Engines are started on first use. An engine that times out or fails is shut down, and a fresh
+    one takes its slot on the next request. Failures, and searches that stop short of the requested
+    depth, are recorded with record_failure, so the position is not searched again before its backoff ends.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+        fen (str): Position to evaluate.
+        depth (int): Search depth.
+
+    Returns:
+        dict: The evaluation, as returned by read_analysis, or None if the engine failed.
+    """
+    engine = await pool['engines'].get()
+    started = engine is not None
+    try:
+        if engine is None:
+            _, engine = await chess.engine.popen_uci(pool['command'])
+            started = True
+        limit = chess.engine.Limit(depth=depth, time=ANALYSIS_TIMEOUT)
+        info = await asyncio.wait_for(engine.analyse(chess.Board(fen), limit), ANALYSIS_TIMEOUT + 5)
+    except (asyncio.TimeoutError, chess.engine.EngineError, OSError) as error:
+        analysis_logger.warning('Engine analysis of %s failed: %r', fen, error)
+        with pool['lock']:
+            # An engine that cannot start fails every position alike
+            record_failure(pool, fen if started else None)
+        if engine is not None:
+            try:
+                await asyncio.wait_for(engine.quit(), 1)
+            except (asyncio.TimeoutError, chess.engine.EngineError):
+                engine.transport.close()
+        pool['engines'].put_nowait(None)
+        return None
+    pool['engines'].put_nowait(engine)
+    score = info['score'].white()
+    result = {'depth': info.get('depth', depth), 'score': score.score(), 'mate': score.mate(),
+              'pv': [move.uci() for move in info.get('pv', [])]}
+    with pool['lock']:
+        # Stored under the depth reached, so a search cut short by the timeout does not satisfy deeper requests
+        write_analysis(pool['cache'], fen, result['depth'], result)
+        pool['failures'].pop(None, None)
+        if result['depth'] < depth:
+            record_failure(pool, fen)
+        else:
+            pool['failures'].pop(fen, None)
+    return result
+
+def record_failure(pool, key):
+    """
+    Records a failed or incomplete search, backing off exponentially before the next attempt.
+
+    Must be called with the pool lock held.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+        key (str): Position that failed, or None when the engine itself could not be started.
+    """
+    count = pool['failures'].get(key, {'count': 0})['count'] + 1
+    delay = min(ANALYSIS_RETRY_DELAY * 2 ** (count - 1), ANALYSIS_MAX_RETRY_DELAY)
+    pool['failures'][key] = {'count': count, 'retry_at': time.time() + delay}
+
+def backing_off(pool, fen):
+    """
+    Tells whether a position is not to be searched yet, after a failed or incomplete search of it or an engine start failure.
+
+    Must be called with the pool lock held.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+        fen (str): The position.
+
+    Returns:
+        bool: Whether the position or the engine is backing off.
+    """
+    now = time.time()
+    return any(key in pool['failures'] and now < pool['failures'][key]['retry_at'] for key in (fen, None))
+
+def analysis_failed(pool, fen):
+    """
+    Tells whether the evaluation of a position failed, so that there is nothing to wait for until its backoff ends.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+        fen (str): The position.
+
+    Returns:
+        bool: Whether the position is backing off with no search under way.
+    """
+    with pool['lock']:
+        return (fen, ANALYSIS_DEPTH) not in pool['pending'] and backing_off(pool, fen)
+
+async def close_engines(pool):
+    """
+    Shuts down every running engine of an analysis pool.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+    """
+    while not pool['engines'].empty():
+        engine = pool['engines'].get_nowait()
+        if engine is not None:
+            await engine.quit()
+
+@st.cache_resource(show_spinner=False)
+def get_analysis_pool(command=ENGINE_COMMAND, workers=ANALYSIS_WORKERS, cache_path=ANALYSIS_CACHE_PATH):
+    """
+    Starts the engine analysis pool shared by every session.
+
+    An asyncio loop runs on a daemon thread and drives up to `workers` UCI engine processes, so engine
+    work never runs on the Streamlit script thread.
+
+    Parameters:
+        command (str): Command line of a UCI engine, e.g. a Stockfish binary or stub_engine.py.
+        workers (int): Number of positions evaluated concurrently.
+        cache_path (str): Path of the on-disk evaluation cache.
+
+    Returns:
+        dict: The pool, or None if no engine is configured.
+    """
+    if not command:
+        return None
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='engine-analysis', daemon=True).start()
+
+    async def make_slots():
+        slots = asyncio.Queue()
+        for _ in range(workers):
+            slots.put_nowait(None)
+        return slots
+
+    pool = {
+        'command': shlex.split(command),
+        'loop': loop,
+        'engines': asyncio.run_coroutine_threadsafe(make_slots(), loop).result(),
+        'cache': open_analysis_cache(cache_path),
+        'lock': threading.Lock(),
+        'pending': {},
+        'failures': LRUCache(maxsize=ANALYSIS_FAILURES_SIZE)
+    }
+    atexit.register(lambda: asyncio.run_coroutine_threadsafe(close_engines(pool), loop).result(5))
+    return pool
+
+def request_analysis(pool, fen, depth=ANALYSIS_DEPTH, prefetch=False):
+    """
+    Returns the evaluation of a position if it is cached, and otherwise schedules it without waiting.
+
+    Concurrent requests for the same position share one engine search. Prefetch requests are dropped
+    when too many searches are already queued. A position whose last search failed or stopped short is
+    not searched again before its backoff ends; the deepest evaluation cached for it is returned meanwhile.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+        fen (str): Position to evaluate.
+        depth (int): Search depth.
+        prefetch (bool): Whether the position is only likely to be viewed next.
+
+    Returns:
+        dict: The evaluation, as returned by read_analysis, or None while it is being computed or if the engine failed.
+    """
+    key = (fen, depth)
+    with pool['lock']:
+        result = read_analysis(pool['cache'], fen, depth)
+        record_cache_access(result is not None)
+        if result is not None or key in pool['pending']:
+            return result
+        if backing_off(pool, fen):
+            return read_analysis(pool['cache'], fen, 0)
+        if prefetch and len(pool['pending']) >= ANALYSIS_MAX_PENDING:
+            return None
+        future = asyncio.run_coroutine_threadsafe(analyse_position(pool, fen, depth), pool['loop'])
+        pool['pending'][key] = future
+
+    def forget(_):
+        with pool['lock']:
+            pool['pending'].pop(key, None)
+    future.add_done_callback(forget)
+    return None
+
+def upcoming_positions(moves, current_move_index, plies=PREFETCH_PLIES):
+    """
+    Returns the positions reached over the next few plies of a move list.
+
+    Parameters:
+        moves (list of str): Moves in standard algebraic notation.
+        current_move_index (int): Index of the last move played on the board.
+        plies (int): Number of plies to look ahead.
+
+    Returns:
+        list of str: FENs of the upcoming positions.
+    """
+    fens = build_position_timeline(tuple(moves))['fens']
+    start = max(0, current_move_index + 2)
+    return list(fens[start:start + plies])
+
+def format_evaluation(result):
+    """
+    Formats an evaluation from White's point of view, e.g. '+0.35' or '#-3'.
+
+    Parameters:
+        result (dict): Evaluation, as returned by read_analysis.
+
+    Returns:
+        str: The formatted evaluation.
+    """
+    if result['mate'] is not None:
+        return f"#{result['mate']}"
+    return f"{result['score'] / 100:+.2f}"
+
+def display_engine_analysis(pool, fen, upcoming):
+    """
+    Displays the engine evaluation of the current position, polling for it while the engine searches.
+
+    The upcoming positions of the game are queued for analysis too, so stepping forward finds them cached.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+        fen (str): The current position.
+        upcoming (list of str): Positions likely to be viewed next.
+    """
+    result = request_analysis(pool, fen)
+    for next_fen in upcoming:
+        request_analysis(pool, next_fen, prefetch=True)
+    if result is None:
+        if analysis_failed(pool, fen):
+            st.write("Engine evaluation: engine unavailable.")
+        else:
+            poll_engine_analysis(pool, fen)
+        return
+    board = chess.Board(fen)
+    line = board.variation_san([chess.Move.from_uci(move) for move in result['pv'][:6]]) if result['pv'] else ''
+    st.write(f"Engine evaluation: **{format_evaluation(result)}** (depth {result['depth']}) {line}")
+
+@st.experimental_fragment(run_every=1)
+def poll_engine_analysis(pool, fen):
+    """
+    Waits for the engine evaluation of a position, rerunning only this fragment every second.
+
+    Once the evaluation is cached, or the search has failed, the app reruns: the full run displays the
+    outcome without this fragment, which stops the polling.
+
+    Parameters:
+        pool (dict): Analysis pool returned by get_analysis_pool.
+        fen (str): The position being analysed.
+    """
+    if request_analysis(pool, fen) is not None or analysis_failed(pool, fen):
+        st.rerun()
+    st.write("Engine evaluation: analysing...")
@@ -0,0 +1,366 @@
+"""
+Ingests a raw lichess dump into the enriched dataset loaded by the app.
+
+The input is either the raw Kaggle `games.csv` or a lichess PGN export. It is read in chunks, the
+columns derived in visual.ipynb are computed with vectorized operations, and every game's moves
+are replayed on a process pool to validate them and extract per-game features. The result is
+streamed to `<output>.csv` and to its typed Parquet copy `<output>.parquet`, which load_data picks
+up without re-parsing the CSV.
+
+Usage:
+    python ingest.py games.csv [--output games_revisited] [--workers N] [--chunk-size N]
+    python ingest.py lichess_db_standard_rated_2017-01.pgn --dataset-dir games_dataset
+"""
+import argparse
+import datetime
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import chess.pgn
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils import CATEGORICAL_COLUMNS, build_partitioned_dataset, file_digest
+
+
+RAW_COLUMNS = ['id', 'rated', 'created_at', 'last_move_at', 'turns', 'victory_status', 'winner', 'increment_code', 'white_id', 'white_rating', 'black_id', 'black_rating', 'moves', 'opening_eco', 'opening_name', 'opening_ply']
+OUTPUT_COLUMNS = ['id', 'rated', 'turns', 'victory_status', 'winner', 'white_rating', 'black_rating', 'moves', 'opening_eco', 'opening_name', 'opening_ply', 'created_at_datetime', 'last_move_at_datetime', 'rating_diff', 'rating_diff_abs', 'initial_time', 'increment', 'time_control_category', 'increment_boolean']
+FEATURE_COLUMNS = ['moves_valid', 'final_fen', 'material_balance', 'checks', 'captures']
+PIECE_VALUES = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3, chess.ROOK: 5, chess.QUEEN: 9}
+
+
+######################################################################################################
+##################################         FEATURES           ########################################
+
+def material_balance(board):
+    """
+    Computes the material difference between white and black, in pawns.
+
+    Parameters:
+        board (chess.Board): The position to evaluate.
+
+    Returns:
+        int: White material minus black material.
+    """
+    return sum(value * (len(board.pieces(piece, chess.WHITE)) - len(board.pieces(piece, chess.BLACK))) for piece, value in PIECE_VALUES.items())
+
+def replay_features(moves):
+    """
+    Replays a game and extracts its position features.
+
+    Parameters:
+        moves (str): Space separated SAN moves of the game.
+
+    Returns:
+        tuple: Whether every move was legal, the final FEN, the final material balance, and the number of checks and captures.
+            Replay stops at the first illegal move.
+    """
+    board = chess.Board()
+    checks = captures = 0
+    valid = True
+    for san in str(moves).split():
+        try:
+            move = board.parse_san(san)
+        except ValueError:
+            valid = False
+            break
+        captures += board.is_capture(move)
+        board.push(move)
+        checks += board.is_check()
+    return valid, board.fen(), material_balance(board), checks, captures
+
+def extract_features(moves_column):
+    """
+    Extracts the position features of every game in a column of move strings.
+
+    Parameters:
+        moves_column (pd.Series): Space separated SAN moves of each game.
+
+    Returns:
+        pd.DataFrame: The FEATURE_COLUMNS of each game, aligned on the input index.
+    """
+    return pd.DataFrame([replay_features(moves) for moves in moves_column], columns=FEATURE_COLUMNS, index=moves_column.index)
+
+
+######################################################################################################
+##################################         DERIVED COLUMNS    ########################################
+
+def categorize_time_control(initial_time):
+    """
+    Categorizes initial times (in minutes) into time control categories.
+
+    Parameters:
+        initial_time (pd.Series): Initial time of each game, in minutes.
+
+    Returns:
+        np.ndarray: 'Bullet', 'Blitz', 'Rapid' or 'Other' for each game.
+    """
+    return np.select([initial_time < 3, initial_time < 10, initial_time < 30], ['Bullet', 'Blitz', 'Rapid'], default='Other')
+
+def convert_unix_to_datetime(timestamps):
+    """
+    Converts Unix timestamps in milliseconds to datetimes, discarding negative or future ones.
+
+    Parameters:
+        timestamps (pd.Series): Unix timestamps in milliseconds.
+
+    Returns:
+        pd.Series: The datetimes, NaT where the timestamp is invalid.
+    """
+    seconds = timestamps / 1000
+    current_timestamp = datetime.datetime.now().timestamp()
+    return pd.to_datetime(seconds.where((seconds > 0) & (seconds < current_timestamp)), unit='s')
+
+def derive_columns(raw):
+    """
+    Derives the columns of games_revisited.csv from raw games, as done in visual.ipynb.
+
+    Parameters:
+        raw (pd.DataFrame): Games with the RAW_COLUMNS.
+
+    Returns:
+        pd.DataFrame: The games with the OUTPUT_COLUMNS, without incomplete rows.
+    """
+    data = raw.copy()
+    data['created_at_datetime'] = convert_unix_to_datetime(data['created_at'])
+    data['last_move_at_datetime'] = convert_unix_to_datetime(data['last_move_at'])
+    data['rating_diff'] = data['white_rating'] - data['black_rating']
+    data['rating_diff_abs'] = data['rating_diff'].abs()
+    increment_code = data['increment_code'].astype(str).str.split('+', n=1, expand=True).reindex(columns=[0, 1])
+    data['initial_time'] = pd.to_numeric(increment_code[0], errors='coerce')
+    data['increment'] = pd.to_numeric(increment_code[1], errors='coerce')
+    data['time_control_category'] = categorize_time_control(data['initial_time'])
+    data['increment_boolean'] = data['increment'] != 0
+    data = data[OUTPUT_COLUMNS].dropna()
+    for column in ['turns', 'white_rating', 'black_rating', 'opening_ply', 'rating_diff', 'rating_diff_abs', 'initial_time', 'increment']:
+        data[column] = data[column].astype(np.int64)
+
+    # Games whose start and end times are identical have unusable timings
+    same_timing = data['created_at_datetime'] == data['last_move_at_datetime']
+    data['created_at_datetime'] = data['created_at_datetime'].astype(str).where(~same_timing, '-1')
+    data['last_move_at_datetime'] = data['last_move_at_datetime'].astype(str).where(~same_timing, '-1')
+    return data
+
+
+######################################################################################################
+##################################         READERS            ########################################
+
+def parse_pgn_game(text):
+    """
+    Converts one PGN game into a raw games row.
+
+    Lichess PGN exports do not record the opening ply or the time of the last move, so the opening
+    ply is set to 0 and the last move time to the start time.
+
+    Parameters:
+        text (str): PGN text of a single game.
+
+    Returns:
+        dict: The game with the RAW_COLUMNS, or None if the text holds no game.
+    """
+    game = chess.pgn.read_game(io.StringIO(text))
+    if game is None:
+        return None
+    headers = game.headers
+    board = game.board()
+    moves = []
+    for move in game.mainline_moves():
+        moves.append(board.san(move))
+        board.push(move)
+
+    result = headers.get('Result', '*')
+    winner = {'1-0': 'white', '0-1': 'black'}.get(result, 'draw')
+    if headers.get('Termination') == 'Time forfeit':
+        victory_status = 'outoftime'
+    elif result == '1/2-1/2':
+        victory_status = 'draw'
+    elif board.is_checkmate():
+        victory_status = 'mate'
+    else:
+        victory_status = 'resign'
+    try:
+        started = datetime.datetime.strptime(f"{headers.get('UTCDate')} {headers.get('UTCTime')}", '%Y.%m.%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc)
+        created_at = started.timestamp() * 1000
+    except ValueError:
+        created_at = None
+    base, _, increment = headers.get('TimeControl', '-').partition('+')
+    return {
+        'id': headers.get('Site', '').rsplit('/', 1)[-1],
+        'rated': headers.get('Event', '').startswith('Rated'),
+        'created_at': created_at,
+        'last_move_at': created_at,
+        'turns': len(moves),
+        'victory_status': victory_status,
+        'winner': winner,
+        'increment_code': f'{int(base) // 60}+{increment}' if base.isdigit() and increment.isdigit() else None,
+        'white_id': headers.get('White'),
+        'white_rating': pd.to_numeric(headers.get('WhiteElo'), errors='coerce'),
+        'black_id': headers.get('Black'),
+        'black_rating': pd.to_numeric(headers.get('BlackElo'), errors='coerce'),
+        'moves': ' '.join(moves),
+        'opening_eco': headers.get('ECO'),
+        'opening_name': headers.get('Opening'),
+        'opening_ply': 0
+    }
+
+def iter_csv_chunks(path, chunk_size):
+    """
+    Reads a raw games CSV in chunks.
+
+    Parameters:
+        path (str): Path of the raw games CSV.
+        chunk_size (int): Number of games per chunk.
+
+    Yields:
+        pd.DataFrame: Chunks of raw games.
+    """
+    yield from pd.read_csv(path, usecols=RAW_COLUMNS, chunksize=chunk_size)
+
+def iter_pgn_chunks(path, chunk_size):
+    """
+    Splits a PGN file into chunks of game texts, without parsing them.
+
+    Parameters:
+        path (str): Path of the PGN file.
+        chunk_size (int): Number of games per chunk.
+
+    Yields:
+        list of str: Chunks of PGN game texts.
+    """
+    chunk, lines = [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('[Event ') and lines:
+                chunk.append(''.join(lines))
+                lines = []
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            lines.append(line)
+    if lines:
+        chunk.append(''.join(lines))
+    if chunk:
+        yield chunk
+
+def process_chunk(kind, chunk):
+    """
+    Turns a chunk of raw input into enriched games. Runs in a worker process.
+
+    Parameters:
+        kind (str): 'csv' for a chunk of raw games, 'pgn' for a chunk of PGN game texts.
+        chunk (pd.DataFrame or list of str): The chunk to process.
+
+    Returns:
+        pd.DataFrame: The games with the OUTPUT_COLUMNS and FEATURE_COLUMNS.
+    """
+    if kind == 'pgn':
+        chunk = pd.DataFrame([row for row in map(parse_pgn_game, chunk) if row is not None], columns=RAW_COLUMNS)
+    data = derive_columns(chunk)
+    return pd.concat([data, extract_features(data['moves'])], axis=1)
+
+
+######################################################################################################
+##################################         OUTPUT             ########################################
+
+def to_arrow(data, schema=None):
+    """
+    Converts a chunk of enriched games to an Arrow table with dictionary-encoded categorical columns.
+
+    Parameters:
+        data (pd.DataFrame): Enriched games.
+        schema (pa.Schema, optional): Schema of the previous chunks, which the table is cast to.
+
+    Returns:
+        pa.Table: The chunk as an Arrow table.
+    """
+    data = data.astype({column: 'category' for column in CATEGORICAL_COLUMNS})
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    if schema is None:
+        fields = [pa.field(field.name, pa.dictionary(pa.int32(), pa.string())) if field.name in CATEGORICAL_COLUMNS else field for field in table.schema]
+        schema = pa.schema(fields, metadata=table.schema.metadata)
+    return table.cast(schema)
+
+def ingest(input_path, output='games_revisited', workers=None, chunk_size=20000):
+    """
+    Ingests a raw games CSV or a PGN file into `<output>.csv` and `<output>.parquet`.
+
+    Chunks are processed on a process pool with at most two chunks in flight per worker, and
+    written in input order, so memory stays bounded whatever the size of the input. Games whose
+    id was already written are skipped.
+
+    Parameters:
+        input_path (str): Path of the raw games CSV or PGN file.
+        output (str): Path of the outputs, without extension.
+        workers (int, optional): Number of worker processes; defaults to the number of CPUs.
+        chunk_size (int): Number of games per chunk.
+
+    Returns:
+        int: Number of games written.
+    """
+    kind = 'pgn' if input_path.lower().endswith('.pgn') else 'csv'
+    chunks = iter_pgn_chunks(input_path, chunk_size) if kind == 'pgn' else iter_csv_chunks(input_path, chunk_size)
+    csv_path, parquet_path = output + '.csv', output + '.parquet'
+    staging_path = parquet_path + '.tmp'
+    workers = workers or os.cpu_count()
+    seen_ids = set()
+    written = 0
+    writer = schema = None
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(csv_path, 'w', newline='') as csv_file:
+        pending = deque()
+        chunks = iter(chunks)
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(executor.submit(process_chunk, kind, chunk))
+            if not pending:
+                break
+            data = pending.popleft().result()
+            data = data[~data['id'].isin(seen_ids)].drop_duplicates(subset='id')
+            seen_ids.update(data['id'])
+            if data.empty:
+                continue
+            data.to_csv(csv_file, header=written == 0, index=False)
+            table = to_arrow(data, schema)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(staging_path, schema)
+            writer.write_table(table)
+            written += len(data)
+    if writer is None:
+        return 0
+    writer.close()
+
+    # Stamp the Parquet copy with the fingerprint of the CSV so load_data reuses it
+    stat = os.stat(csv_path)
+    metadata = dict(schema.metadata or {})
+    metadata.update({b'source_mtime_ns': str(stat.st_mtime_ns).encode(), b'source_size': str(stat.st_size).encode(), b'source_sha256': file_digest(csv_path).encode()})
+    staged = pq.ParquetFile(staging_path)
+    with pq.ParquetWriter(parquet_path, schema.with_metadata(metadata)) as final_writer:
+        for row_group in range(staged.num_row_groups):
+            final_writer.write_table(staged.read_row_group(row_group).replace_schema_metadata(metadata))
+    staged.close()
+    os.remove(staging_path)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest a raw lichess games CSV or PGN file into the dataset loaded by the app.')
+    parser.add_argument('input_path', help='raw games.csv or PGN file')
+    parser.add_argument('--output', default='games_revisited', help='path of the outputs, without extension')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='games per chunk')
+    parser.add_argument('--dataset-dir', help='also write a dataset partitioned by time control category and opening bucket, for the app streaming mode (CHESS_DATASET_DIR)')
+    args = parser.parse_args()
+    count = ingest(args.input_path, args.output, args.workers, args.chunk_size)
+    print(f'Ingested {count} games into {args.output}.csv and {args.output}.parquet')
+    if args.dataset_dir:
+        build_partitioned_dataset(args.output + '.parquet', args.dataset_dir)
+        print(f'Wrote the partitioned dataset to {args.dataset_dir}')
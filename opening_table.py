@@ -0,0 +1,53 @@
+"""
+Builds the opening table served by the opening tab.
+
+Games are aggregated into one row per opening, opening family, ECO code and ECO volume, holding the
+opening line played most often, game counts per time control category and rated flag, win and draw
+rates, average ratings and duration. The table is saved as Parquet next to the dataset, tagged with
+the dataset version, and the app loads it in one read at startup.
+
+Usage:
+    python opening_table.py [games_revisited.csv]
+    python opening_table.py --dataset-dir games_dataset
+"""
+import argparse
+
+from utils import (DATA_PATH, dataset_dir_version, file_digest, opening_table_cells, opening_table_path,
+                   read_games_csv, rollup_opening_table, stream_opening_table, write_opening_table)
+
+
+def build_opening_table_file(csv_path=DATA_PATH):
+    """
+    Builds the opening table of a games CSV and writes it next to the CSV.
+
+    Parameters:
+        csv_path (str): Path of the games CSV.
+
+    Returns:
+        int: Number of rows in the table.
+    """
+    table = rollup_opening_table(opening_table_cells(read_games_csv(csv_path)))
+    write_opening_table(table, opening_table_path(csv_path), file_digest(csv_path))
+    return len(table)
+
+def build_streamed_opening_table_file(dataset_dir):
+    """
+    Builds the opening table of a partitioned dataset, streaming its games, and writes it next to the dataset directory.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+
+    Returns:
+        int: Number of rows in the table.
+    """
+    return len(stream_opening_table(dataset_dir, dataset_dir_version(dataset_dir), opening_table_path(dataset_dir)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the opening table of a games CSV or of a partitioned dataset.')
+    parser.add_argument('csv_path', nargs='?', default=DATA_PATH, help='games CSV to aggregate')
+    parser.add_argument('--dataset-dir', help='aggregate this partitioned dataset (CHESS_DATASET_DIR) instead of the CSV')
+    args = parser.parse_args()
+    source = args.dataset_dir or args.csv_path
+    count = build_streamed_opening_table_file(args.dataset_dir) if args.dataset_dir else build_opening_table_file(args.csv_path)
+    print(f'Wrote {count} rows to {opening_table_path(source)}')
@@ -0,0 +1,86 @@
+"""
+Builds the transposition-aware position index used by the board tab.
+
+Every game's moves are replayed and the Zobrist hash of each position reached is recorded with
+the game's row and the ply it was reached at. The entries are sorted by hash and saved as a flat
+.npy file next to the dataset, which the app memory-maps at startup.
+
+Usage:
+    python position_index.py [games_revisited.csv] [--workers N] [--chunk-size N]
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import chess.polyglot
+import numpy as np
+import pandas as pd
+
+from utils import DATA_PATH, POSITION_INDEX_DTYPE, file_digest, position_index_paths
+
+
+def hash_games(first_row, moves_column):
+    """
+    Replays a chunk of games and hashes every position they reach.
+
+    A position repeated within a game is only recorded at the first ply it was reached. Replay of a
+    game stops at its first illegal move.
+
+    Parameters:
+        first_row (int): Row of the first game of the chunk in the dataset.
+        moves_column (list of str): Space separated SAN moves of each game.
+
+    Returns:
+        np.ndarray: Index entries of the chunk, with POSITION_INDEX_DTYPE.
+    """
+    entries = []
+    for offset, moves in enumerate(moves_column):
+        board = chess.Board()
+        seen = set()
+        for ply, move in enumerate(str(moves).split(), start=1):
+            try:
+                board.push_san(move)
+            except ValueError:
+                break
+            key = chess.polyglot.zobrist_hash(board)
+            if key not in seen:
+                seen.add(key)
+                entries.append((key, first_row + offset, ply))
+    return np.array(entries, dtype=POSITION_INDEX_DTYPE)
+
+def build_position_index(csv_path=DATA_PATH, workers=None, chunk_size=5000):
+    """
+    Builds the position index of a games CSV and writes it next to the CSV.
+
+    Parameters:
+        csv_path (str): Path of the games CSV.
+        workers (int, optional): Number of worker processes; defaults to the number of CPUs.
+        chunk_size (int): Number of games replayed per task.
+
+    Returns:
+        int: Number of entries in the index.
+    """
+    moves = pd.read_csv(csv_path, usecols=['moves'])['moves'].tolist()
+    starts = range(0, len(moves), chunk_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = list(executor.map(hash_games, starts, [moves[start:start + chunk_size] for start in starts]))
+    entries = np.concatenate(chunks) if chunks else np.empty(0, dtype=POSITION_INDEX_DTYPE)
+    entries = entries[np.argsort(entries['hash'], kind='stable')]
+
+    index_path, meta_path = position_index_paths(csv_path)
+    np.save(index_path, entries)
+    with open(meta_path, 'w') as f:
+        json.dump({'version': file_digest(csv_path), 'games': len(moves), 'entries': len(entries)}, f)
+    return len(entries)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the Zobrist position index of a games CSV.')
+    parser.add_argument('csv_path', nargs='?', default=DATA_PATH, help='games CSV to index')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='games replayed per task')
+    args = parser.parse_args()
+    count = build_position_index(args.csv_path, args.workers, args.chunk_size)
+    print(f'Indexed {count} positions into {position_index_paths(args.csv_path)[0]}')
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+A minimal UCI engine for running the board tab's engine analysis without a real engine installed.
+
+It answers every search with a material count and the first legal moves of the position, after an
+optional delay to stand in for search time. A maximum depth stands in for searches stopped by the
+time limit before reaching the requested depth.
+
+Usage:
+    CHESS_ENGINE="python stub_engine.py [--delay SECONDS] [--max-depth N]" streamlit run app.py
+"""
+import argparse
+import sys
+import time
+
+import chess
+
+
+PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300, chess.ROOK: 500, chess.QUEEN: 900}
+
+
+def material(board):
+    """
+    Returns the material balance of a position, in centipawns from the side to move's point of view.
+
+    Parameters:
+        board (chess.Board): The position.
+
+    Returns:
+        int: The material balance.
+    """
+    balance = sum(value * (len(board.pieces(piece, chess.WHITE)) - len(board.pieces(piece, chess.BLACK)))
+                  for piece, value in PIECE_VALUES.items())
+    return balance if board.turn == chess.WHITE else -balance
+
+
+def parse_position(tokens):
+    """
+    Builds the board described by the arguments of a UCI 'position' command.
+
+    Parameters:
+        tokens (list of str): Arguments following 'position'.
+
+    Returns:
+        chess.Board: The position.
+    """
+    if tokens[0] == 'fen':
+        end = tokens.index('moves') if 'moves' in tokens else len(tokens)
+        board = chess.Board(' '.join(tokens[1:end]))
+    else:
+        end = 1
+        board = chess.Board()
+    for move in tokens[end + 1:]:
+        board.push_uci(move)
+    return board
+
+
+def search(board, depth, delay):
+    """
+    Answers a UCI 'go' command on a position.
+
+    Parameters:
+        board (chess.Board): The position.
+        depth (int): Depth to report.
+        delay (float): Seconds to wait before answering.
+
+    Returns:
+        list of str: The 'info' and 'bestmove' lines.
+    """
+    time.sleep(delay)
+    pv = []
+    line = board.copy()
+    while len(pv) < 3 and not line.is_game_over():
+        move = next(iter(line.legal_moves))
+        pv.append(move.uci())
+        line.push(move)
+    if board.is_checkmate():
+        score = 'mate 0'
+    else:
+        score = f'cp {material(board)}'
+    info = f"info depth {depth} score {score} nodes 1 pv {' '.join(pv)}" if pv else f'info depth {depth} score {score}'
+    return [info, f"bestmove {pv[0] if pv else '(none)'}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds spent on every search.')
+    parser.add_argument('--max-depth', type=int, default=None, help='Deepest depth reported, whatever the depth requested.')
+    args = parser.parse_args()
+
+    board = chess.Board()
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == 'uci':
+            replies = ['id name stub_engine', 'id author Streamlit-chess', 'uciok']
+        elif command == 'isready':
+            replies = ['readyok']
+        elif command == 'position':
+            board = parse_position(tokens[1:])
+            replies = []
+        elif command == 'go':
+            depth = int(tokens[tokens.index('depth') + 1]) if 'depth' in tokens else 1
+            if args.max_depth is not None:
+                depth = min(depth, args.max_depth)
+            replies = search(board, depth, args.delay)
+        elif command == 'quit':
+            break
+        else:
+            replies = []
+        for reply in replies:
+            print(reply, flush=True)
+
+
+if __name__ == '__main__':
+    main()
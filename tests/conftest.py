@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import utils
+
+
+@pytest.fixture(scope='session')
+def games_csv(tmp_path_factory):
+    """
+    Writes a synthetic games CSV with the games_revisited.csv schema.
+    """
+    path = tmp_path_factory.mktemp('data') / 'games.csv'
+    benchmark.synthetic_games(4000, seed=7, pool_size=300).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def raw(games_csv):
+    """
+    Reads the synthetic games as plain pandas columns, the reference the indexes are checked against.
+    """
+    return pd.read_csv(games_csv)
+
+
+@pytest.fixture(scope='session')
+def data(games_csv):
+    """
+    Loads the synthetic games as the app does.
+    """
+    return utils.load_data(games_csv)
+
+
+@pytest.fixture(scope='session')
+def dataset_dir(games_csv, data, tmp_path_factory):
+    """
+    Builds the partitioned dataset of the streaming mode from the app's Parquet copy of the synthetic games.
+    """
+    path = str(tmp_path_factory.mktemp('dataset') / 'games')
+    utils.build_partitioned_dataset(utils.columnar_path(games_csv), path)
+    return path
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+import benchmark
+import utils
+
+
+def test_compact_store_keeps_the_games(raw, data):
+    assert len(data) == len(raw)
+    assert data['id'].tolist() == raw['id'].tolist()
+    for column in ['white_rating', 'black_rating', 'turns', 'increment']:
+        assert data[column].to_numpy(np.int64).tolist() == raw[column].tolist()
+    for column in ['winner', 'opening_name', 'time_control_category', 'victory_status']:
+        assert data[column].astype(str).tolist() == raw[column].astype(str).tolist()
+    assert data['rated'].to_numpy(bool).tolist() == raw['rated'].tolist()
+
+
+def test_packed_moves_decode_to_the_source_moves(raw, data):
+    assert utils.decode_moves(data).tolist() == raw['moves'].tolist()
+    subset = data.iloc[::7]
+    assert utils.decode_moves(subset).tolist() == raw['moves'].iloc[::7].tolist()
+
+
+def test_reloaded_copy_keeps_its_vocabulary(games_csv, data):
+    utils.load_columnar.clear()
+    reloaded = utils.load_data(games_csv)
+    assert reloaded.attrs['version'] == data.attrs['version']
+    assert utils.decode_moves(reloaded).tolist() == utils.decode_moves(data).tolist()
+
+
+def test_encode_moves_matches_str_split():
+    moves = pd.Series(['e4 e5  Nf3', '', ' d4', None, 'c4 ', 'e4 c5 Nf3 d6'])
+    encoded = utils.encode_moves(moves)
+    tokens = moves.fillna('').str.split()
+    assert np.diff(encoded['offsets']).tolist() == tokens.str.len().tolist()
+    decoded = [encoded['vocabulary'][encoded['codes'][start:end]].tolist()
+               for start, end in zip(encoded['offsets'][:-1], encoded['offsets'][1:])]
+    assert decoded == tokens.tolist()
+    assert encoded['codes'].dtype == np.uint16
+
+
+def test_datetime_sentinel_is_parsed_as_nat(tmp_path):
+    games = benchmark.synthetic_games(50, seed=3, pool_size=20)
+    games.loc[::5, ['created_at_datetime', 'last_move_at_datetime']] = '-1'
+    path = tmp_path / 'sentinel.csv'
+    games.to_csv(path, index=False)
+    data = utils.load_data(str(path))
+    for column in ['created_at_datetime', 'last_move_at_datetime']:
+        assert pd.api.types.is_datetime64_any_dtype(data[column])
+        assert data[column].isna().tolist() == (games[column] == '-1').tolist()
@@ -0,0 +1,129 @@
+import os
+import shlex
+import sys
+import time
+
+import chess
+import pytest
+
+import engine_analysis
+
+STUB_ENGINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'stub_engine.py')
+START = chess.Board().fen()
+
+
+def stub_command(*arguments):
+    return shlex.join([sys.executable, STUB_ENGINE, *arguments])
+
+
+def wait_for(pool, fen, depth=engine_analysis.ANALYSIS_DEPTH):
+    """
+    Waits for the search of a position scheduled by request_analysis, if any.
+    """
+    future = pool['pending'].get((fen, depth))
+    if future is not None:
+        future.result(timeout=20)
+    # The pending entry is dropped by a callback of the future
+    deadline = time.time() + 5
+    while (fen, depth) in pool['pending'] and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def positions(count):
+    board = chess.Board()
+    fens = []
+    for move in ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6', 'Ba4', 'Nf6', 'O-O', 'Be7'][:count]:
+        board.push_san(move)
+        fens.append(board.fen())
+    return fens
+
+
+def test_evaluation_is_cached(tmp_path):
+    cache_path = str(tmp_path / 'analysis.sqlite')
+    pool = engine_analysis.get_analysis_pool(stub_command(), 1, cache_path)
+    assert engine_analysis.request_analysis(pool, START) is None
+    wait_for(pool, START)
+    result = engine_analysis.request_analysis(pool, START)
+    assert result['depth'] == engine_analysis.ANALYSIS_DEPTH
+    assert result['score'] == 0 and result['mate'] is None and result['pv']
+    # A pool whose engine cannot start still answers from the on-disk cache
+    cold = engine_analysis.get_analysis_pool('/nonexistent/engine', 1, cache_path)
+    assert engine_analysis.request_analysis(cold, START) == result
+    assert not cold['pending']
+
+
+def test_prefetch_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine_analysis, 'ANALYSIS_MAX_PENDING', 2)
+    pool = engine_analysis.get_analysis_pool(stub_command('--delay', '0.5'), 1, str(tmp_path / 'analysis.sqlite'))
+    fens = positions(5)
+    assert engine_analysis.request_analysis(pool, fens[0]) is None
+    for fen in fens[1:]:
+        engine_analysis.request_analysis(pool, fen, prefetch=True)
+    assert set(pool['pending']) == {(fen, engine_analysis.ANALYSIS_DEPTH) for fen in fens[:2]}
+    # The position being viewed is scheduled whatever the queue length
+    engine_analysis.request_analysis(pool, fens[4])
+    assert (fens[4], engine_analysis.ANALYSIS_DEPTH) in pool['pending']
+    for fen in fens:
+        wait_for(pool, fen)
+
+
+def test_least_recently_used_evaluations_are_evicted(tmp_path):
+    connection = engine_analysis.open_analysis_cache(str(tmp_path / 'analysis.sqlite'))
+    fens = positions(4)
+    result = {'depth': 16, 'score': 10, 'mate': None, 'pv': ['e2e4']}
+    for fen in fens[:3]:
+        engine_analysis.write_analysis(connection, fen, 16, result, max_entries=3)
+        time.sleep(0.01)
+    assert engine_analysis.read_analysis(connection, fens[0], 16) is not None
+    time.sleep(0.01)
+    engine_analysis.write_analysis(connection, fens[3], 16, result, max_entries=3)
+    cached = [engine_analysis.read_analysis(connection, fen, 16) is not None for fen in fens]
+    assert cached == [True, False, True, True]
+
+
+def test_deeper_analysis_serves_shallower_requests(tmp_path):
+    connection = engine_analysis.open_analysis_cache(str(tmp_path / 'analysis.sqlite'))
+    engine_analysis.write_analysis(connection, START, 12, {'depth': 12, 'score': 5, 'mate': None, 'pv': []})
+    engine_analysis.write_analysis(connection, START, 20, {'depth': 20, 'score': 7, 'mate': None, 'pv': []})
+    assert engine_analysis.read_analysis(connection, START, 16)['depth'] == 20
+    assert engine_analysis.read_analysis(connection, START, 24) is None
+
+
+def test_engine_that_cannot_start_is_not_retried(tmp_path):
+    pool = engine_analysis.get_analysis_pool('/nonexistent/engine', 1, str(tmp_path / 'analysis.sqlite'))
+    fens = positions(2)
+    assert engine_analysis.request_analysis(pool, fens[0]) is None
+    wait_for(pool, fens[0])
+    assert engine_analysis.analysis_failed(pool, fens[0])
+    for fen in fens:
+        assert engine_analysis.request_analysis(pool, fen) is None
+    assert not pool['pending']
+    assert engine_analysis.analysis_failed(pool, fens[1])
+
+
+def test_search_stopped_short_is_served_and_backs_off(tmp_path):
+    pool = engine_analysis.get_analysis_pool(stub_command('--max-depth', '5'), 1, str(tmp_path / 'analysis.sqlite'))
+    assert engine_analysis.request_analysis(pool, START) is None
+    wait_for(pool, START)
+    result = engine_analysis.request_analysis(pool, START)
+    assert result is not None and result['depth'] == 5
+    assert not pool['pending']
+    assert pool['failures'][START]['count'] == 1
+
+
+def test_backoff_grows_and_ends(tmp_path):
+    pool = engine_analysis.get_analysis_pool(stub_command(), 1, str(tmp_path / 'analysis.sqlite'))
+    with pool['lock']:
+        engine_analysis.record_failure(pool, START)
+        first = pool['failures'][START]['retry_at']
+        engine_analysis.record_failure(pool, START)
+        second = pool['failures'][START]['retry_at']
+    assert second - first == pytest.approx(engine_analysis.ANALYSIS_RETRY_DELAY, abs=1)
+    assert engine_analysis.request_analysis(pool, START) is None and not pool['pending']
+    with pool['lock']:
+        pool['failures'][START]['retry_at'] = time.time() - 1
+    assert engine_analysis.request_analysis(pool, START) is None
+    assert (START, engine_analysis.ANALYSIS_DEPTH) in pool['pending']
+    wait_for(pool, START)
+    assert engine_analysis.request_analysis(pool, START)['depth'] == engine_analysis.ANALYSIS_DEPTH
+    assert START not in pool['failures']
@@ -0,0 +1,57 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+import utils
+
+RATINGS = [None, (1200, 1800), (1550, 1650), (2000, 2800)]
+
+
+def filter_cases(raw):
+    categories = raw['time_control_category'].unique().tolist()
+    return itertools.product(categories, [None, True, False], [None, 0, 5], RATINGS)
+
+
+def test_filter_index_matches_masks(raw, data):
+    for category, rated, increment, rating in filter_cases(raw):
+        expected = benchmark.mask_filter(raw, category, rated, increment, rating)
+        filtered = utils.filter_games(data, category, rated, increment, rating)
+        assert filtered['id'].tolist() == expected['id'].tolist(), (category, rated, increment, rating)
+
+
+def test_get_game_finds_every_row_of_an_id(data):
+    duplicated = pd.concat([data, data.iloc[::3]], ignore_index=True)
+    duplicated.attrs = dict(data.attrs, version='duplicated-ids')
+    for game_id in data['id'].iloc[::97].tolist():
+        rows = utils.get_game(duplicated, game_id)
+        assert rows.index.tolist() == duplicated.index[duplicated['id'] == game_id].tolist()
+    assert utils.get_game(duplicated, 'missing').empty
+
+
+def test_opening_games_match_scan(raw, data):
+    for opening in raw['opening_name'].unique():
+        games = utils.get_opening_games(data, opening)
+        assert games['id'].tolist() == raw.loc[raw['opening_name'] == opening, 'id'].tolist()
+    assert utils.get_opening_games(data, 'missing').empty
+
+
+def test_opening_games_limit_keeps_the_first_games(raw, data):
+    opening = raw['opening_name'].value_counts().index[0]
+    expected = raw.loc[raw['opening_name'] == opening, 'id'].tolist()
+    assert utils.get_opening_games(data, opening, limit=3)['id'].tolist() == expected[:3]
+    assert utils.get_opening_games(data, opening, limit=len(expected) + 1)['id'].tolist() == expected
+
+
+def test_filter_cache_is_bounded_by_bytes(raw, data, monkeypatch):
+    monkeypatch.setattr(utils, 'FILTER_CACHE_BUDGET', 16 * 1024)
+    index = utils.build_filter_index.__wrapped__(data, 'small-filter-cache')
+    for category, rated, increment, rating in filter_cases(raw):
+        rows = utils.filter_row_ids(index, category, rated, increment, rating)
+        assert rows.tolist() == benchmark.mask_filter(raw, category, rated, increment, rating).index.tolist()
+        cache = index['cache']
+        assert cache.currsize == sum(cached.nbytes for cached in cache.values())
+        assert cache.currsize <= cache.maxsize == 16 * 1024
+    assert 0 < len(index['cache']) < len(list(filter_cases(raw)))
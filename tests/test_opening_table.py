@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+
+@pytest.fixture(scope='module')
+def table(data):
+    return utils.build_opening_table(data, data.attrs['version'])
+
+
+def test_opening_rows_match_scan(raw, table):
+    for opening, games in raw.groupby('opening_name'):
+        row = utils.opening_row(table, 'opening', opening)
+        assert row['games'] == len(games)
+        for winner in ['white', 'black', 'draw']:
+            assert row[winner] == (games['winner'] == winner).sum()
+        assert row['average_white_rating'] == pytest.approx(games['white_rating'].mean())
+        assert row['average_duration'] == pytest.approx((games['initial_time'] + games['turns'] * games['increment']).mean())
+        lines = games.apply(lambda game: ' '.join(game['moves'].split()[:game['opening_ply']]), axis=1)
+        assert lines.value_counts()[row['opening_moves']] == lines.value_counts().max()
+        counts = games['time_control_category'].value_counts()
+        assert utils.category_games(row)[counts.index].tolist() == counts.tolist()
+
+
+def test_families_and_volumes_roll_up_their_openings(raw, table):
+    families = raw['opening_name'].str.split(':').str[0].str.strip()
+    for family, games in raw.groupby(families):
+        assert utils.opening_row(table, 'family', family)['games'] == len(games)
+    for volume, games in raw.groupby(raw['opening_eco'].str[:1]):
+        assert utils.opening_row(table, 'volume', volume)['games'] == len(games)
+
+
+def test_summary_shares_match_scan(raw, table):
+    for opening, games in raw.groupby('opening_name'):
+        shares = utils.time_control_shares(table, opening).set_index('Time Control Category')['Percentage']
+        expected = games['time_control_category'].value_counts(normalize=True) * 100
+        np.testing.assert_allclose(shares[expected.index], expected)
+        winners = utils.winner_shares(table, opening, True).set_index('Winner')['Percentage']
+        expected = games['winner'].value_counts(normalize=True) * 100
+        np.testing.assert_allclose(winners[expected.index], expected)
+
+
+def test_streamed_table_matches_in_memory(table, dataset_dir):
+    streamed = utils.stream_opening_table(dataset_dir, utils.dataset_dir_version(dataset_dir))
+    pd.testing.assert_frame_equal(streamed.sort_index(axis=1), table.sort_index(axis=1), check_dtype=False)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+import utils
+
+
+def expected_continuations(raw, prefix):
+    """
+    Counts, by scanning every game, the moves played right after a prefix and how those games ended.
+    """
+    tokens = raw['moves'].str.split()
+    plies = len(prefix)
+    through = tokens.map(lambda moves: moves[:plies] == prefix and plies < min(len(moves), utils.TRIE_MAX_PLIES))
+    games = raw[through].assign(Move=tokens[through].str[plies])
+    counts = games.groupby('Move').agg(Games=('id', 'size'), white=('winner', lambda winner: (winner == 'white').sum()),
+                                        black=('winner', lambda winner: (winner == 'black').sum()),
+                                        white_rating=('white_rating', 'sum'))
+    return counts
+
+
+def prefixes(raw):
+    tokens = raw['moves'].str.split()
+    yield []
+    for moves in tokens.iloc[::211]:
+        for plies in [1, 2, 4, 8, utils.TRIE_MAX_PLIES - 1, utils.TRIE_MAX_PLIES]:
+            yield moves[:plies]
+
+
+def test_continuations_match_scan(raw, data):
+    trie = utils.get_opening_trie(data)
+    for prefix in prefixes(raw):
+        expected = expected_continuations(raw, prefix)
+        stats = utils.continuation_stats(trie, prefix)
+        if expected.empty:
+            assert stats is None or stats.empty, prefix
+            continue
+        stats = stats.set_index('Move').sort_index()
+        assert stats.index.tolist() == expected.index.tolist(), prefix
+        assert stats['Games'].tolist() == expected['Games'].tolist()
+        np.testing.assert_allclose(stats['White Wins %'], 100 * expected['white'] / expected['Games'])
+        np.testing.assert_allclose(stats['Black Wins %'], 100 * expected['black'] / expected['Games'])
+        np.testing.assert_allclose(stats['Avg White Rating'], expected['white_rating'] / expected['Games'])
+
+
+def test_unplayed_sequence_is_not_found(data):
+    trie = utils.get_opening_trie(data)
+    assert utils.continuation_stats(trie, ['e4', 'e4']) is None
+    assert utils.trie_lookup(trie, ['not-a-move']) is None
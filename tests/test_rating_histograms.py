@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+RATINGS = [None, (1200, 1800), (1500, 1500), (2000, 2800)]
+
+
+def matching_games(data, category, rated, rating):
+    games = data[data['time_control_category'] == category]
+    if rated is not None:
+        games = games[games['rated'] == rated]
+    if rating is not None:
+        lower, upper = rating
+        games = games[games['white_rating'].between(lower, upper) | games['black_rating'].between(lower, upper)]
+    return games
+
+
+@pytest.fixture(scope='module')
+def histograms(data):
+    return utils.get_rating_histograms(data)
+
+
+@pytest.mark.parametrize('rating', RATINGS)
+@pytest.mark.parametrize('rated', [None, True, False])
+def test_window_results_match_scan(data, histograms, rated, rating):
+    for category in data['time_control_category'].unique():
+        games = matching_games(data, category, rated, rating)
+        expected = games['winner'].astype(str).value_counts().reindex(utils.RATING_WINNERS, fill_value=0)
+        results = utils.rating_window_results(histograms, category, rated, rating)
+        assert results.tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize('rating', RATINGS)
+def test_distribution_matches_plot_ranking(data, histograms, rating):
+    for category in data['time_control_category'].unique():
+        games = matching_games(data, category, None, rating)
+        expected = utils.plot_ranking(games)
+        distribution = utils.rating_distribution(histograms, category, rating=rating)
+        pd.testing.assert_frame_equal(distribution.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize('rating', RATINGS)
+@pytest.mark.parametrize('rated', [None, True, False])
+def test_gap_rates_match_exact_binning(data, histograms, rated, rating):
+    furthest = utils.RATING_GAP_MAX // utils.RATING_GAP_BIN_WIDTH
+    for category in data['time_control_category'].unique():
+        games = matching_games(data, category, rated, rating)
+        gaps = games['white_rating'].to_numpy(np.int64) - games['black_rating'].to_numpy(np.int64)
+        half = utils.RATING_GAP_BIN_WIDTH // 2
+        bins = np.clip(np.floor_divide(gaps + half, utils.RATING_GAP_BIN_WIDTH), -furthest, furthest)
+        expected = pd.crosstab(bins * utils.RATING_GAP_BIN_WIDTH, games['winner'].astype(str).to_numpy())
+        expected = expected.reindex(columns=utils.RATING_WINNERS, fill_value=0)
+        rates = utils.rating_gap_rates(histograms, category, rated, rating, min_games=1)
+        assert rates['Rating Difference'].tolist() == expected.index.tolist()
+        assert rates['Games'].tolist() == expected.sum(axis=1).tolist()
+        shares = 100 * expected.div(expected.sum(axis=1), axis=0)
+        np.testing.assert_allclose(rates['White Wins %'], shares['white'])
+        np.testing.assert_allclose(rates['Draws %'], shares['draw'])
+        np.testing.assert_allclose(rates['Black Wins %'], shares['black'])
+
+
+def test_streamed_histograms_match_in_memory(data, histograms, dataset_dir):
+    streamed = utils.stream_rating_histograms(dataset_dir, utils.dataset_dir_version(dataset_dir))
+    for category in data['time_control_category'].unique():
+        pd.testing.assert_frame_equal(utils.rating_gap_rates(streamed, category, min_games=1),
+                                      utils.rating_gap_rates(histograms, category, min_games=1))
+        assert (utils.rating_window_results(streamed, category, rating=(1200, 1800)).tolist() ==
+                utils.rating_window_results(histograms, category, rating=(1200, 1800)).tolist())
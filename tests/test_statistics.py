@@ -0,0 +1,80 @@
+import itertools
+
+import pandas as pd
+
+import benchmark
+import utils
+
+# Rating ranges on and off the slider's 100-point steps
+RATINGS = [None, (1200, 1800), (1500, 1500), (1550, 1650), (2000, 2800)]
+
+
+def expected_stats(raw, category, rated, increment, rating):
+    return utils.opening_stats_from_games(benchmark.mask_filter(raw, category, rated, increment, rating))
+
+
+def assert_same_stats(stats, expected):
+    stats = stats.rename_axis('opening_name').sort_index()
+    expected = expected.rename_axis('opening_name').sort_index()
+    stats.index = stats.index.astype(str)
+    expected.index = expected.index.astype(str)
+    pd.testing.assert_frame_equal(stats[utils.CUBE_MEASURES].astype('int64'), expected[utils.CUBE_MEASURES].astype('int64'))
+
+
+def cases(raw):
+    return itertools.product(raw['time_control_category'].unique().tolist(), [None, True, False], [None, 0, 10], RATINGS)
+
+
+def test_cube_rollup_matches_scan(raw, data):
+    for category, rated, increment, rating in cases(raw):
+        assert_same_stats(utils.opening_stats(data, category, rated, increment, rating),
+                          expected_stats(raw, category, rated, increment, rating))
+
+
+def test_streamed_rollup_matches_scan(raw, dataset_dir):
+    version = utils.dataset_dir_version(dataset_dir)
+    # Unaligned rating ranges stream the games, so fewer combinations are checked
+    categories = raw['time_control_category'].unique().tolist()
+    for category, rated, increment, rating in itertools.product(categories, [None, True], [None, 10], [None, (1200, 1800), (1550, 1650)]):
+        assert_same_stats(utils.stream_opening_stats(dataset_dir, category, rated, increment, rating, version),
+                          expected_stats(raw, category, rated, increment, rating))
+
+
+def test_streaming_cube_lists_the_filter_values(raw, dataset_dir):
+    cube = utils.get_streaming_cube(dataset_dir)
+    assert sorted(cube['categories']) == sorted(raw['time_control_category'].unique())
+    assert cube['increments'] == sorted(raw['increment'].unique())
+    assert cube['openings'] == sorted(raw['opening_name'].unique())
+    ratings = pd.concat([raw['white_rating'], raw['black_rating']])
+    assert (cube['min_rating'], cube['max_rating']) == (ratings.min(), ratings.max())
+
+
+def test_streamed_opening_games_match_scan(raw, dataset_dir):
+    for opening in raw['opening_name'].unique():
+        games = utils.stream_opening_games(dataset_dir, opening)
+        assert sorted(games['id']) == sorted(raw.loc[raw['opening_name'] == opening, 'id'])
+
+
+def test_streamed_opening_games_are_capped(raw, dataset_dir):
+    opening = raw['opening_name'].value_counts().index[0]
+    ids = set(raw.loc[raw['opening_name'] == opening, 'id'])
+    for limit in [1, 5, len(ids), len(ids) + 10]:
+        games = utils.stream_opening_games(dataset_dir, opening, limit=limit)
+        assert len(games) == min(limit, len(ids))
+        assert set(games['id']) <= ids
+
+
+def test_merged_cube_cells_match_single_pass(raw):
+    games = raw.assign(opening_name=raw['opening_name'].astype(str))
+    chunks = [utils.cube_cells(games.iloc[start:start + 700]) for start in range(0, len(games), 700)]
+    merged = utils.merge_cells(chunks)
+    expected = utils.cube_cells(games)
+    merged = merged.sort_values(utils.CUBE_DIMENSIONS).reset_index(drop=True)
+    expected = expected.sort_values(utils.CUBE_DIMENSIONS).reset_index(drop=True)
+    pd.testing.assert_frame_equal(merged, expected, check_dtype=False)
+
+
+def test_cube_has_one_cell_per_group(raw, data):
+    cells = utils.get_opening_cube(data)['cells']
+    assert len(cells) == len(raw.groupby(utils.CUBE_DIMENSIONS).size())
+    assert cells['games'].sum() == len(raw)
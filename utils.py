@@ -1,192 +1,3157 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import reduce, wraps
+
 import chess
+import chess.polyglot
 import chess.svg
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import streamlit as st
+from cachetools import LRUCache, TTLCache
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+DATA_PATH = 'games_revisited.csv'
+DATASET_DIR = os.environ.get('CHESS_DATASET_DIR')
+CATEGORICAL_COLUMNS = ['opening_name', 'time_control_category', 'winner', 'victory_status']
+IDENTIFIER_COLUMNS = ['id', 'white_id', 'black_id']
+GAMES_FORMAT = 'compact-1'
+PROFILING = os.environ.get('CHESS_PROFILE', '') not in ('', '0')
+PROFILE_METRICS_PATH = os.environ.get('CHESS_PROFILE_FILE', 'chess_metrics.prom')
+RESULT_CACHE_BUDGET = int(float(os.environ.get('CHESS_RESULT_CACHE_MB', 256)) * 2 ** 20)
+RESULT_CACHE_TTL = float(os.environ.get('CHESS_RESULT_CACHE_TTL', 3600))
+MISSING = object()
+
+profile_logger = logging.getLogger('chess.profile')
+profile_state = threading.local()
+profile_totals = {}
+profile_totals_lock = threading.Lock()
+
+
+######################################################################################################
+##################################         INSTRUMENTATION    ########################################
+
+def start_profile():
+    """
+    Starts recording the stages of the current rerun, if profiling is enabled (CHESS_PROFILE=1).
+    """
+    if not PROFILING:
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    profile_state.records = []
+    profile_state.stack = []
+
+@contextmanager
+def profile_stage(name):
+    """
+    Records the wall time, allocated memory, rows processed and cache accesses of a stage of the current rerun.
+
+    Does nothing unless start_profile was called in this thread. Stages can be nested.
+
+    Parameters:
+        name (str): Name of the stage.
+
+    Yields:
+        dict: The stage record, whose 'rows' can be set by the caller; None when not profiling.
+    """
+    records = getattr(profile_state, 'records', None)
+    if records is None:
+        yield None
+        return
+    record = {'stage': name, 'depth': len(profile_state.stack), 'rows': 0, 'cache_hits': 0, 'cache_misses': 0}
+    records.append(record)
+    profile_state.stack.append(record)
+    allocated = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['allocated_bytes'] = tracemalloc.get_traced_memory()[0] - allocated
+        profile_state.stack.pop()
+
+def instrumented(function):
+    """
+    Decorates a function so that each call is recorded as a profile stage named after it.
+
+    The rows processed are the length of the first DataFrame argument. When the rerun is not
+    profiled the function is called directly.
+
+    Parameters:
+        function (callable): The function to instrument.
+
+    Returns:
+        callable: The instrumented function.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if getattr(profile_state, 'records', None) is None:
+            return function(*args, **kwargs)
+        with profile_stage(function.__name__) as record:
+            record['rows'] = next((len(arg) for arg in args if isinstance(arg, pd.DataFrame)), 0)
+            return function(*args, **kwargs)
+    return wrapper
+
+def record_cache_access(hit):
+    """
+    Counts a cache hit or miss against every stage currently running in this thread.
+
+    Parameters:
+        hit (bool): Whether the cache lookup was a hit.
+    """
+    for record in getattr(profile_state, 'stack', None) or []:
+        record['cache_hits' if hit else 'cache_misses'] += 1
+
+def write_profile_metrics(path=PROFILE_METRICS_PATH):
+    """
+    Writes the stage totals accumulated by this process in the Prometheus text format.
+
+    Parameters:
+        path (str): Path of the metrics file, replaced atomically.
+    """
+    metrics = [
+        ('chess_stage_calls_total', 'counter', 'Number of times a stage ran.', 'calls'),
+        ('chess_stage_seconds_total', 'counter', 'Wall time spent in a stage.', 'seconds'),
+        ('chess_stage_rows_total', 'counter', 'Rows processed by a stage.', 'rows'),
+        ('chess_stage_cache_hits_total', 'counter', 'Cache hits during a stage.', 'cache_hits'),
+        ('chess_stage_cache_misses_total', 'counter', 'Cache misses during a stage.', 'cache_misses'),
+        ('chess_stage_last_seconds', 'gauge', 'Wall time of the last run of a stage.', 'last_seconds'),
+        ('chess_stage_last_allocated_bytes', 'gauge', 'Memory allocated by the last run of a stage.', 'last_allocated_bytes')
+    ]
+    with profile_totals_lock:
+        lines = []
+        for metric, kind, description, field in metrics:
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} {kind}']
+            lines += [f'{metric}{{stage="{stage}"}} {totals[field]}' for stage, totals in sorted(profile_totals.items())]
+    results = result_cache_stats()
+    for metric, description, field in [('chess_result_cache_hits_total', 'Shared result cache hits.', 'hits'),
+                                       ('chess_result_cache_misses_total', 'Shared result cache misses.', 'misses')]:
+        lines += [f'# HELP {metric} {description}', f'# TYPE {metric} counter']
+        lines += [f'{metric}{{function="{function}"}} {count}' for function, count in results[field].items()]
+    lines += ['# HELP chess_result_cache_bytes Estimated memory held by the shared result cache.', '# TYPE chess_result_cache_bytes gauge',
+              f"chess_result_cache_bytes {results.attrs['bytes']}"]
+    temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temporary_path, path)
+
+def finish_profile():
+    """
+    Stops recording the current rerun, adds its stages to the process totals, logs them as one JSON
+    line and refreshes the metrics file.
+
+    Returns:
+        list of dict: The stage records of the rerun, or None if it was not profiled.
+    """
+    records = getattr(profile_state, 'records', None)
+    if records is None:
+        return None
+    profile_state.records = profile_state.stack = None
+    with profile_totals_lock:
+        for record in records:
+            totals = profile_totals.setdefault(record['stage'], dict.fromkeys(['calls', 'seconds', 'rows', 'cache_hits', 'cache_misses', 'last_seconds', 'last_allocated_bytes'], 0))
+            totals['calls'] += 1
+            totals['seconds'] += record['seconds']
+            totals['rows'] += record['rows']
+            totals['cache_hits'] += record['cache_hits']
+            totals['cache_misses'] += record['cache_misses']
+            totals['last_seconds'] = record['seconds']
+            totals['last_allocated_bytes'] = record['allocated_bytes']
+    profile_logger.info(json.dumps({'event': 'rerun', 'stages': records}))
+    try:
+        write_profile_metrics()
+    except OSError:
+        profile_logger.warning('Could not write the profile metrics to %s', PROFILE_METRICS_PATH)
+    return records
+
+def display_profile_panel(records):
+    """
+    Displays the stages of the last rerun in a collapsible sidebar panel.
+
+    Parameters:
+        records (list of dict): Stage records returned by finish_profile, or None.
+    """
+    if not records:
+        return
+    with st.sidebar.expander('Debug: rerun profile'):
+        stages = pd.DataFrame(records)
+        stages['stage'] = ['\u2003' * depth + stage for depth, stage in zip(stages['depth'], stages['stage'])]
+        stages['ms'] = (stages['seconds'] * 1000).round(2)
+        stages['allocated KiB'] = (stages['allocated_bytes'] / 1024).round(1)
+        total = sum(record['seconds'] for record in records if record['depth'] == 0)
+        st.write(f"Rerun: {total * 1000:.1f} ms over {len(records)} stages")
+        st.dataframe(stages[['stage', 'ms', 'rows', 'cache_hits', 'cache_misses', 'allocated KiB']], hide_index=True)
+        results = result_cache_stats()
+        st.write(f"Shared results: {results.attrs['entries']} entries, {results.attrs['bytes'] / 2 ** 20:.1f} of {RESULT_CACHE_BUDGET / 2 ** 20:.0f} MiB")
+        st.dataframe(results, hide_index=True)
+
+
+######################################################################################################
+##################################         RESULT CACHE       ########################################
+
+def result_size(value):
+    """
+    Estimates the memory held by a cached result, in bytes.
+
+    Parameters:
+        value: The result.
+
+    Returns:
+        int: Estimated size of the result and everything it references.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, go.Figure):
+        return result_size(value.to_plotly_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_size(key) + result_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(result_size(item) for item in value)
+    return sys.getsizeof(value)
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache(budget=RESULT_CACHE_BUDGET, ttl=RESULT_CACHE_TTL):
+    """
+    Returns the process-wide cache of function results, shared by every session.
+
+    Entries are evicted least recently used first once their estimated sizes exceed the budget, and
+    expire after ttl seconds.
+
+    Parameters:
+        budget (int): Memory budget of the cache, in bytes.
+        ttl (float): Lifetime of an entry, in seconds.
+
+    Returns:
+        dict: The cache, its lock, the computations in flight, per-function hit and miss counters, and
+        the dataset version its entries belong to.
+    """
+    return {
+        'cache': TTLCache(maxsize=budget, ttl=ttl, getsizeof=result_size),
+        'lock': threading.Lock(),
+        'pending': {},
+        'stats': {},
+        'version': None
+    }
+
+def shared_result(function):
+    """
+    Decorates a pure function so that its results are shared by every session through the result cache.
+
+    As with st.cache_resource, parameters whose name starts with an underscore are left out of the
+    key, so the key must include an argument identifying them, e.g. the dataset version. Concurrent
+    calls with the same key wait for a single computation. The decorated function has a clear method
+    dropping its entries.
+
+    Parameters:
+        function (callable): The function to cache.
+
+    Returns:
+        callable: The cached function.
+    """
+    signature = inspect.signature(function)
+    name = function.__name__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (name,) + tuple(value for parameter, value in bound.arguments.items() if not parameter.startswith('_'))
+        results = get_result_cache()
+        with results['lock']:
+            stats = results['stats'].setdefault(name, {'hits': 0, 'misses': 0})
+            value = results['cache'].get(key, MISSING)
+            pending = results['pending'].get(key) if value is MISSING else None
+            owner = value is MISSING and pending is None
+            if owner:
+                pending = results['pending'][key] = Future()
+                stats['misses'] += 1
+            else:
+                stats['hits'] += 1
+        record_cache_access(not owner)
+        if value is not MISSING:
+            return value
+        if not owner:
+            return pending.result()
+        try:
+            value = function(*args, **kwargs)
+        except BaseException as error:
+            with results['lock']:
+                results['pending'].pop(key, None)
+            pending.set_exception(error)
+            raise
+        with results['lock']:
+            results['pending'].pop(key, None)
+            try:
+                results['cache'][key] = value
+            except ValueError:
+                pass
+        pending.set_result(value)
+        return value
+
+    def clear():
+        results = get_result_cache()
+        with results['lock']:
+            for key in [key for key in results['cache'] if key[0] == name]:
+                del results['cache'][key]
+
+    wrapper.clear = clear
+    return wrapper
+
+def retire_results(version):
+    """
+    Empties the result cache when the dataset version changes, so memory is not held by stale entries.
+
+    Parameters:
+        version (str): Version of the dataset now being served.
+    """
+    results = get_result_cache()
+    with results['lock']:
+        if results['version'] != version:
+            results['cache'].clear()
+            results['version'] = version
+
+def result_cache_stats():
+    """
+    Reports the usage of the shared result cache.
+
+    Returns:
+        pd.DataFrame: Hits, misses and hit ratio of every cached function. Its 'entries' and 'bytes'
+        attributes hold the number of cached results and their estimated size.
+    """
+    results = get_result_cache()
+    with results['lock']:
+        stats = pd.DataFrame([{'function': name, **counts} for name, counts in sorted(results['stats'].items())], columns=['function', 'hits', 'misses'])
+        entries, size = len(results['cache']), results['cache'].currsize
+    stats = stats.set_index('function', drop=False)
+    stats['hit_ratio'] = (stats['hits'] / (stats['hits'] + stats['misses']).where(lambda total: total > 0)).fillna(0.0).round(3)
+    stats.attrs['entries'] = entries
+    stats.attrs['bytes'] = size
+    return stats
+
+
+######################################################################################################
+##################################         DATA               ########################################
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Computes the SHA-256 hex digest of a file, reading it in chunks.
+
+    Parameters:
+        path (str): Path of the file to hash.
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def columnar_path(csv_path):
+    """
+    Returns the path of the Parquet copy stored next to a CSV file.
+
+    Parameters:
+        csv_path (str): Path of the source CSV file.
+
+    Returns:
+        str: Path of the Parquet file.
+    """
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def pack_moves(moves):
+    """
+    Packs move strings into one binary value per game holding its moves as little-endian uint16 codes.
+
+    The values share a single Arrow buffer with offsets, at two bytes per ply, and are decoded back to
+    SAN through the move vocabulary only when a game is viewed.
+
+    Parameters:
+        moves (pd.Series): Space-separated SAN move strings, one per game.
+
+    Returns:
+        tuple: The packed moves as a pd.Series of large_binary[pyarrow] values, and the move vocabulary.
+    """
+    encoded = encode_moves(moves)
+    if encoded['codes'].dtype != np.uint16:
+        raise ValueError(f"{len(encoded['vocabulary'])} distinct moves do not fit in uint16 move codes")
+    buffers = [None, pa.py_buffer(encoded['offsets'] * 2), pa.py_buffer(encoded['codes'].astype('<u2'))]
+    packed = pa.LargeBinaryArray.from_buffers(pa.large_binary(), len(moves), buffers)
+    return pd.Series(pd.arrays.ArrowExtensionArray(packed), index=moves.index, name='move_codes'), encoded['vocabulary']
+
+def compact_games(data):
+    """
+    Converts game data to its compact in-memory representation.
+
+    Low-cardinality strings become categoricals, identifiers Arrow strings and timestamps datetimes, with the
+    '-1' sentinel of games whose start and end times coincide as NaT.
+    Integers are downcast to the smallest type holding their values, and the moves are packed by
+    pack_moves into a 'move_codes' column replacing 'moves'.
+
+    Parameters:
+        data (pd.DataFrame): Game data as parsed from the CSV.
+
+    Returns:
+        tuple: The compact game data and its move vocabulary.
+    """
+    data = data.copy()
+    for column in data.columns:
+        if column in IDENTIFIER_COLUMNS:
+            data[column] = data[column].astype(pd.ArrowDtype(pa.string()))
+        elif column.endswith('_datetime'):
+            # The notebook and ingest.py write '-1' for games whose start and end times coincide
+            data[column] = pd.to_datetime(data[column].replace({'-1': None, -1: None}), errors='coerce')
+        elif column == 'opening_eco' or column in CATEGORICAL_COLUMNS:
+            data[column] = data[column].astype('category')
+        elif pd.api.types.is_integer_dtype(data[column]):
+            data[column] = pd.to_numeric(data[column], downcast='integer')
+    packed, vocabulary = pack_moves(data.pop('moves'))
+    data['move_codes'] = packed
+    return data, vocabulary
+
+def move_codes(games):
+    """
+    Returns the moves of a set of games as flat move codes plus per-game offsets, without decoding them.
+
+    For compact game data the codes are a view of the packed buffer. Game data holding move strings,
+    such as games streamed from a partitioned dataset, is encoded on the fly.
+
+    Parameters:
+        games (pd.DataFrame): Games with a 'move_codes' or a 'moves' column.
+
+    Returns:
+        dict: 'codes', 'offsets' and 'vocabulary' arrays, as returned by encode_moves.
+    """
+    if 'move_codes' not in games:
+        return encode_moves(games['moves'])
+    encoded = unpack_moves(pa.array(games['move_codes'].array))
+    encoded['vocabulary'] = games.attrs['move_vocabulary'].to_numpy(zero_copy_only=False)
+    return encoded
+
+def unpack_moves(packed):
+    """
+    Views packed moves as flat move codes plus per-game offsets, without copying them.
+
+    Parameters:
+        packed (pa.LargeBinaryArray): Moves packed by pack_moves.
+
+    Returns:
+        dict: 'codes' and 'offsets' arrays.
+    """
+    _, offset_buffer, code_buffer = packed.buffers()
+    offsets = np.frombuffer(offset_buffer, dtype=np.int64)[packed.offset:packed.offset + len(packed) + 1] // 2
+    codes = np.frombuffer(code_buffer, dtype='<u2') if code_buffer is not None else np.empty(0, dtype=np.uint16)
+    return {'codes': codes[offsets[0]:offsets[-1]], 'offsets': offsets - offsets[0]}
+
+def join_moves(encoded, vocabulary):
+    """
+    Turns move codes back into space-separated SAN strings, one per game.
+
+    Parameters:
+        encoded (dict): 'codes' and 'offsets' arrays, as returned by unpack_moves.
+        vocabulary (np.ndarray): Move vocabulary the codes index.
+
+    Returns:
+        list of str: The moves of each game.
+    """
+    codes, offsets = encoded['codes'], encoded['offsets']
+    return [' '.join(vocabulary[codes[start:end]]) for start, end in zip(offsets[:-1], offsets[1:])]
+
+def decode_moves(games):
+    """
+    Decodes the moves of a few games, e.g. the one being viewed, back into SAN strings.
+
+    Parameters:
+        games (pd.DataFrame): Games with a 'move_codes' or a 'moves' column.
+
+    Returns:
+        pd.Series: Space-separated SAN moves of each game.
+    """
+    if 'move_codes' not in games:
+        return games['moves']
+    encoded = move_codes(games)
+    return pd.Series(join_moves(encoded, encoded['vocabulary']), index=games.index, name='moves', dtype=object)
+
+def read_games_csv(csv_path):
+    """
+    Parses the games CSV with typed columns.
+
+    Parameters:
+        csv_path (str): Path of the CSV file.
+
+    Returns:
+        pd.DataFrame: Game data with categorical columns for the low-cardinality fields.
+    """
+    return pd.read_csv(csv_path, dtype={column: 'category' for column in CATEGORICAL_COLUMNS})
+
+def write_columnar(data, parquet_path, mtime_ns, size, sha256, vocabulary):
+    """
+    Writes compact game data to Parquet, tagging it with the fingerprint of its source CSV.
+
+    Parameters:
+        data (pd.DataFrame): Compact game data to store.
+        parquet_path (str): Destination of the Parquet file.
+        mtime_ns (int): Modification time of the source CSV, in nanoseconds.
+        size (int): Size of the source CSV, in bytes.
+        sha256 (str): Hex digest of the source CSV.
+        vocabulary (np.ndarray): Move vocabulary of the packed moves.
+    """
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata.update({b'source_mtime_ns': str(mtime_ns).encode(), b'source_size': str(size).encode(), b'source_sha256': sha256.encode(),
+                     b'games_format': GAMES_FORMAT.encode(), b'move_vocabulary': json.dumps(vocabulary.tolist()).encode()})
+    pq.write_table(table.replace_schema_metadata(metadata), parquet_path)
+
+def read_columnar_fingerprint(parquet_path):
+    """
+    Reads the source CSV fingerprint stored in a Parquet copy.
+
+    Parameters:
+        parquet_path (str): Path of the Parquet file.
+
+    Returns:
+        dict: The 'mtime_ns', 'size' and 'sha256' of the source CSV, and the 'format' of the copy (None for
+        a plain copy, e.g. one written by ingest.py), or None if the copy is missing or unreadable.
+    """
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    try:
+        return {
+            'mtime_ns': int(metadata[b'source_mtime_ns']),
+            'size': int(metadata[b'source_size']),
+            'sha256': metadata[b'source_sha256'].decode(),
+            'format': metadata.get(b'games_format', b'').decode() or None
+        }
+    except (KeyError, ValueError):
+        return None
+
+def read_columnar(parquet_path):
+    """
+    Reads game data from Parquet, keeping strings and packed moves in their Arrow buffers.
+
+    Parameters:
+        parquet_path (str): Path of the Parquet file.
+
+    Returns:
+        tuple: The game data, and its move vocabulary (None if the moves are not packed).
+    """
+    table = pq.read_table(parquet_path)
+    arrow_types = {pa.string(): pd.ArrowDtype(pa.string()), pa.large_binary(): pd.ArrowDtype(pa.large_binary())}
+    metadata = table.schema.metadata or {}
+    if b'move_vocabulary' not in metadata:
+        return table.to_pandas(), None
+    return table.to_pandas(types_mapper=arrow_types.get), np.asarray(json.loads(metadata[b'move_vocabulary']), dtype=object)
+
+@st.cache_resource(show_spinner='Loading games...')
+def load_columnar(csv_path, mtime_ns, size):
+    """
+    Loads the compact game data from its Parquet copy, rebuilding the copy from the CSV when it is stale.
+
+    The copy is trusted when the CSV mtime and size match the stored fingerprint. Otherwise the CSV is
+    hashed, and only re-parsed if its content actually changed. A plain copy is converted to the
+    compact representation and rewritten. The result is shared across reruns and sessions, keyed on
+    the CSV mtime and size. Its move vocabulary travels with it, as an Arrow array in its 'move_vocabulary'
+    attribute (pandas deep-copies attributes on most operations, which costs a buffer copy for an Arrow array).
+
+    Parameters:
+        csv_path (str): Path of the source CSV file.
+        mtime_ns (int): Modification time of the CSV, in nanoseconds.
+        size (int): Size of the CSV, in bytes.
+
+    Returns:
+        pd.DataFrame: Compact game data, as returned by compact_games.
+    """
+    parquet_path = columnar_path(csv_path)
+    fingerprint = read_columnar_fingerprint(parquet_path)
+    if fingerprint is not None and (fingerprint['mtime_ns'], fingerprint['size'], fingerprint['format']) == (mtime_ns, size, GAMES_FORMAT):
+        data, vocabulary = read_columnar(parquet_path)
+        data.attrs['version'] = fingerprint['sha256']
+        data.attrs['move_vocabulary'] = pa.array(vocabulary, type=pa.string())
+        return data
+
+    sha256 = file_digest(csv_path)
+    if fingerprint is not None and fingerprint['sha256'] == sha256:
+        data, vocabulary = read_columnar(parquet_path)
+        if vocabulary is None:
+            data, vocabulary = compact_games(data)
+    else:
+        data, vocabulary = compact_games(read_games_csv(csv_path))
+    try:
+        write_columnar(data, parquet_path, mtime_ns, size, sha256, vocabulary)
+    except OSError:
+        pass  # Read-only deployments still work, they just re-parse on the next process start
+    data.attrs['version'] = sha256
+    data.attrs['move_vocabulary'] = pa.array(vocabulary, type=pa.string())
+    return data
+
+@instrumented
+def load_data(csv_path=DATA_PATH):
+    """
+    Load and return the chess game data.
+
+    The CSV is parsed once and kept as a typed Parquet copy next to it, which is reused across
+    reruns and sessions until the CSV changes. If only the Parquet copy is deployed, it is used as is.
+
+    Parameters:
+        csv_path (str): Path of the source CSV file.
+
+    Returns:
+        pd.DataFrame: Compact game data, see compact_games. Its 'version' attribute identifies the dataset
+        content; the moves are read through decode_moves or move_codes.
+    """
+    try:
+        stat = os.stat(csv_path)
+    except FileNotFoundError:
+        fingerprint = read_columnar_fingerprint(columnar_path(csv_path))
+        if fingerprint is None:
+            raise
+        data = load_columnar(csv_path, fingerprint['mtime_ns'], fingerprint['size'])
+    else:
+        data = load_columnar(csv_path, stat.st_mtime_ns, stat.st_size)
+    retire_results(data.attrs.get('version'))
+    return data
+
+
+######################################################################################################
+##################################         FILTERS            ########################################
+
+FILTER_CACHE_BUDGET = int(float(os.environ.get('CHESS_FILTER_CACHE_MB', 64)) * 2 ** 20)
+
+def build_postings(column):
+    """
+    Maps every distinct value of a column to the sorted row positions holding it.
+
+    Parameters:
+        column (pd.Series): Column to index.
+
+    Returns:
+        dict: Value -> sorted np.ndarray of row positions.
+    """
+    return {value: np.asarray(rows, dtype=np.int64) for value, rows in column.groupby(column, observed=True, sort=False).indices.items()}
+
+@st.cache_resource(show_spinner=False)
+def build_filter_index(_data, version):
+    """
+    Builds the index used to resolve the sidebar filters without scanning the whole game table.
+
+    Categories, rated flags and increments are stored as sorted row-position lists, and both rating
+    columns are stored sorted along with the row positions they came from, so a rating range is two
+    binary searches. The index is shared across reruns and sessions for a given dataset version.
+
+    Parameters:
+        _data (pd.DataFrame): Game data to index.
+        version (str): Dataset version the index is cached under.
+
+    Returns:
+        dict: The filter index, including an LRU of recently resolved filter combinations, bounded by the
+        FILTER_CACHE_BUDGET bytes of their row positions.
+    """
+    index = {
+        'categories': _data['time_control_category'].unique().tolist(),
+        'increments': sorted(_data['increment'].unique().tolist()),
+        'openings': sorted(_data['opening_name'].unique().tolist()),
+        'time_control_category': build_postings(_data['time_control_category']),
+        'rated': build_postings(_data['rated']),
+        'increment': build_postings(_data['increment']),
+        'cache': LRUCache(maxsize=FILTER_CACHE_BUDGET, getsizeof=lambda rows: rows.nbytes),
+        'lock': threading.Lock()
+    }
+    for column in ['white_rating', 'black_rating']:
+        order = np.argsort(_data[column].to_numpy(), kind='stable')
+        index[column] = (_data[column].to_numpy()[order], order)
+    index['max_rating'] = int(index['white_rating'][0][-1]) if len(_data) else 0
+    return index
+
+def get_filter_index(data):
+    """
+    Returns the filter index of a dataset loaded with load_data.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+
+    Returns:
+        dict: The filter index built by build_filter_index.
+    """
+    return build_filter_index(data, data.attrs.get('version'))
+
+def rating_range_rows(sorted_column, lower, upper):
+    """
+    Returns the row positions whose rating falls within [lower, upper], using binary search.
+
+    Parameters:
+        sorted_column (tuple): Sorted ratings and the row positions they belong to.
+        lower (int): Lower bound of the range, inclusive.
+        upper (int): Upper bound of the range, inclusive.
+
+    Returns:
+        np.ndarray: Matching row positions, unsorted.
+    """
+    ratings, order = sorted_column
+    start = np.searchsorted(ratings, lower, side='left')
+    end = np.searchsorted(ratings, upper, side='right')
+    return order[start:end]
+
+def intersect_sorted(small, large):
+    """
+    Intersects two sorted arrays of unique row positions in O(len(small) * log(len(large))).
+
+    Parameters:
+        small (np.ndarray): The smaller sorted array.
+        large (np.ndarray): The larger sorted array.
+
+    Returns:
+        np.ndarray: Sorted row positions present in both arrays.
+    """
+    if len(small) == 0 or len(large) == 0:
+        return small[:0]
+    positions = np.searchsorted(large, small).clip(max=len(large) - 1)
+    return small[large[positions] == small]
+
+def filter_row_ids(index, category, rated=None, increment=None, rating=None):
+    """
+    Resolves a combination of sidebar filters to the sorted row positions that satisfy all of them.
+
+    Parameters:
+        index (dict): Filter index built by build_filter_index.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+
+    Returns:
+        np.ndarray: Sorted row positions of the matching games.
+    """
+    key = (category, rated, increment, rating)
+    with index['lock']:
+        rows = index['cache'].get(key)
+    record_cache_access(rows is not None)
+    if rows is not None:
+        return rows
+
+    empty = np.empty(0, dtype=np.int64)
+    candidates = [index['time_control_category'].get(category, empty)]
+    if rated is not None:
+        candidates.append(index['rated'].get(rated, empty))
+    if increment is not None:
+        candidates.append(index['increment'].get(increment, empty))
+    if rating is not None:
+        lower, upper = rating
+        candidates.append(np.union1d(rating_range_rows(index['white_rating'], lower, upper),
+                                     rating_range_rows(index['black_rating'], lower, upper)))
+    rows = reduce(intersect_sorted, sorted(candidates, key=len))
+    if rows.nbytes <= index['cache'].maxsize:
+        with index['lock']:
+            index['cache'][key] = rows
+    return rows
+
+@instrumented
+def filter_games(data, category, rated=None, increment=None, rating=None):
+    """
+    Returns the games matching the sidebar filters, resolved through the dataset's filter index.
+
+    Parameters:
+        data (pd.DataFrame): Game data loaded with load_data.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+
+    Returns:
+        pd.DataFrame: The matching games.
+    """
+    rows = filter_row_ids(get_filter_index(data), category, rated, increment, rating)
+    return data.iloc[rows]
+
+
+######################################################################################################
+##################################         LOOKUPS            ########################################
+
+@st.cache_resource(show_spinner=False)
+def build_game_index(_data, version):
+    """
+    Builds the primary-key and opening indexes of the game table, once per dataset version.
+
+    Rows are not physically reordered (other indexes refer to row positions), so each index is a
+    permutation of the rows sorted by key, where the rows of each key form one contiguous range.
+    Game ids are not unique in the dataset, so they are de-duplicated into a hashed pandas Index
+    whose positions locate the range of each id's rows.
+
+    Parameters:
+        _data (pd.DataFrame): Game data to index.
+        version (str): Dataset version the index is cached under.
+
+    Returns:
+        dict: 'ids' (pd.Index of the distinct game ids), 'id_order' (row positions sorted by id),
+        'id_bounds' (start of each id's range of 'id_order', followed by its length),
+        'opening_order' (row positions sorted by opening) and 'opening_ranges' (opening -> (start, end)
+        range of 'opening_order').
+    """
+    id_codes, ids = pd.factorize(_data['id'])
+    codes, openings = pd.factorize(_data['opening_name'])
+    order = np.argsort(codes, kind='stable')
+    ends = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(openings)))
+    starts = ends - np.bincount(codes[codes >= 0], minlength=len(openings))
+    return {
+        'ids': pd.Index(ids),
+        'id_order': np.argsort(id_codes, kind='stable')[np.count_nonzero(id_codes < 0):],
+        'id_bounds': np.concatenate([[0], np.cumsum(np.bincount(id_codes[id_codes >= 0], minlength=len(ids)))]),
+        'opening_order': order[np.count_nonzero(codes < 0):],
+        'opening_ranges': {opening: (int(start), int(end)) for opening, start, end in zip(openings, starts, ends)}
+    }
+
+def get_game_index(data):
+    """
+    Returns the primary-key and opening indexes of a dataset loaded with load_data.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+
+    Returns:
+        dict: The indexes built by build_game_index.
+    """
+    return build_game_index(data, data.attrs.get('version'))
+
+@instrumented
+def get_game(data, game_id):
+    """
+    Fetches a game by id through the primary-key index.
+
+    Parameters:
+        data (pd.DataFrame): Game data loaded with load_data.
+        game_id (str): Id of the game.
+
+    Returns:
+        pd.DataFrame: The rows with this id, empty if there is none.
+    """
+    index = get_game_index(data)
+    try:
+        position = index['ids'].get_loc(game_id)
+    except KeyError:
+        return data.iloc[:0]
+    bounds = index['id_bounds']
+    return data.iloc[index['id_order'][bounds[position]:bounds[position + 1]]]
+
+@instrumented
+def get_opening_games(data, opening, limit=None):
+    """
+    Fetches the games of an opening through the opening index, in O(number of games of the opening).
+
+    Parameters:
+        data (pd.DataFrame): Game data loaded with load_data.
+        opening (str): Name of the opening.
+        limit (int, optional): Maximum number of games fetched; None fetches all of them.
+
+    Returns:
+        pd.DataFrame: The first `limit` games of the opening, in their original order.
+    """
+    index = get_game_index(data)
+    start, end = index['opening_ranges'].get(opening, (0, 0))
+    if limit is not None:
+        end = min(end, start + limit)
+    return data.iloc[index['opening_order'][start:end]]
+
+
+######################################################################################################
+##################################         STATISTICS         ########################################
+
+CUBE_DIMENSIONS = ['opening_name', 'time_control_category', 'rated', 'increment']
+CUBE_MEASURES = ['games', 'white', 'black', 'draw', 'duration_sum']
+RATING_STATS_COLUMNS = ['opening_name', 'winner', 'initial_time', 'turns', 'increment']
+
+def opening_stats_from_games(data):
+    """
+    Aggregates raw games into per-opening statistics.
+
+    Parameters:
+        data (pd.DataFrame): Game data.
+
+    Returns:
+        pd.DataFrame: One row per opening with 'games', 'white', 'black', 'draw' and 'duration_sum' columns.
+    """
+    measures = pd.DataFrame({
+        'opening_name': data['opening_name'],
+        'games': 1,
+        'white': (data['winner'] == 'white').astype(np.int64),
+        'black': (data['winner'] == 'black').astype(np.int64),
+        'draw': (data['winner'] == 'draw').astype(np.int64),
+        'duration_sum': data['initial_time'].astype(np.int64) + data['turns'].astype(np.int64) * data['increment']
+    })
+    return measures.groupby('opening_name', observed=True)[CUBE_MEASURES].sum()
+
+def cube_cells(data):
+    """
+    Aggregates games into opening statistics cube cells.
+
+    Each cell holds the game count, the win/draw counts and the summed game duration for one
+    (opening, time control category, rated, increment) combination. Ratings are left out: crossing
+    both players' ratings would leave about one cell per game, see rollup_opening_stats.
+
+    Parameters:
+        data (pd.DataFrame): Game data to aggregate.
+
+    Returns:
+        pd.DataFrame: One row per non-empty cell, with the CUBE_DIMENSIONS and CUBE_MEASURES columns.
+    """
+    games = data[CUBE_DIMENSIONS].copy()
+    games['games'] = 1
+    for winner in ['white', 'black', 'draw']:
+        games[winner] = (data['winner'] == winner).astype(np.int64)
+    games['duration_sum'] = data['initial_time'].astype(np.int64) + data['turns'].astype(np.int64) * data['increment']
+    return games.groupby(CUBE_DIMENSIONS, observed=True, sort=False)[CUBE_MEASURES].sum().reset_index()
+
+@st.cache_resource(show_spinner=False)
+def build_opening_cube(_data, version):
+    """
+    Pre-aggregates the games into an opening statistics cube, once per dataset version.
+
+    Parameters:
+        _data (pd.DataFrame): Game data to aggregate.
+        version (str): Dataset version the cube is cached under.
+
+    Returns:
+        dict: The cube cells as a DataFrame under 'cells', plus the dataset's rating bounds.
+    """
+    ratings = np.concatenate([_data['white_rating'].to_numpy(), _data['black_rating'].to_numpy()])
+    return {
+        'cells': cube_cells(_data),
+        'min_rating': int(ratings.min()) if len(ratings) else 0,
+        'max_rating': int(ratings.max()) if len(ratings) else 0
+    }
+
+def get_opening_cube(data):
+    """
+    Returns the opening statistics cube of a dataset loaded with load_data.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+
+    Returns:
+        dict: The cube built by build_opening_cube.
+    """
+    return build_opening_cube(data, data.attrs.get('version'))
+
+@instrumented
+def opening_stats(data, category, rated=None, increment=None, rating=None):
+    """
+    Returns per-opening statistics for the games matching the sidebar filters.
+
+    Without a rating range the statistics are rolled up from the opening cube, so the cost depends on
+    the number of cube cells rather than the number of games. With one, the games matching the filters
+    are resolved through the filter index and aggregated.
+
+    Parameters:
+        data (pd.DataFrame): Game data loaded with load_data.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+
+    Returns:
+        pd.DataFrame: One row per opening with at least one matching game, with 'games', 'white', 'black', 'draw' and 'duration_sum' columns.
+    """
+    return rollup_opening_stats(data, data.attrs.get('version'), category, rated, increment, rating)
+
+@shared_result
+def rollup_opening_stats(_data, version, category, rated, increment, rating):
+    """
+    Computes the statistics returned by opening_stats, sharing them across sessions.
+
+    Parameters:
+        _data (pd.DataFrame): Game data loaded with load_data.
+        version (str): Dataset version the statistics are cached under.
+        category (str): Time control category to keep.
+        rated (bool): Rated flag to keep, or None.
+        increment (int): Time increment to keep, or None.
+        rating (tuple): Rating range to keep, or None.
+
+    Returns:
+        pd.DataFrame: Per-opening statistics of the matching games.
+    """
+    if rating is not None:
+        rows = filter_row_ids(get_filter_index(_data), category, rated, increment, rating)
+        return opening_stats_from_games(_data.iloc[rows, _data.columns.get_indexer(RATING_STATS_COLUMNS)])
+    return rollup_cube(get_opening_cube(_data), category, rated, increment)
+
+def rollup_cube(cube, category, rated=None, increment=None):
+    """
+    Rolls the cells of an opening statistics cube matching the sidebar filters up per opening.
+
+    Parameters:
+        cube (dict): Cube built by build_opening_cube or build_streaming_cube.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+
+    Returns:
+        pd.DataFrame: One row per opening with at least one matching game, with the CUBE_MEASURES columns.
+    """
+    cells = cube['cells']
+    mask = cells['time_control_category'] == category
+    if rated is not None:
+        mask &= cells['rated'] == rated
+    if increment is not None:
+        mask &= cells['increment'] == increment
+    return cells[mask].groupby('opening_name', observed=True)[CUBE_MEASURES].sum()
+
+
+######################################################################################################
+##################################         RATING HISTOGRAMS  ########################################
+
+RATING_BIN_WIDTH = 25
+RATING_WINNERS = ['white', 'black', 'draw']
+RATING_GAP_BIN_WIDTH = 50
+RATING_GAP_MAX = 600
+RATING_GAP_MIN_GAMES = 20
+
+def rating_key(ratings, width):
+    """
+    Maps ratings to rating keys.
+
+    Ratings that are an exact multiple of the bucket width get an even key of their own, and the
+    ratings strictly between two multiples share the odd key in between. That way an inclusive rating
+    range whose bounds are multiples of the bucket width (as the sidebar slider produces) maps to an
+    exact range of keys.
+
+    Parameters:
+        ratings (np.ndarray or int): Ratings to map.
+        width (int): Width of the rating buckets.
+
+    Returns:
+        np.ndarray or int: The rating keys.
+    """
+    return 2 * (ratings // width) + (ratings % width != 0)
+
+def rating_key_range(rating, min_rating, max_rating, width):
+    """
+    Converts an inclusive rating range into the matching inclusive range of rating keys.
+
+    Parameters:
+        rating (tuple): (lower, upper) rating bounds.
+        min_rating (int): Lowest rating present in the dataset.
+        max_rating (int): Highest rating present in the dataset.
+        width (int): Width of the rating buckets.
+
+    Returns:
+        tuple: (lower, upper) key bounds, or None if the bounds fall inside a bucket and cannot be answered exactly.
+    """
+    lower, upper = rating
+    if lower % width and lower > min_rating:
+        return None
+    if upper % width and upper < max_rating:
+        return None
+    return int(rating_key(max(lower, min_rating), width)), int(rating_key(min(upper, max_rating), width))
+
+def rating_gap_bin(gaps):
+    """
+    Maps rating differences to RATING_GAP_BIN_WIDTH bins centred on multiples of the bin width, before clipping.
+
+    Parameters:
+        gaps (np.ndarray): Integer rating differences, white minus black.
+
+    Returns:
+        np.ndarray: Bin numbers; bin b holds the differences in [b * width - width / 2, b * width + width / 2).
+    """
+    return np.floor_divide(gaps + RATING_GAP_BIN_WIDTH // 2, RATING_GAP_BIN_WIDTH)
+
+def rating_key_bounds(keys):
+    """
+    Returns the lowest and highest integer rating of each rating key at RATING_BIN_WIDTH.
+
+    Parameters:
+        keys (np.ndarray): Rating keys, as returned by rating_key.
+
+    Returns:
+        tuple: Arrays of the lowest and highest rating; even keys hold one rating, odd keys the ones strictly between two multiples.
+    """
+    odd = keys % 2
+    return keys // 2 * RATING_BIN_WIDTH + odd, keys // 2 * RATING_BIN_WIDTH + odd * (RATING_BIN_WIDTH - 1)
+
+def cell_gap_bins(white_keys, black_keys):
+    """
+    Returns the rating difference bin of the lowest difference a (white key, black key) cell can hold.
+
+    A cell spans less than one RATING_GAP_BIN_WIDTH of differences, so each of its games falls in
+    this bin or the next one.
+
+    Parameters:
+        white_keys (np.ndarray): White rating keys.
+        black_keys (np.ndarray): Black rating keys, broadcastable against white_keys.
+
+    Returns:
+        np.ndarray: Unclipped bin numbers, see rating_gap_bin.
+    """
+    return rating_gap_bin(rating_key_bounds(white_keys)[0] - rating_key_bounds(black_keys)[1])
+
+def rating_histogram_counts(games, first_key, keys):
+    """
+    Counts games per (time control category, rated flag, winner, white rating key, black rating key).
+
+    Ratings are keyed by rating_key at RATING_BIN_WIDTH, so rating windows whose bounds are multiples
+    of the bin width are answered exactly. The games whose rating difference falls in the bin above
+    their cell's lowest one (see cell_gap_bins) are counted again apart, so differences are binned exactly too.
+
+    Parameters:
+        games (pd.DataFrame): Games with 'time_control_category', 'rated', 'winner', 'white_rating' and 'black_rating'.
+        first_key (int): Rating key of the first histogram row and column.
+        keys (int): Number of rating keys along each axis.
+
+    Returns:
+        dict: Category -> np.ndarray of counts, shaped (all games or upper gap bin games, rated flag, winner, white key, black key).
+    """
+    white_ratings, black_ratings = games['white_rating'].to_numpy(np.int64), games['black_rating'].to_numpy(np.int64)
+    white = np.clip(rating_key(white_ratings, RATING_BIN_WIDTH) - first_key, 0, keys - 1)
+    black = np.clip(rating_key(black_ratings, RATING_BIN_WIDTH) - first_key, 0, keys - 1)
+    upper = rating_gap_bin(white_ratings - black_ratings) > cell_gap_bins(white + first_key, black + first_key)
+    winner = pd.Categorical(games['winner'].astype(str), categories=RATING_WINNERS).codes.astype(np.int64)
+    cells = ((games['rated'].to_numpy(bool) * len(RATING_WINNERS) + winner) * keys + white) * keys + black
+    category_codes, categories = pd.factorize(games['time_control_category'].astype(str))
+    shape = (2, len(RATING_WINNERS), keys, keys)
+    counts = {}
+    for code, category in enumerate(categories):
+        selected = (category_codes == code) & (winner >= 0)
+        counts[category] = np.stack([np.bincount(cells[selected], minlength=np.prod(shape)).reshape(shape),
+                                     np.bincount(cells[selected & upper], minlength=np.prod(shape)).reshape(shape)])
+    return counts
+
+def rating_histograms(counts, first_key, keys, min_rating, max_rating):
+    """
+    Turns rating histogram counts into the prefix sums every rating query is answered from.
+
+    Parameters:
+        counts (dict): Counts returned by rating_histogram_counts.
+        first_key (int): Rating key of the first histogram row and column.
+        keys (int): Number of rating keys along each axis.
+        min_rating (int): Lowest rating of the histogrammed games.
+        max_rating (int): Highest rating of the histogrammed games.
+
+    Returns:
+        dict: The histogram bounds, 'prefix' (category -> inclusive 2D prefix sums over the rating axes,
+        padded with a leading zero row and column), 'gap_upper' (category -> counts of the games in the
+        upper difference bin of their cell) and 'gap_bins' (lower and upper rating difference bins of every cell,
+        as positions along the difference axis).
+    """
+    positions = np.arange(first_key, first_key + keys)
+    furthest = RATING_GAP_MAX // RATING_GAP_BIN_WIDTH
+    gaps = cell_gap_bins(positions[:, None], positions[None, :])
+    return {
+        'first_key': first_key,
+        'keys': keys,
+        'min_rating': min_rating,
+        'max_rating': max_rating,
+        'prefix': {category: np.pad(count[0].cumsum(axis=-1).cumsum(axis=-2), [(0, 0), (0, 0), (1, 0), (1, 0)]) for category, count in counts.items()},
+        'gap_upper': {category: count[1] for category, count in counts.items()},
+        'gap_bins': np.clip(np.stack([gaps, gaps + 1]), -furthest, furthest) + furthest
+    }
+
+@st.cache_resource(show_spinner=False)
+def build_rating_histograms(_data, version, increment=None):
+    """
+    Builds the rating histograms of in-memory game data, once per dataset version and time increment.
+
+    Parameters:
+        _data (pd.DataFrame): Game data loaded with load_data.
+        version (str): Dataset version the histograms are cached under.
+        increment (int, optional): Only histogram the games with this time increment; None keeps all.
+
+    Returns:
+        dict: The histograms returned by rating_histograms.
+    """
+    games = _data if increment is None else _data[_data['increment'] == increment]
+    ratings = np.concatenate([games['white_rating'].to_numpy(np.int64), games['black_rating'].to_numpy(np.int64)])
+    min_rating, max_rating = (int(ratings.min()), int(ratings.max())) if len(ratings) else (0, 0)
+    first_key = int(rating_key(min_rating, RATING_BIN_WIDTH))
+    keys = int(rating_key(max_rating, RATING_BIN_WIDTH)) - first_key + 1
+    return rating_histograms(rating_histogram_counts(games, first_key, keys), first_key, keys, min_rating, max_rating)
+
+@st.cache_resource(show_spinner='Aggregating ratings...')
+def stream_rating_histograms(dataset_dir, version, increment=None):
+    """
+    Builds the rating histograms of a partitioned dataset by streaming its games, once per dataset version and time increment.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        version (str): Dataset version the histograms are cached under.
+        increment (int, optional): Only histogram the games with this time increment; None keeps all.
+
+    Returns:
+        dict: The histograms returned by rating_histograms.
+    """
+    cube = build_streaming_cube(dataset_dir, version)
+    first_key = int(rating_key(cube['min_rating'], RATING_BIN_WIDTH))
+    keys = int(rating_key(cube['max_rating'], RATING_BIN_WIDTH)) - first_key + 1
+    counts = {}
+    columns = ['time_control_category', 'rated', 'winner', 'white_rating', 'black_rating']
+    for chunk in iter_games(dataset_dir, columns=columns, increment=increment):
+        for category, count in rating_histogram_counts(chunk, first_key, keys).items():
+            counts[category] = counts[category] + count if category in counts else count
+    return rating_histograms(counts, first_key, keys, cube['min_rating'], cube['max_rating'])
+
+def get_rating_histograms(data, increment=None):
+    """
+    Returns the rating histograms of a dataset loaded with load_data.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+        increment (int, optional): Only count the games with this time increment; None keeps all.
+
+    Returns:
+        dict: The histograms built by build_rating_histograms.
+    """
+    return build_rating_histograms(data, data.attrs.get('version'), increment)
+
+def get_streamed_rating_histograms(dataset_dir=DATASET_DIR, increment=None, version=None):
+    """
+    Returns the rating histograms of a partitioned dataset.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        increment (int, optional): Only count the games with this time increment; None keeps all.
+        version (str, optional): Dataset version returned by dataset_dir_version; fingerprinted again when None.
+
+    Returns:
+        dict: The histograms built by stream_rating_histograms.
+    """
+    return stream_rating_histograms(dataset_dir, version or dataset_dir_version(dataset_dir), increment)
+
+def rating_prefix(histograms, category, rated=None):
+    """
+    Selects the prefix sums of a time control category and rated flag.
+
+    Parameters:
+        histograms (dict): Histograms returned by rating_histograms.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+
+    Returns:
+        np.ndarray: Prefix sums shaped (rated flags, winner, white key + 1, black key + 1), or None if the category has no games.
+    """
+    prefix = histograms['prefix'].get(category)
+    if prefix is None or rated is None:
+        return prefix
+    return prefix[int(rated):int(rated) + 1]
+
+def rating_window(histograms, rating=None):
+    """
+    Converts an inclusive rating range into a half-open range of histogram rows (or columns).
+
+    Bounds that are not multiples of RATING_BIN_WIDTH are rounded outwards to the enclosing bin.
+
+    Parameters:
+        histograms (dict): Histograms returned by rating_histograms.
+        rating (tuple, optional): (lower, upper) rating bounds; None covers every rating.
+
+    Returns:
+        tuple: (start, end) positions along a rating axis.
+    """
+    if rating is None:
+        return 0, histograms['keys']
+    key_range = rating_key_range(rating, histograms['min_rating'], histograms['max_rating'], RATING_BIN_WIDTH)
+    if key_range is None:
+        lower, upper = rating
+        key_range = (rating_key(max(lower, histograms['min_rating']), RATING_BIN_WIDTH), rating_key(min(upper, histograms['max_rating']), RATING_BIN_WIDTH))
+    start = min(max(int(key_range[0]) - histograms['first_key'], 0), histograms['keys'])
+    end = min(max(int(key_range[1]) - histograms['first_key'] + 1, start), histograms['keys'])
+    return start, end
+
+def rating_box(prefix, white_window, black_window):
+    """
+    Sums histogram cells over a box of white and black rating keys, with four prefix sum lookups.
+
+    Parameters:
+        prefix (np.ndarray): Prefix sums returned by rating_prefix.
+        white_window (tuple): Half-open (start, end) range of white rating positions.
+        black_window (tuple): Half-open (start, end) range of black rating positions.
+
+    Returns:
+        np.ndarray: The box sums, over the leading (rated flag, winner) axes.
+    """
+    (a, b), (c, d) = white_window, black_window
+    return prefix[..., b, d] - prefix[..., a, d] - prefix[..., b, c] + prefix[..., a, c]
+
+@instrumented
+def rating_window_results(histograms, category, rated=None, rating=None):
+    """
+    Counts the games in which either player's rating falls in a window, per winner, in constant time.
+
+    Parameters:
+        histograms (dict): Histograms returned by rating_histograms.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+
+    Returns:
+        pd.Series: Number of games won by 'white' and 'black', and drawn.
+    """
+    prefix = rating_prefix(histograms, category, rated)
+    if prefix is None:
+        return pd.Series(0, index=RATING_WINNERS)
+    window, everything = rating_window(histograms, rating), (0, histograms['keys'])
+    counts = rating_box(prefix, window, everything) + rating_box(prefix, everything, window) - rating_box(prefix, window, window)
+    return pd.Series(counts.sum(axis=0), index=RATING_WINNERS)
+
+@instrumented
+def rating_distribution(histograms, category, rated=None, rating=None):
+    """
+    Counts the ratings of both players of the games matching the filters, in RATING_BIN_WIDTH bins.
+
+    Each rating row and column is read off the prefix sums, so the cost depends on the number of bins
+    only. The result matches plot_ranking on the matching games.
+
+    Parameters:
+        histograms (dict): Histograms returned by rating_histograms.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+
+    Returns:
+        pd.DataFrame: 'Rating' (lower bound of each bin) and 'Frequency' columns.
+    """
+    prefix = rating_prefix(histograms, category, rated)
+    if prefix is None:
+        return plot_ranking(pd.DataFrame({'white_rating': [], 'black_rating': []}))
+    keys = histograms['keys']
+    start, end = rating_window(histograms, rating)
+    inside = (np.arange(keys) >= start) & (np.arange(keys) < end)
+
+    def per_white_key(c, d):
+        return (prefix[..., 1:, d] - prefix[..., :-1, d] - prefix[..., 1:, c] + prefix[..., :-1, c]).sum(axis=(0, 1))
+
+    def per_black_key(a, b):
+        return (prefix[..., b, 1:] - prefix[..., b, :-1] - prefix[..., a, 1:] + prefix[..., a, :-1]).sum(axis=(0, 1))
+
+    # A player whose own rating is in the window counts whatever the opponent's rating, the others only against one in it
+    white = np.where(inside, per_white_key(0, keys), per_white_key(start, end))
+    black = np.where(inside, per_black_key(0, keys), per_black_key(start, end))
+    bins = (histograms['first_key'] + np.arange(keys)) // 2
+    frequency = np.bincount(bins - bins[0], weights=white + black).astype(np.int64)
+    played = np.flatnonzero(frequency)
+    if not len(played):
+        return plot_ranking(pd.DataFrame({'white_rating': [], 'black_rating': []}))
+    first, last = played[0], played[-1] + 1
+    return pd.DataFrame({'Rating': (np.arange(first, last) + bins[0]) * RATING_BIN_WIDTH, 'Frequency': frequency[first:last]})
+
+@instrumented
+def rating_gap_rates(histograms, category, rated=None, rating=None, min_games=RATING_GAP_MIN_GAMES):
+    """
+    Computes win and draw rates by rating difference (white minus black) for the games matching the filters.
+
+    Differences are grouped in RATING_GAP_BIN_WIDTH bins centred on multiples of the width (see
+    rating_gap_bin), larger ones than RATING_GAP_MAX either way falling in the outermost bins. Each
+    histogram cell splits its games between its two bins, so the counts match binning every game's
+    difference. The cost depends on the number of rating bins only.
+
+    Parameters:
+        histograms (dict): Histograms returned by rating_histograms.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+        min_games (int): Differences with fewer games are left out.
+
+    Returns:
+        pd.DataFrame: 'Rating Difference', 'Games', 'White Wins %', 'Draws %' and 'Black Wins %' columns.
+    """
+    prefix = rating_prefix(histograms, category, rated)
+    columns = ['Rating Difference', 'Games', 'White Wins %', 'Draws %', 'Black Wins %']
+    if prefix is None:
+        return pd.DataFrame(columns=columns)
+    counts = np.diff(np.diff(prefix.sum(axis=0), axis=-1), axis=-2)
+    upper = histograms['gap_upper'][category]
+    upper = (upper if rated is None else upper[int(rated):int(rated) + 1]).sum(axis=0)
+    start, end = rating_window(histograms, rating)
+    inside = (np.arange(histograms['keys']) >= start) & (np.arange(histograms['keys']) < end)
+    mask = inside[:, None] | inside[None, :]
+    furthest = RATING_GAP_MAX // RATING_GAP_BIN_WIDTH
+    lower_bins, upper_bins = histograms['gap_bins'][:, mask]
+    results = np.stack([np.bincount(lower_bins, weights=(counts[winner] - upper[winner])[mask], minlength=2 * furthest + 1) +
+                        np.bincount(upper_bins, weights=upper[winner][mask], minlength=2 * furthest + 1)
+                        for winner in range(len(RATING_WINNERS))])
+    games = results.sum(axis=0)
+    kept = games >= max(min_games, 1)
+    shares = 100 * results[:, kept] / games[kept]
+    return pd.DataFrame({
+        'Rating Difference': (np.flatnonzero(kept) - furthest) * RATING_GAP_BIN_WIDTH,
+        'Games': games[kept].astype(np.int64),
+        'White Wins %': shares[RATING_WINNERS.index('white')],
+        'Draws %': shares[RATING_WINNERS.index('draw')],
+        'Black Wins %': shares[RATING_WINNERS.index('black')]
+    }, columns=columns)
+
+
+######################################################################################################
+##################################         STREAMING          ########################################
+
+STREAM_BATCH_SIZE = 100_000
+STREAM_ROW_GROUP_SIZE = 100_000
+OPENING_BUCKETS = 16
+OPENING_GAMES_ROWS = 1000
+
+def build_partitioned_dataset(source_path, dataset_dir, batch_size=STREAM_BATCH_SIZE):
+    """
+    Converts a games CSV or Parquet file into a Parquet dataset partitioned by time control category and opening bucket.
+
+    The source is streamed batch by batch, so the conversion runs in bounded memory whatever its size.
+    Moves packed by the app's Parquet copy are written back as SAN strings. Each partition is split into row groups of STREAM_ROW_GROUP_SIZE games, whose statistics let
+    filters skip row groups without reading them. Openings are not sorted, so their row group statistics
+    would exclude nothing; the opening bucket partition lets the games of an opening be read from 1/OPENING_BUCKETS of the dataset.
+
+    Parameters:
+        source_path (str): Path of the games CSV or Parquet file.
+        dataset_dir (str): Directory of the partitioned dataset, replaced if it exists.
+        batch_size (int): Number of games read at a time.
+    """
+    if source_path.endswith('.parquet'):
+        batches = pq.ParquetFile(source_path).iter_batches(batch_size=batch_size)
+        schema = pq.read_schema(source_path)
+        if b'move_vocabulary' in (schema.metadata or {}):
+            vocabulary = np.asarray(json.loads(schema.metadata[b'move_vocabulary']), dtype=object)
+            batches = (unpack_move_batch(batch, vocabulary) for batch in batches)
+            schema = pa.schema([pa.field('moves', pa.string()) if field.name == 'move_codes' else field for field in schema.remove_metadata()])
+    else:
+        column_types = {column: pa.dictionary(pa.int32(), pa.string()) for column in CATEGORICAL_COLUMNS if column != 'time_control_category'}
+        batches = pacsv.open_csv(source_path, read_options=pacsv.ReadOptions(block_size=1 << 26), convert_options=pacsv.ConvertOptions(column_types=column_types))
+        schema = batches.schema
+    batches = (add_opening_bucket(batch) for batch in batches)
+    schema = schema.append(pa.field('opening_bucket', pa.int32()))
+    # Partitions absent from the new data would otherwise survive from the previous dataset
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    ds.write_dataset(batches, dataset_dir, schema=schema, format='parquet', partitioning=['time_control_category', 'opening_bucket'], partitioning_flavor='hive',
+                     max_rows_per_group=STREAM_ROW_GROUP_SIZE, min_rows_per_group=min(STREAM_ROW_GROUP_SIZE, batch_size))
+
+def opening_bucket(opening):
+    """
+    Returns the partition an opening's games are stored in, stable across processes and datasets.
+
+    Parameters:
+        opening (str): Name of the opening.
+
+    Returns:
+        int: Bucket number, below OPENING_BUCKETS.
+    """
+    return zlib.crc32(opening.encode()) % OPENING_BUCKETS
+
+def add_opening_bucket(batch):
+    """
+    Appends the 'opening_bucket' partition column to a record batch of games.
+
+    The bucket is hashed once per distinct opening of the batch.
+
+    Parameters:
+        batch (pa.RecordBatch): Batch of games with an 'opening_name' column.
+
+    Returns:
+        pa.RecordBatch: The batch with an int32 'opening_bucket' column.
+    """
+    openings = pc.dictionary_encode(batch.column('opening_name'))
+    buckets = np.array([opening_bucket(opening) for opening in openings.dictionary.to_pylist()], dtype=np.int32)
+    codes = pc.fill_null(openings.indices, 0).to_numpy(zero_copy_only=False)
+    return pa.RecordBatch.from_arrays(batch.columns + [pa.array(buckets[codes] if len(buckets) else codes.astype(np.int32))],
+                                      names=batch.schema.names + ['opening_bucket'])
+
+def unpack_move_batch(batch, vocabulary):
+    """
+    Replaces the packed 'move_codes' column of a record batch by SAN move strings.
+
+    Parameters:
+        batch (pa.RecordBatch): Batch of compact game data.
+        vocabulary (np.ndarray): Move vocabulary of the packed moves.
+
+    Returns:
+        pa.RecordBatch: The batch with a 'moves' column in place of 'move_codes'.
+    """
+    columns = [pa.array(join_moves(unpack_moves(column), vocabulary), type=pa.string()) if name == 'move_codes' else column
+               for name, column in zip(batch.schema.names, batch.columns)]
+    return pa.RecordBatch.from_arrays(columns, names=['moves' if name == 'move_codes' else name for name in batch.schema.names])
+
+def dataset_dir_version(dataset_dir):
+    """
+    Fingerprints a partitioned dataset from the names, sizes and modification times of its files.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+
+    Returns:
+        str: Hex digest identifying the dataset content.
+    """
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(dataset_dir)):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f'{os.path.relpath(os.path.join(root, name), dataset_dir)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()
+
+def games_filter(category=None, rated=None, increment=None, rating=None, opening=None):
+    """
+    Builds the dataset filter expression matching the sidebar filters.
+
+    Parameters:
+        category (str, optional): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+        opening (str, optional): Opening to keep; None keeps all.
+
+    Returns:
+        pyarrow.dataset.Expression: The filter, or None if nothing is filtered.
+    """
+    conditions = []
+    if category is not None:
+        conditions.append(ds.field('time_control_category') == category)
+    if rated is not None:
+        conditions.append(ds.field('rated') == rated)
+    if increment is not None:
+        conditions.append(ds.field('increment') == increment)
+    if rating is not None:
+        lower, upper = rating
+        conditions.append(((ds.field('white_rating') >= lower) & (ds.field('white_rating') <= upper)) |
+                          ((ds.field('black_rating') >= lower) & (ds.field('black_rating') <= upper)))
+    if opening is not None:
+        # The bucket condition prunes the partitions of the other openings
+        conditions.append((ds.field('opening_bucket') == opening_bucket(opening)) & (ds.field('opening_name') == opening))
+    return reduce(lambda left, right: left & right, conditions) if conditions else None
+
+def iter_games(dataset_dir, columns=None, batch_size=STREAM_BATCH_SIZE, **filters):
+    """
+    Streams the games of a partitioned dataset, chunk by chunk.
+
+    Filters are pushed down to the scan: partitions of other categories and opening buckets are never opened, row groups
+    whose statistics exclude the filter are skipped, and only the matching rows are materialized.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        columns (list of str, optional): Columns to read; None reads all of them.
+        batch_size (int): Maximum number of games per chunk.
+        **filters: Filters accepted by games_filter.
+
+    Yields:
+        pd.DataFrame: Chunks of matching games.
+    """
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning='hive')
+    for batch in dataset.to_batches(columns=columns, filter=games_filter(**filters), batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def merge_cells(frames, dimensions=CUBE_DIMENSIONS, measures=CUBE_MEASURES):
+    """
+    Merges aggregate cells computed on disjoint sets of games.
+
+    Streamed aggregates keep their per-chunk cells aside and merge them once they outweigh the cells
+    merged so far, so each cell is re-grouped O(log chunks) times instead of once per chunk.
+
+    Parameters:
+        frames (list of pd.DataFrame): Cells, e.g. returned by cube_cells or opening_table_cells.
+        dimensions (list of str): Columns identifying a cell.
+        measures (list of str): Columns summed across frames.
+
+    Returns:
+        pd.DataFrame: One row per distinct cell, with the measures summed.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True).groupby(dimensions, sort=False, observed=True)[measures].sum().reset_index()
+
+@st.cache_resource(show_spinner='Aggregating games...')
+def build_streaming_cube(dataset_dir, version):
+    """
+    Builds the opening statistics cube of a partitioned dataset by streaming its games.
+
+    Only the cube cells and the distinct filter values are kept in memory. Runs once per dataset version.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        version (str): Dataset version the cube is cached under.
+
+    Returns:
+        dict: The cube, with its 'cells' and rating bounds like build_opening_cube, plus the distinct
+        'categories', 'increments' and 'openings' used by the sidebar.
+    """
+    columns = ['opening_name', 'time_control_category', 'rated', 'increment', 'initial_time', 'turns', 'winner', 'white_rating', 'black_rating']
+    cells = None
+    partials, pending = [], 0
+    categories, increments = {}, set()
+    min_rating, max_rating = None, None
+    for chunk in iter_games(dataset_dir, columns=columns):
+        chunk['opening_name'] = chunk['opening_name'].astype(str)
+        chunk['time_control_category'] = chunk['time_control_category'].astype(str)
+        categories.update(dict.fromkeys(chunk['time_control_category'].unique()))
+        increments.update(chunk['increment'].unique().tolist())
+        ratings = np.concatenate([chunk['white_rating'].to_numpy(), chunk['black_rating'].to_numpy()])
+        min_rating = int(ratings.min()) if min_rating is None else min(min_rating, int(ratings.min()))
+        max_rating = int(ratings.max()) if max_rating is None else max(max_rating, int(ratings.max()))
+        partials.append(cube_cells(chunk))
+        pending += len(partials[-1])
+        if pending >= max(STREAM_BATCH_SIZE, 0 if cells is None else len(cells)):
+            cells = merge_cells(partials if cells is None else [cells] + partials)
+            partials, pending = [], 0
+    if partials:
+        cells = merge_cells(partials if cells is None else [cells] + partials)
+    if cells is None:
+        cells = pd.DataFrame(columns=CUBE_DIMENSIONS + CUBE_MEASURES)
+    return {
+        'cells': cells,
+        'min_rating': min_rating or 0,
+        'max_rating': max_rating or 0,
+        'categories': list(categories),
+        'increments': sorted(increments),
+        'openings': sorted(cells['opening_name'].unique().tolist())
+    }
+
+def get_streaming_cube(dataset_dir=DATASET_DIR, version=None):
+    """
+    Returns the opening statistics cube of a partitioned dataset.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        version (str, optional): Dataset version returned by dataset_dir_version; fingerprinted again when None.
+
+    Returns:
+        dict: The cube built by build_streaming_cube.
+    """
+    version = version or dataset_dir_version(dataset_dir)
+    retire_results(version)
+    return build_streaming_cube(dataset_dir, version)
+
+@instrumented
+def stream_opening_stats(dataset_dir, category, rated=None, increment=None, rating=None, version=None):
+    """
+    Returns per-opening statistics for the games of a partitioned dataset matching the sidebar filters.
+
+    Statistics are rolled up from the streaming cube. Rating ranges that do not line up with the cube
+    buckets are aggregated by streaming the matching games.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+        version (str, optional): Dataset version returned by dataset_dir_version; fingerprinted again when None.
+
+    Returns:
+        pd.DataFrame: One row per opening with at least one matching game, with the CUBE_MEASURES columns.
+    """
+    return rollup_streamed_stats(dataset_dir, version or dataset_dir_version(dataset_dir), category, rated, increment, rating)
+
+@shared_result
+def rollup_streamed_stats(dataset_dir, version, category, rated, increment, rating):
+    """
+    Computes the statistics returned by stream_opening_stats, sharing them across sessions.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        version (str): Dataset version the statistics are cached under.
+        category (str): Time control category to keep.
+        rated (bool): Rated flag to keep, or None.
+        increment (int): Time increment to keep, or None.
+        rating (tuple): Rating range to keep, or None.
+
+    Returns:
+        pd.DataFrame: Per-opening statistics of the matching games.
+    """
+    if rating is not None:
+        partials = [opening_stats_from_games(chunk) for chunk in iter_games(dataset_dir, columns=RATING_STATS_COLUMNS, category=category, rated=rated, increment=increment, rating=rating)]
+        if not partials:
+            return pd.DataFrame(columns=CUBE_MEASURES)
+        return pd.concat(partials).groupby(level=0, observed=True).sum()
+    return rollup_cube(build_streaming_cube(dataset_dir, version), category, rated, increment)
+
+@instrumented
+def stream_opening_games(dataset_dir, opening, limit=None):
+    """
+    Returns the games of one opening from a partitioned dataset.
+
+    The scan stops once `limit` games were read, so popular openings are never materialized in full. The result is not
+    cached here: the opening tab keeps it among the opening's artifacts, see get_opening_artifacts.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        opening (str): Opening whose games to read.
+        limit (int, optional): Maximum number of games read; None reads all of them.
+
+    Returns:
+        pd.DataFrame: The first `limit` games of the opening.
+    """
+    batch_size = STREAM_BATCH_SIZE if limit is None else max(1, min(limit, STREAM_BATCH_SIZE))
+    chunks = []
+    read = 0
+    for chunk in iter_games(dataset_dir, batch_size=batch_size, opening=opening):
+        chunks.append(chunk)
+        read += len(chunk)
+        if limit is not None and read >= limit:
+            break
+    if not chunks:
+        return ds.dataset(dataset_dir, format='parquet', partitioning='hive').schema.empty_table().to_pandas()
+    games = pd.concat(chunks, ignore_index=True)
+    return games if limit is None else games.head(limit)
+
+######################################################################################################
+##################################         OPENING TABLE      ########################################
+
+OPENING_TABLE_DIMENSIONS = ['opening_name', 'opening_eco', 'opening_ply', 'opening_moves', 'time_control_category', 'rated']
+OPENING_TABLE_MEASURES = ['games', 'white', 'black', 'draw', 'white_rating_sum', 'black_rating_sum', 'duration_sum']
+OPENING_TABLE_SOURCE_COLUMNS = ['opening_name', 'opening_eco', 'opening_ply', 'moves', 'time_control_category', 'rated', 'winner',
+                                'white_rating', 'black_rating', 'initial_time', 'turns', 'increment']
+# Levels of the opening table, each with the level its rows roll up into
+OPENING_LEVELS = {'opening': 'family', 'family': None, 'eco': 'volume', 'volume': None}
+OPENING_LEVEL_LABELS = {'opening': 'Opening', 'family': 'Family', 'eco': 'ECO code', 'volume': 'ECO volume'}
+CATEGORY_GAMES_PREFIX = 'games_'
+
+def opening_table_path(source):
+    """
+    Returns the path of the opening table built for a games CSV or a partitioned dataset directory.
+
+    Parameters:
+        source (str): Path of the games CSV, or directory of the partitioned dataset.
+
+    Returns:
+        str: Path of the opening table (.openings.parquet), next to the source.
+    """
+    return os.path.splitext(source.rstrip(os.sep))[0] + '.openings.parquet'
+
+def opening_lines(games):
+    """
+    Returns the opening line of every game, i.e. its first 'opening_ply' moves, as a SAN string.
+
+    Games are grouped by line on their move codes, so only the distinct lines are decoded.
+
+    Parameters:
+        games (pd.DataFrame): Games with 'opening_ply' and a 'move_codes' or 'moves' column.
+
+    Returns:
+        np.ndarray: The opening line of each game.
+    """
+    if games.empty:
+        return np.empty(0, dtype=object)
+    encoded = move_codes(games)
+    offsets = encoded['offsets']
+    lengths = np.minimum(np.diff(offsets), games['opening_ply'].to_numpy(np.int64))
+    plies = np.arange(max(int(lengths.max()), 1))
+    played = plies < lengths[:, None]
+    lines = np.full(played.shape, -1, dtype=np.int64)
+    lines[played] = encoded['codes'][(offsets[:-1, None] + plies)[played]]
+    distinct, inverse = np.unique(lines, axis=0, return_inverse=True)
+    names = np.array([' '.join(encoded['vocabulary'][line[line >= 0]]) for line in distinct], dtype=object)
+    return names[inverse.reshape(-1)]
+
+def opening_table_cells(games):
+    """
+    Aggregates games into opening table cells, one per (opening, ECO code, opening line, time control category, rated flag).
+
+    Cells aggregated from separate chunks of games can be concatenated and summed again.
+
+    Parameters:
+        games (pd.DataFrame): Games with the OPENING_TABLE_SOURCE_COLUMNS, or 'move_codes' in place of 'moves'.
+
+    Returns:
+        pd.DataFrame: One row per non-empty cell, with the OPENING_TABLE_DIMENSIONS and OPENING_TABLE_MEASURES columns.
+    """
+    cells = pd.DataFrame({
+        'opening_name': games['opening_name'].astype(str).to_numpy(),
+        'opening_eco': games['opening_eco'].astype(str).to_numpy(),
+        'opening_ply': games['opening_ply'].to_numpy(np.int64),
+        'opening_moves': opening_lines(games),
+        'time_control_category': games['time_control_category'].astype(str).to_numpy(),
+        'rated': games['rated'].to_numpy(bool),
+        'games': np.ones(len(games), dtype=np.int64),
+        'white': (games['winner'] == 'white').to_numpy(np.int64),
+        'black': (games['winner'] == 'black').to_numpy(np.int64),
+        'draw': (games['winner'] == 'draw').to_numpy(np.int64),
+        'white_rating_sum': games['white_rating'].to_numpy(np.int64),
+        'black_rating_sum': games['black_rating'].to_numpy(np.int64),
+        'duration_sum': games['initial_time'].to_numpy(np.int64) + games['turns'].to_numpy(np.int64) * games['increment'].to_numpy(np.int64)
+    })
+    return cells.groupby(OPENING_TABLE_DIMENSIONS, sort=False)[OPENING_TABLE_MEASURES].sum().reset_index()
+
+def top_values(cells, key, columns):
+    """
+    Finds, for every key, the values of some columns that account for the most games.
+
+    Ties go to the smallest values, as with a mode.
+
+    Parameters:
+        cells (pd.DataFrame): Opening table cells, with the key column.
+        key (str): Column to group by.
+        columns (list of str): Columns whose most played values to find.
+
+    Returns:
+        pd.DataFrame: The most played values, indexed by key.
+    """
+    counts = cells.groupby([key] + columns, observed=True)['games'].sum().reset_index()
+    counts = counts.sort_values(['games'] + columns, ascending=[False] + [True] * len(columns), kind='stable')
+    return counts.drop_duplicates(key).set_index(key)[columns]
+
+def rollup_opening_table(cells):
+    """
+    Rolls opening table cells up into the opening table.
+
+    The table has one row per opening (variation), opening family (the name before its ':'), ECO code
+    and ECO volume (the code's letter). Openings roll up into their family and ECO codes into their
+    volume. Each row holds its game counts, the game counts per time control category and rated flag,
+    win and draw rates, average ratings and duration, and the opening line played most often with its ply.
+
+    Parameters:
+        cells (pd.DataFrame): Cells returned by opening_table_cells.
+
+    Returns:
+        pd.DataFrame: The opening table, indexed by ('level', 'key').
+    """
+    cells = cells.assign(
+        opening=cells['opening_name'],
+        family=cells['opening_name'].str.split(':').str[0].str.strip(),
+        eco=cells['opening_eco'],
+        volume=cells['opening_eco'].str[:1],
+        category_games=CATEGORY_GAMES_PREFIX + cells['time_control_category'] + np.where(cells['rated'], '_rated', '_casual')
+    )
+    rollups = []
+    for level, parent in OPENING_LEVELS.items():
+        rows = cells.groupby(level)[OPENING_TABLE_MEASURES].sum()
+        rows['parent'] = top_values(cells, level, [parent])[parent] if parent else ''
+        rows['opening_eco'] = top_values(cells, level, ['opening_eco'])['opening_eco']
+        rows[['opening_moves', 'opening_ply']] = top_values(cells, level, ['opening_moves', 'opening_ply'])
+        rows['most_winner'] = rows[['black', 'draw', 'white']].idxmax(axis=1)
+        rows['most_played_category'] = top_values(cells, level, ['time_control_category'])['time_control_category']
+        rows = rows.join(cells.pivot_table(index=level, columns='category_games', values='games', aggfunc='sum', fill_value=0))
+        rollups.append(rows.rename_axis('key').reset_index().assign(level=level))
+    table = pd.concat(rollups, ignore_index=True)
+    category_columns = sorted(column for column in table.columns if column.startswith(CATEGORY_GAMES_PREFIX))
+    table[category_columns] = table[category_columns].fillna(0).astype(np.int64)
+    for winner in ['white', 'black', 'draw']:
+        table[f'{winner}_rate'] = table[winner] / table['games']
+    table['average_white_rating'] = table.pop('white_rating_sum') / table['games']
+    table['average_black_rating'] = table.pop('black_rating_sum') / table['games']
+    table['average_duration'] = table.pop('duration_sum') / table['games']
+    columns = ['level', 'key', 'parent', 'opening_eco', 'opening_ply', 'opening_moves', 'games', 'white', 'black', 'draw',
+               'white_rate', 'black_rate', 'draw_rate', 'average_white_rating', 'average_black_rating', 'average_duration',
+               'most_winner', 'most_played_category'] + category_columns
+    return table[columns].set_index(['level', 'key']).sort_index()
+
+def write_opening_table(table, path, version):
+    """
+    Writes an opening table to Parquet, tagging it with the version of the dataset it was built from.
+
+    Parameters:
+        table (pd.DataFrame): Table returned by rollup_opening_table.
+        path (str): Destination of the Parquet file.
+        version (str): Version of the dataset.
+    """
+    arrow_table = pa.Table.from_pandas(table)
+    metadata = dict(arrow_table.schema.metadata or {})
+    metadata[b'dataset_version'] = version.encode()
+    pq.write_table(arrow_table.replace_schema_metadata(metadata), path)
+
+@st.cache_resource(show_spinner=False)
+def load_opening_table(path, version):
+    """
+    Reads an opening table in one read, if it was built for this dataset version.
+
+    Parameters:
+        path (str): Path of the opening table.
+        version (str): Version of the loaded dataset.
+
+    Returns:
+        pd.DataFrame: The opening table, or None if it is missing or stale.
+    """
+    try:
+        if (pq.read_schema(path).metadata or {}).get(b'dataset_version', b'').decode() != version:
+            return None
+        return pq.read_table(path).to_pandas()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+@st.cache_resource(show_spinner='Building the opening table...')
+def build_opening_table(_data, version, path=None):
+    """
+    Builds the opening table of in-memory game data, once per dataset version, and stores it if a path is given.
+
+    Parameters:
+        _data (pd.DataFrame): Game data loaded with load_data.
+        version (str): Dataset version the table is built for.
+        path (str, optional): Where to store the table.
+
+    Returns:
+        pd.DataFrame: The table returned by rollup_opening_table.
+    """
+    table = rollup_opening_table(opening_table_cells(_data))
+    if path is not None:
+        try:
+            write_opening_table(table, path, version)
+        except OSError:
+            pass  # Read-only deployments rebuild the table on the next process start
+    return table
+
+@st.cache_resource(show_spinner='Building the opening table...')
+def stream_opening_table(dataset_dir, version, path=None):
+    """
+    Builds the opening table of a partitioned dataset by streaming its games, and stores it if a path is given.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        version (str): Dataset version the table is built for.
+        path (str, optional): Where to store the table.
+
+    Returns:
+        pd.DataFrame: The table returned by rollup_opening_table.
+    """
+    cells = None
+    partials, pending = [], 0
+    for chunk in iter_games(dataset_dir, columns=OPENING_TABLE_SOURCE_COLUMNS):
+        partials.append(opening_table_cells(chunk))
+        pending += len(partials[-1])
+        if pending >= max(STREAM_BATCH_SIZE, 0 if cells is None else len(cells)):
+            cells = merge_cells(partials if cells is None else [cells] + partials, OPENING_TABLE_DIMENSIONS, OPENING_TABLE_MEASURES)
+            partials, pending = [], 0
+    if partials:
+        cells = merge_cells(partials if cells is None else [cells] + partials, OPENING_TABLE_DIMENSIONS, OPENING_TABLE_MEASURES)
+    if cells is None:
+        cells = pd.DataFrame(columns=OPENING_TABLE_DIMENSIONS + OPENING_TABLE_MEASURES)
+    table = rollup_opening_table(cells)
+    if path is not None:
+        try:
+            write_opening_table(table, path, version)
+        except OSError:
+            pass
+    return table
+
+def get_opening_table(data, csv_path=DATA_PATH):
+    """
+    Returns the opening table of a dataset loaded with load_data, reading the one built by opening_table.py when it is up to date.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+        csv_path (str): Path of the games CSV the data was loaded from.
+
+    Returns:
+        pd.DataFrame: The opening table.
+    """
+    version = data.attrs.get('version')
+    path = opening_table_path(csv_path)
+    table = load_opening_table(path, version)
+    return table if table is not None else build_opening_table(data, version, path)
+
+def get_streamed_opening_table(dataset_dir=DATASET_DIR, version=None):
+    """
+    Returns the opening table of a partitioned dataset, reading the one built by opening_table.py when it is up to date.
+
+    Parameters:
+        dataset_dir (str): Directory of the partitioned dataset.
+        version (str, optional): Dataset version returned by dataset_dir_version; fingerprinted again when None.
+
+    Returns:
+        pd.DataFrame: The opening table.
+    """
+    version = version or dataset_dir_version(dataset_dir)
+    path = opening_table_path(dataset_dir)
+    table = load_opening_table(path, version)
+    return table if table is not None else stream_opening_table(dataset_dir, version, path)
+
+def opening_row(table, level, key):
+    """
+    Looks a row of the opening table up.
+
+    Parameters:
+        table (pd.DataFrame): The opening table.
+        level (str): Level of the row, a key of OPENING_LEVELS.
+        key (str): Key of the row at that level.
+
+    Returns:
+        pd.Series: The row, or None if the table has no such row.
+    """
+    try:
+        return table.loc[(level, key)]
+    except KeyError:
+        return None
+
+def category_games(row):
+    """
+    Sums the game counts of an opening table row per time control category.
+
+    Parameters:
+        row (pd.Series): Row of the opening table.
+
+    Returns:
+        pd.Series: Category -> number of games.
+    """
+    counts = row[[column for column in row.index if column.startswith(CATEGORY_GAMES_PREFIX)]].astype(np.int64)
+    return counts.groupby(lambda column: column[len(CATEGORY_GAMES_PREFIX):].rsplit('_', 1)[0]).sum()
+
+@shared_result
+def opening_summary(_table, version, opening):
+    """
+    Serves everything the opening tab summarizes about an opening from the opening table, sharing it across sessions.
+
+    Parameters:
+        _table (pd.DataFrame): The opening table.
+        version (str): Version of the dataset the table was built from.
+        opening (str): The selected opening.
+
+    Returns:
+        dict: The opening's 'details' table, 'rollups', 'move_pairs', 'time_control' shares and 'winners'
+        shares with and without draws.
+    """
+    return {
+        'details': opening_details(_table, opening),
+        'rollups': opening_rollups(_table, opening),
+        'move_pairs': opening_move_pairs(_table, opening),
+        'time_control': time_control_shares(_table, opening),
+        'winners': {include_draws: winner_shares(_table, opening, include_draws) for include_draws in [True, False]}
+    }
+
+
+######################################################################################################
+##################################         OPENING TREE       ########################################
+
+TRIE_MAX_PLIES = 30
+
+@st.cache_resource(show_spinner='Indexing move sequences...')
+def build_opening_trie(_data, version, max_plies=TRIE_MAX_PLIES):
+    """
+    Builds a move-prefix tree over the first plies of every game.
+
+    The tree is stored as flat arrays, one entry per node. Nodes are created one depth at a time,
+    sorted by (parent, move), so the children of a node are contiguous and ordered by move code.
+    Each node aggregates the games that went through its prefix. Runs once per dataset version.
+
+    Parameters:
+        _data (pd.DataFrame): Game data containing 'move_codes' or 'moves', 'winner', 'white_rating' and 'black_rating'.
+        version (str): Dataset version the tree is cached under.
+        max_plies (int): Depth of the tree, in plies.
+
+    Returns:
+        dict: The node arrays ('move', 'first_child', 'child_count', 'games', 'white', 'black', 'draw',
+        'white_rating_sum', 'black_rating_sum'), the move vocabulary and its reverse mapping.
+    """
+    encoded = move_codes(_data)
+    vocabulary = encoded['vocabulary']
+    codes, starts = encoded['codes'], encoded['offsets'][:-1]
+    lengths = np.minimum(np.diff(encoded['offsets']), max_plies)
+    vocabulary_size = max(len(vocabulary), 1)
+    measures = {
+        'white': (_data['winner'] == 'white').to_numpy(np.int64),
+        'black': (_data['winner'] == 'black').to_numpy(np.int64),
+        'draw': (_data['winner'] == 'draw').to_numpy(np.int64),
+        'white_rating_sum': _data['white_rating'].to_numpy(np.int64),
+        'black_rating_sum': _data['black_rating'].to_numpy(np.int64)
+    }
+
+    nodes = {'move': [np.array([-1])], 'parent': [np.array([-1])], 'games': [np.array([len(_data)])]}
+    for name, values in measures.items():
+        nodes[name] = [np.array([values.sum()])]
+    node_count = 1
+    current = np.zeros(len(_data), dtype=np.int64)
+    active = np.arange(len(_data))
+    # The move of each game at a depth is read from the packed codes directly, for the games still that long
+    for depth in range(max_plies):
+        active = active[lengths[active] > depth]
+        if len(active) == 0:
+            break
+        keys, inverse = np.unique(current[active] * vocabulary_size + codes[starts[active] + depth], return_inverse=True)
+        nodes['parent'].append(keys // vocabulary_size)
+        nodes['move'].append(keys % vocabulary_size)
+        nodes['games'].append(np.bincount(inverse, minlength=len(keys)))
+        for name, values in measures.items():
+            nodes[name].append(np.bincount(inverse, weights=values[active], minlength=len(keys)).astype(np.int64))
+        current[active] = node_count + inverse
+        node_count += len(keys)
+
+    trie = {name: np.concatenate(arrays) for name, arrays in nodes.items()}
+    trie['move'] = trie['move'].astype(np.int32)
+    parents = trie.pop('parent')[1:]
+    trie['first_child'] = np.full(node_count, -1, dtype=np.int64)
+    trie['child_count'] = np.bincount(parents, minlength=node_count).astype(np.int32)
+    unique_parents, first_index = np.unique(parents, return_index=True)
+    trie['first_child'][unique_parents] = first_index + 1
+    trie['vocabulary'] = np.asarray(vocabulary, dtype=object)
+    trie['move_codes'] = {move: code for code, move in enumerate(vocabulary)}
+    return trie
+
+def get_opening_trie(data):
+    """
+    Returns the move-prefix tree of a dataset loaded with load_data.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+
+    Returns:
+        dict: The tree built by build_opening_trie.
+    """
+    return build_opening_trie(data, data.attrs.get('version'))
+
+def trie_lookup(trie, moves):
+    """
+    Finds the node reached by a sequence of moves, in time proportional to the number of moves.
+
+    Parameters:
+        trie (dict): Tree built by build_opening_trie.
+        moves (list of str): Moves in standard algebraic notation, from the starting position.
+
+    Returns:
+        int: The node id, or None if no game in the tree played this sequence.
+    """
+    node = 0
+    for move in moves:
+        code = trie['move_codes'].get(move)
+        if code is None or trie['child_count'][node] == 0:
+            return None
+        start = trie['first_child'][node]
+        children = trie['move'][start:start + trie['child_count'][node]]
+        position = np.searchsorted(children, code)
+        if position == len(children) or children[position] != code:
+            return None
+        node = start + position
+    return node
+
+@instrumented
+def continuation_stats(trie, moves):
+    """
+    Summarizes the moves played after a sequence of moves and how those games ended.
+
+    Parameters:
+        trie (dict): Tree built by build_opening_trie.
+        moves (list of str): Moves in standard algebraic notation, from the starting position.
+
+    Returns:
+        pd.DataFrame: One row per continuation, most played first, or None if the sequence is not in the tree.
+    """
+    node = trie_lookup(trie, moves)
+    if node is None:
+        return None
+    start = trie['first_child'][node]
+    children = np.arange(start, start + trie['child_count'][node]) if start >= 0 else np.arange(0)
+    games = trie['games'][children]
+    stats = pd.DataFrame({
+        'Move': trie['vocabulary'][trie['move'][children]],
+        'Games': games,
+        'White Wins %': 100 * trie['white'][children] / games,
+        'Draws %': 100 * trie['draw'][children] / games,
+        'Black Wins %': 100 * trie['black'][children] / games,
+        'Avg White Rating': trie['white_rating_sum'][children] / games,
+        'Avg Black Rating': trie['black_rating_sum'][children] / games
+    })
+    return stats.sort_values(by='Games', ascending=False).reset_index(drop=True)
+
+
+######################################################################################################
+##################################         POSITION INDEX     ########################################
+
+POSITION_INDEX_DTYPE = np.dtype([('hash', '<u8'), ('row', '<u4'), ('ply', '<u2')])
+TRANSPOSITION_ROWS = 200
+
+def position_index_paths(csv_path):
+    """
+    Returns the paths of the position index built for a games CSV by position_index.py.
+
+    Parameters:
+        csv_path (str): Path of the games CSV.
+
+    Returns:
+        tuple: Paths of the index entries (.npy) and of its metadata (.json).
+    """
+    base = os.path.splitext(csv_path)[0]
+    return base + '.positions.npy', base + '.positions.json'
+
+@st.cache_resource(show_spinner=False)
+def load_position_index(csv_path, version):
+    """
+    Memory-maps the position index of a games CSV, if it was built for this dataset version.
+
+    Parameters:
+        csv_path (str): Path of the games CSV.
+        version (str): Version of the loaded dataset.
+
+    Returns:
+        np.ndarray: Read-only memory-mapped index entries sorted by hash, or None if the index is missing or stale.
+    """
+    index_path, meta_path = position_index_paths(csv_path)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('version') != version:
+            return None
+        return np.load(index_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+def get_position_index(data, csv_path=DATA_PATH):
+    """
+    Returns the position index of a dataset loaded with load_data.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+        csv_path (str): Path of the games CSV the data was loaded from.
+
+    Returns:
+        np.ndarray: The index entries, or None if no up-to-date index was built.
+    """
+    return load_position_index(csv_path, data.attrs.get('version'))
+
+@instrumented
+def games_through_position(position_index, board):
+    """
+    Finds every game that reached the position on a board, whatever the move order.
+
+    Parameters:
+        position_index (np.ndarray): Index entries returned by get_position_index.
+        board (chess.Board): The position to look up.
+
+    Returns:
+        tuple: Row positions of the games and the ply at which each one reached the position.
+    """
+    key = np.uint64(chess.polyglot.zobrist_hash(board))
+    hashes = position_index['hash']
+    start = np.searchsorted(hashes, key, side='left')
+    end = np.searchsorted(hashes, key, side='right')
+    entries = position_index[start:end]
+    return entries['row'].astype(np.int64), entries['ply'].astype(np.int64)
+
+
+######################################################################################################
+##################################         MOVE FEATURES      ########################################
+
+OPENING_PHASE_PLIES = 20
+ENDGAME_CAPTURES = 18
+
+def encode_moves(moves):
+    """
+    Tokenizes move strings into one flat array of integer move codes plus per-game offsets.
+
+    The moves of game i are codes[offsets[i]:offsets[i + 1]]. Codes index the SAN vocabulary and
+    fit in uint16 unless the vocabulary has more than 65536 distinct moves.
+
+    Tokens are split and dictionary-encoded by Arrow kernels, so no Python object is created per move.
+
+    Parameters:
+        moves (pd.Series): Space-separated SAN move strings, one per game.
+
+    Returns:
+        dict: 'codes', 'offsets' and 'vocabulary' arrays.
+    """
+    moves = pc.utf8_trim_whitespace(pc.cast(pa.array(moves, from_pandas=True), pa.string()).fill_null(''))
+    tokens = pc.utf8_split_whitespace(moves)
+    # An empty string splits into one empty token
+    lengths = np.where(pc.equal(moves, '').to_numpy(zero_copy_only=False), 0, pc.list_value_length(tokens).to_numpy())
+    flat = pc.list_flatten(tokens)
+    encoded = pc.dictionary_encode(flat.filter(pc.not_equal(flat, '')))
+    dtype = np.uint16 if len(encoded.dictionary) <= np.iinfo(np.uint16).max + 1 else np.uint32
+    return {
+        'codes': encoded.indices.to_numpy().astype(dtype),
+        'offsets': np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+        'vocabulary': encoded.dictionary.to_numpy(zero_copy_only=False)
+    }
+
+def vocabulary_flags(vocabulary):
+    """
+    Classifies every distinct SAN move once, so per-move flags are a single lookup by code.
+
+    Parameters:
+        vocabulary (np.ndarray): Distinct SAN moves.
+
+    Returns:
+        dict: Flag name -> boolean array aligned with the vocabulary.
+    """
+    moves = pd.Series(vocabulary, dtype=object).str.rstrip('+#')
+    return {
+        'capture': moves.str.contains('x', regex=False).to_numpy(bool),
+        'check': pd.Series(vocabulary, dtype=object).str[-1].isin(['+', '#']).to_numpy(bool),
+        'promotion': moves.str.contains('=', regex=False).to_numpy(bool),
+        'short_castle': (moves == 'O-O').to_numpy(bool),
+        'long_castle': (moves == 'O-O-O').to_numpy(bool)
+    }
+
+def first_ply(game, ply, mask, game_count):
+    """
+    Returns, for every game, the first ply at which a per-move mask is set, or -1 if it never is.
+
+    Parameters:
+        game (np.ndarray): Game of every move, in increasing order.
+        ply (np.ndarray): Ply of every move within its game.
+        mask (np.ndarray): Boolean flag of every move.
+        game_count (int): Number of games.
+
+    Returns:
+        np.ndarray: First matching ply of every game.
+    """
+    result = np.full(game_count, -1, dtype=np.int16)
+    games, first = np.unique(game[mask], return_index=True)
+    result[games] = ply[mask][first]
+    return result
+
+@st.cache_resource(show_spinner='Extracting move features...')
+def build_move_features(_data, version):
+    """
+    Computes per-game move features for the whole dataset in vectorized passes over the encoded moves.
+
+    Moves are classified from their SAN, so no board is replayed. The game phases are approximated:
+    the opening is the first OPENING_PHASE_PLIES plies, and the endgame starts once ENDGAME_CAPTURES
+    pieces have been captured. Runs once per dataset version.
+
+    Parameters:
+        _data (pd.DataFrame): Game data containing 'move_codes' or 'moves'.
+        version (str): Dataset version the features are cached under.
+
+    Returns:
+        pd.DataFrame: One row per game, aligned with the data rows, with the plies spent in each phase,
+        the capture, check and promotion counts, and the move number at which each side castled (-1 if never).
+    """
+    encoded = move_codes(_data)
+    offsets = encoded['offsets']
+    game_count = len(offsets) - 1
+    lengths = np.diff(offsets)
+    game = np.repeat(np.arange(game_count), lengths)
+    ply = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    flags = {name: flag[encoded['codes']] for name, flag in vocabulary_flags(encoded['vocabulary']).items()}
+
+    captures_before = np.cumsum(flags['capture']) - flags['capture']
+    captures_before -= np.repeat(captures_before[offsets[:-1][lengths > 0]], lengths[lengths > 0])
+    endgame = captures_before >= ENDGAME_CAPTURES
+    opening = (ply < OPENING_PHASE_PLIES) & ~endgame
+    castle = flags['short_castle'] | flags['long_castle']
+    white = ply % 2 == 0
+
+    def per_game(mask):
+        return np.bincount(game, weights=mask, minlength=game_count).astype(np.int16)
+
+    features = pd.DataFrame({
+        'plies': lengths.astype(np.int16),
+        'opening_plies': per_game(opening),
+        'middlegame_plies': per_game(~opening & ~endgame),
+        'endgame_plies': per_game(endgame),
+        'captures': per_game(flags['capture']),
+        'checks': per_game(flags['check']),
+        'promotions': per_game(flags['promotion'])
+    }, index=_data.index)
+    for side, mask in [('white', white), ('black', ~white)]:
+        castle_ply = first_ply(game, ply, castle & mask, game_count)
+        features[f'{side}_castle_move'] = np.where(castle_ply >= 0, castle_ply // 2 + 1, -1).astype(np.int16)
+        features[f'{side}_long_castle'] = first_ply(game, ply, flags['long_castle'] & mask, game_count) >= 0
+    return features
 
+def get_move_features(data):
+    """
+    Returns the per-game move features of a dataset loaded with load_data.
+
+    Parameters:
+        data (pd.DataFrame): Game data, carrying its 'version' attribute.
+
+    Returns:
+        pd.DataFrame: The features built by build_move_features.
+    """
+    return build_move_features(data, data.attrs.get('version'))
+
+@instrumented
+def filter_move_features(data, category, rated=None, increment=None, rating=None):
+    """
+    Returns the move features of the games matching the sidebar filters, along with their opening.
+
+    Parameters:
+        data (pd.DataFrame): Game data loaded with load_data.
+        category (str): Time control category to keep.
+        rated (bool, optional): Keep only rated (True) or non-rated (False) games; None keeps both.
+        increment (int, optional): Time increment to keep; None keeps all.
+        rating (tuple, optional): (lower, upper) range either player's rating must fall in; None keeps all.
+
+    Returns:
+        pd.DataFrame: Move features of the matching games, with an 'opening_name' column.
+    """
+    rows = filter_row_ids(get_filter_index(data), category, rated, increment, rating)
+    features = get_move_features(data).iloc[rows]
+    return features.assign(opening_name=data['opening_name'].iloc[rows].to_numpy())
+
+
+######################################################################################################
+##################################         PRECOMPUTE         ########################################
+
+PRECOMPUTE_WORKERS = 4
+PRECOMPUTE_PLIES = 12
+PREFETCH_OPENINGS = 2
+OPENING_ARTIFACTS_CACHE_SIZE = 64
+
+def compute_opening_artifacts(load_games, opening, plies=PRECOMPUTE_PLIES):
+    """
+    Computes the per-game views of the opening tab for an opening, and renders its first plies into the shared result cache.
+
+    The opening's summaries are served from the opening table instead, see opening_summary.
+
+    Parameters:
+        load_games (callable): Returns the games of an opening, e.g. get_opening_games bound to the data.
+        opening (str): The opening to prepare.
+        plies (int): Number of plies of the opening's move list to render.
+
+    Returns:
+        dict: The opening's 'games', the 'moves' shown on the board and their position 'timeline'.
+    """
+    games = load_games(opening)
+    moves = get_move_list(games)
+    artifacts = {
+        'games': games,
+        'moves': moves,
+        'timeline': build_position_timeline(tuple(moves))
+    }
+    render_opening_plies(moves, plies)
+    return artifacts
+
+def run_in_script_context(ctx, function, *args):
+    """
+    Runs a function on a worker thread as part of a session's script run, so Streamlit caches apply.
+
+    Parameters:
+        ctx (ScriptRunContext): Context of the session that scheduled the work.
+        function (callable): Function to run.
+        *args: Arguments of the function.
+
+    Returns:
+        The function's result.
+    """
+    thread = threading.current_thread()
+    add_script_run_ctx(thread, ctx)
+    try:
+        return function(*args)
+    finally:
+        add_script_run_ctx(thread, None)
+
+@st.cache_resource(show_spinner=False)
+def get_precompute_pool(workers=PRECOMPUTE_WORKERS):
+    """
+    Starts the thread pool that prepares opening artifacts in the background, shared by every session.
+
+    Parameters:
+        workers (int): Number of openings prepared concurrently.
+
+    Returns:
+        dict: The executor, an LRU of artifact futures keyed by dataset version and opening, and its lock.
+    """
+    return {
+        'executor': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='opening-precompute'),
+        'futures': LRUCache(maxsize=OPENING_ARTIFACTS_CACHE_SIZE),
+        'lock': threading.Lock()
+    }
+
+def schedule_opening_artifacts(pool, version, load_games, opening):
+    """
+    Returns the future of an opening's artifacts, scheduling their computation if needed.
+
+    A future that failed is scheduled again.
+
+    Parameters:
+        pool (dict): Pool returned by get_precompute_pool.
+        version (str): Version of the dataset the games come from.
+        load_games (callable): Returns the games of an opening.
+        opening (str): The opening to prepare.
+
+    Returns:
+        concurrent.futures.Future: Future of the artifacts returned by compute_opening_artifacts.
+    """
+    key = (version, opening)
+    with pool['lock']:
+        future = pool['futures'].get(key)
+        if future is None or (future.done() and future.exception() is not None):
+            future = pool['executor'].submit(run_in_script_context, get_script_run_ctx(), compute_opening_artifacts, load_games, opening)
+            pool['futures'][key] = future
+    return future
 
-def load_data():
+@instrumented
+def get_opening_artifacts(version, load_games, opening, openings, neighbours=PREFETCH_OPENINGS):
     """
-    Load and return the chess game data from a CSV file.
+    Returns an opening's artifacts, and prepares those of its neighbours in the opening list in the background.
+
+    Switching to an opening that was prefetched only waits for work that is already done or under way.
+
+    Parameters:
+        version (str): Version of the dataset the games come from.
+        load_games (callable): Returns the games of an opening.
+        opening (str): The selected opening.
+        openings (list of str): Openings in the order they are offered, e.g. the sorted selectbox options.
+        neighbours (int): Number of openings to prefetch on each side of the selected one.
+
     Returns:
-        pd.DataFrame: Dataframe containing the game data.
+        dict: The artifacts returned by compute_opening_artifacts.
     """
-    return pd.read_csv('games_revisited.csv')
+    pool = get_precompute_pool()
+    future = schedule_opening_artifacts(pool, version, load_games, opening)
+    record_cache_access(future.done())
+    position = openings.index(opening) if opening in openings else 0
+    for neighbour in openings[position + 1:position + 1 + neighbours] + openings[max(0, position - neighbours):position]:
+        schedule_opening_artifacts(pool, version, load_games, neighbour)
+    return future.result()
 
 
 ######################################################################################################
 ##################################         PLOTS              ########################################
 
-def plot_ranking(data):
+WINNER_COLORS = {'white': '#E2E2E2', 'black': '#22223B', 'draw': '#2A9D8F'}
+MOST_PLAYED_COLORS = ['#FFBE0B', '#FB5607', '#FF006E', '#8338EC', '#3A86FF']
+TIME_CONTROL_COLORS = ['#FFAFCC', '#BDE0FE', '#84A98C', '#FDFCDC']
+CASTLING_MAX_MOVE = 40
+# A small explicit template, so figures do not ship plotly's default one (most of a small figure's payload)
+CHART_TEMPLATE = {'layout': {'colorway': ['#636EFA', '#EF553B', '#00CC96', '#AB63FA', '#FFA15A'], 'hovermode': 'closest',
+                             'xaxis': {'automargin': True}, 'yaxis': {'automargin': True}}}
+SHARE_PIE_LAYOUT = {'width': 700, 'height': 400, 'legend': {'title': {'text': 'Categories'}, 'x': 0.1, 'xanchor': 'center', 'yanchor': 'top', 'orientation': 'v'}}
+CHART_SKELETONS = {
+    'most_played': {
+        'traces': [{'type': 'bar', 'textposition': 'outside', 'hovertemplate': '%{x}<br>Number of Games Played=%{y}<extra></extra>'}],
+        'layout': {'title': {'text': 'Top 5 Most Played Openings'}, 'height': 550, 'showlegend': False,
+                   'xaxis': {'title': {'text': ''}}, 'yaxis': {'title': {'text': 'Number of Games Played'}}}
+    },
+    'top_openings': {
+        'traces': [{'type': 'bar', 'orientation': 'h', 'name': winner, 'marker': {'color': WINNER_COLORS[winner], 'line': {'width': 0.5}}}
+                   for winner in ['white', 'black']],
+        'layout': {'title': {'text': 'Top 5 Openings by Winning Rate'}, 'height': 400, 'barmode': 'group',
+                   'xaxis': {'title': {'text': 'Number of Wins'}}, 'yaxis': {'title': {'text': 'opening_name'}},
+                   'legend': {'title': {'text': 'Winner'}}}
+    },
+    'winning_rates': {
+        'traces': [{'type': 'pie'}],
+        'layout': {}
+    },
+    'duration': {
+        'traces': [{'type': 'scatter', 'mode': 'markers', 'marker': {'size': 10, 'line': {'width': 0.5, 'color': 'white'}}}],
+        'layout': {'title': {'text': 'Top 10 Chess Openings in Game Duration'}, 'xaxis': {'title': {'text': 'Opening Name'}, 'tickangle': -45},
+                   'yaxis': {'title': {'text': 'Average Game Duration (Seconds)'}}}
+    },
+    'game_phases': {
+        'traces': [{'type': 'bar', 'name': phase, 'marker': {'color': color}}
+                   for phase, color in [('Opening', '#84A98C'), ('Middlegame', '#7EA2AA'), ('Endgame', '#9C7A97')]],
+        'layout': {'title': {'text': 'Average Game Phases of the Most Played Openings'}, 'height': 450, 'barmode': 'relative',
+                   'xaxis': {'title': {'text': ''}}, 'yaxis': {'title': {'text': 'Average Number of Plies'}},
+                   'legend': {'title': {'text': 'Phase'}}}
+    },
+    'castling': {
+        'traces': [{'type': 'bar', 'name': side, 'opacity': 0.6, 'marker': {'color': WINNER_COLORS[side]}} for side in ['white', 'black']],
+        'layout': {'title': {'text': 'When Players Castle'}, 'height': 450, 'barmode': 'overlay', 'bargap': 0,
+                   'xaxis': {'title': {'text': 'Move Number'}}, 'yaxis': {'title': {'text': 'Number of Games'}},
+                   'legend': {'title': {'text': 'Side'}}}
+    },
+    'rating_distribution': {
+        'traces': [{'type': 'bar', 'marker': {'color': '#7EA2AA'}, 'hovertemplate': 'Rating %{x}<br>Players=%{y}<extra></extra>'}],
+        'layout': {'title': {'text': 'Rating Distribution of the Filtered Games'}, 'height': 450, 'bargap': 0,
+                   'xaxis': {'title': {'text': 'Rating'}}, 'yaxis': {'title': {'text': 'Number of Players'}}}
+    },
+    'rating_gap': {
+        'traces': [{'type': 'scatter', 'mode': 'lines+markers', 'name': name, 'line': {'color': WINNER_COLORS[winner], 'width': 3},
+                    'marker': {'size': 6, 'line': {'width': 1, 'color': '#22223B'}}}
+                   for winner, name in [('white', 'White wins'), ('draw', 'Draws'), ('black', 'Black wins')]],
+        'layout': {'title': {'text': 'Win Rates by Rating Difference'}, 'height': 450, 'hovermode': 'x unified',
+                   'xaxis': {'title': {'text': 'White Rating - Black Rating'}}, 'yaxis': {'title': {'text': 'Share of Games (%)'}},
+                   'legend': {'title': {'text': 'Result'}}}
+    },
+    'share_pie': {
+        'traces': [{'type': 'pie'}],
+        'layout': SHARE_PIE_LAYOUT
+    }
+}
+
+@st.cache_resource(show_spinner=False)
+def chart_skeleton(kind):
+    """
+    Validates the skeleton of a chart kind once, and returns it as plain plotly JSON.
+
+    Parameters:
+        kind (str): Key of CHART_SKELETONS.
+
+    Returns:
+        dict: 'data' (list of trace styles) and 'layout' of the chart, without any data.
+    """
+    skeleton = CHART_SKELETONS[kind]
+    return go.Figure(data=skeleton['traces'], layout={**skeleton['layout'], 'template': CHART_TEMPLATE}).to_plotly_json()
+
+def build_chart(kind, traces, **layout):
+    """
+    Builds a figure by patching data arrays into the skeleton of a chart kind, without validating them again.
+
+    Trace and layout entries are merged over the skeleton, one level deep (e.g. a trace's marker colors
+    keep the skeleton's marker line).
+
+    Parameters:
+        kind (str): Key of CHART_SKELETONS.
+        traces (list of dict): Data of each skeleton trace, in order, as plain lists.
+        **layout: Layout entries to set on top of the skeleton, e.g. title.
+
+    Returns:
+        plotly.graph_objs._figure.Figure: The figure.
+    """
+    skeleton = chart_skeleton(kind)
+
+    def merge(base, patch):
+        return {**base, **{key: {**base[key], **value} if isinstance(value, dict) and isinstance(base.get(key), dict) else value
+                           for key, value in patch.items()}}
+
+    data = [merge(style, trace) for style, trace in zip(skeleton['data'], traces)]
+    return go.Figure({'data': data, 'layout': merge(skeleton['layout'], layout)}, _validate=False)
+
+def figure_spec(fig):
+    """
+    Serializes a figure to a JSON spec, a compact immutable form in which it can be cached and shared across sessions.
+
+    Parameters:
+        fig (plotly.graph_objs._figure.Figure): The figure, or None.
+
+    Returns:
+        str: The JSON spec, or None if fig is None.
+    """
+    return None if fig is None else pio.to_json(fig, validate=False)
+
+def display_figure(spec, use_container_width=True):
     """
-    Creates a frequency plot data for player ratings from a dataset.
-    
+    Displays a figure serialized by figure_spec.
+
+    The figure is rebuilt from the cached spec, so building its traces and layout still happens once per cached result.
+
+    Parameters:
+        spec (str): JSON spec returned by figure_spec.
+        use_container_width (bool): Whether the chart takes the width of its container.
+    """
+    st.plotly_chart(pio.from_json(spec), use_container_width=use_container_width)
+
+def plot_ranking(data, bin_width=RATING_BIN_WIDTH):
+    """
+    Counts player ratings of a dataset in fixed-width bins, so the distribution's size does not grow with the data.
+
     Parameters:
         data (pd.DataFrame): Dataset containing 'white_rating' and 'black_rating' columns.
+        bin_width (int): Width of the rating bins.
+
+    Returns:
+        pd.DataFrame: 'Rating' (lower bound of each bin, every bin between the lowest and highest rating)
+        and 'Frequency' columns.
+    """
+    bins = np.concatenate([data['white_rating'].to_numpy(np.int64), data['black_rating'].to_numpy(np.int64)]) // bin_width
+    if not len(bins):
+        return pd.DataFrame({'Rating': np.empty(0, dtype=np.int64), 'Frequency': np.empty(0, dtype=np.int64)})
+    lowest = bins.min()
+    frequency = np.bincount(bins - lowest)
+    return pd.DataFrame({'Rating': (np.arange(len(frequency)) + lowest) * bin_width, 'Frequency': frequency})
+
+@instrumented
+def plot_rating_distribution(ratings, bin_width=RATING_BIN_WIDTH):
+    """
+    Plots the binned rating distribution returned by plot_ranking or rating_distribution.
+
+    Parameters:
+        ratings (pd.DataFrame): 'Rating' and 'Frequency' columns returned by plot_ranking or rating_distribution.
+        bin_width (int): Width of the rating bins.
+
+    Returns:
+        plotly.graph_objs._figure.Figure: Bar chart of the distribution, or None if there are no ratings.
+    """
+    if ratings.empty:
+        return None
+    centers = ratings['Rating'] + bin_width / 2
+    return build_chart('rating_distribution', [{'x': centers.tolist(), 'y': ratings['Frequency'].tolist(), 'width': bin_width}])
+
+@instrumented
+def plot_rating_gap(rates):
+    """
+    Plots win and draw rates against the rating difference between the players.
+
+    Parameters:
+        rates (pd.DataFrame): Rates returned by rating_gap_rates.
 
     Returns:
-        pd.DataFrame: Dataframe prepared for plotting, containing 'Rating' and 'Frequency'.
+        plotly.graph_objs._figure.Figure: Line chart of the rates, or None if no difference has enough games.
     """
-    combined_ratings = pd.concat([data['white_rating'], data['black_rating']])
-    rating_count = combined_ratings.value_counts().reset_index()
-    rating_count.columns = ['Rating', 'Frequency']
-    sorted_ratings = rating_count.sort_values(by='Rating').reset_index(drop=True)
-    return pd.DataFrame({"Rating": sorted_ratings['Rating'], "Frequency": sorted_ratings['Frequency']})
+    if rates.empty:
+        return None
+    gaps = rates['Rating Difference'].tolist()
+    return build_chart('rating_gap', [{'x': gaps, 'y': rates[column].round(1).tolist(), 'customdata': rates['Games'].tolist(),
+                                       'hovertemplate': '%{y}% of %{customdata} games'}
+                                      for column in ['White Wins %', 'Draws %', 'Black Wins %']])
 
-def plot_winning_rates(data):
+@instrumented
+def plot_winning_rates(stats, category):
     """
-    Generates a pie chart of winning rates for different players in a given dataset.
+    Generates a pie chart of winning rates for different players from per-opening statistics.
 
     Parameters:
-        data (pd.DataFrame): Dataset containing 'winner' and 'time_control_category'.
+        stats (pd.DataFrame): Per-opening statistics containing 'white', 'black' and 'draw' counts.
+        category (str): Time control category the statistics were filtered on.
 
     Returns:
-        plotly.graph_objs._figure.Figure: Pie chart of winning rates or None if data is empty.
+        plotly.graph_objs._figure.Figure: Pie chart of winning rates or None if stats is empty.
     """
-    if data.empty:
-        st.sidebar.write("No data available for the selected category.")
+    if stats.empty:
         return None
-    winner_counts = data['winner'].value_counts().reset_index()
-    winner_counts.columns = ['winner', 'counts']
-    category = data['time_control_category'].iloc[0] if not data.empty else "Selected Category"
-    fig = px.pie(winner_counts, values='counts', names='winner', title=f'Winning Rates in {category}',
-                color='winner', color_discrete_map={'white': '#E2E2E2', 'black': '#22223B', 'draw': '#2A9D8F'})
-    return fig
+    winner_counts = stats[['white', 'black', 'draw']].sum()
+    winner_counts = winner_counts[winner_counts > 0].sort_values(ascending=False)
+    winners = winner_counts.index.tolist()
+    trace = {'labels': winners, 'values': winner_counts.tolist(), 'marker': {'colors': [WINNER_COLORS[winner] for winner in winners]}}
+    return build_chart('winning_rates', [trace], title={'text': f'Winning Rates in {category}'})
 
-def plot_top_openings(data, sort_by='winning_rate'):
+@instrumented
+def plot_top_openings(stats, sort_by='winning_rate'):
     """
     Plots the top chess openings based on a specified sorting criteria.
 
     Parameters:
-        data (pd.DataFrame): Dataset containing 'opening_name' and 'winner'.
+        stats (pd.DataFrame): Per-opening statistics containing 'white' and 'black' win counts.
         sort_by (str): Sorting criterion, either 'winning_rate' or other valid DataFrame sorting keys.
 
     Returns:
         plotly.graph_objs._figure.Figure: Bar chart of the top 5 openings by winning rate.
     """
-    openings_count = data.groupby(['opening_name', 'winner']).size().unstack(fill_value=0).reset_index()
-    title = 'Top 5 Openings by Winning Rate'
+    openings_count = stats[['white', 'black']].reset_index()
     if sort_by == 'winning_rate':
         openings_count = openings_count.nlargest(5, ['white', 'black'])
-    fig = px.bar(openings_count, y='opening_name', x=['white', 'black'], title=title, labels={'value': 'Number of Wins', 'variable': 'Winner'}, color_discrete_sequence=['#E2E2E2', '#22223B'], barmode='group', height=400, orientation='h')
-    fig.update_traces(marker_line_width=0.5)
-    return fig
+    names = openings_count['opening_name'].astype(str).tolist()
+    return build_chart('top_openings', [{'x': openings_count[winner].tolist(), 'y': names} for winner in ['white', 'black']])
 
-def plot_most_played_openings(data):
+@instrumented
+def plot_most_played_openings(stats):
     """
     Identifies and visualizes the top 5 most played chess openings.
 
     Parameters:
-        data (pd.DataFrame): Dataset containing 'opening_name'.
+        stats (pd.DataFrame): Per-opening statistics containing 'games'.
 
     Returns:
         tuple: Contains a Plotly figure of the bar chart and the dataframe of the top openings.
     """
-    openings_count = data['opening_name'].value_counts().reset_index()
+    openings_count = stats['games'].nlargest(5).reset_index()
     openings_count.columns = ['Opening Name', 'Number of Games Played']
-    openings_count = openings_count.nlargest(5, 'Number of Games Played')
-    custom_colors = ['#FFBE0B', '#FB5607', '#FF006E', '#8338EC', '#3A86FF']
-    openings_count['color'] = custom_colors[:len(openings_count)]
-    fig = px.bar(openings_count, x='Opening Name', y='Number of Games Played', title='Top 5 Most Played Openings', height=550, orientation='v', color='color', color_discrete_map={color: color for color in custom_colors})
-    fig.update_traces(textposition='outside')
-    fig.update_layout(showlegend=False, xaxis_title="", yaxis_title="Number of Games Played")
-    return fig, openings_count
+    openings_count['color'] = MOST_PLAYED_COLORS[:len(openings_count)]
+    trace = {'x': openings_count['Opening Name'].astype(str).tolist(), 'y': openings_count['Number of Games Played'].tolist(),
+             'marker': {'color': openings_count['color'].tolist()}}
+    return build_chart('most_played', [trace]), openings_count
+
+
+@instrumented
+def plot_game_phases(features, openings):
+    """
+    Plots the average number of plies spent in the opening, middlegame and endgame for a set of openings.
+
+    Parameters:
+        features (pd.DataFrame): Move features of the filtered games, with an 'opening_name' column.
+        openings (list): Openings to compare.
+
+    Returns:
+        plotly.graph_objs._figure.Figure: Stacked bar chart of the phase lengths, or None if no game matches.
+    """
+    features = features[features['opening_name'].isin(openings)]
+    if features.empty:
+        return None
+    phases = features.groupby('opening_name', observed=True)[['opening_plies', 'middlegame_plies', 'endgame_plies']].mean().reset_index()
+    phases.columns = ['Opening Name', 'Opening', 'Middlegame', 'Endgame']
+    names = phases['Opening Name'].astype(str).tolist()
+    return build_chart('game_phases', [{'x': names, 'y': phases[phase].round(2).tolist()} for phase in ['Opening', 'Middlegame', 'Endgame']])
 
+@instrumented
+def plot_castling_timing(features):
+    """
+    Plots when each side castles, as a histogram of the castling move number.
+
+    Moves are counted server-side, one bar per move number, so the figure carries CASTLING_MAX_MOVE
+    counts per side whatever the number of games; later castles are counted in the last bar.
+
+    Parameters:
+        features (pd.DataFrame): Move features of the filtered games.
+
+    Returns:
+        plotly.graph_objs._figure.Figure: Histogram of the castling moves, or None if nobody castled.
+    """
+    counts = {}
+    for side in ['white', 'black']:
+        moves = features[f'{side}_castle_move'].to_numpy(np.int64)
+        moves = np.minimum(moves[moves > 0], CASTLING_MAX_MOVE)
+        counts[side] = np.bincount(moves, minlength=CASTLING_MAX_MOVE + 1)[1:]
+    if not any(count.any() for count in counts.values()):
+        return None
+    move_numbers = list(range(1, CASTLING_MAX_MOVE + 1))
+    return build_chart('castling', [{'x': move_numbers, 'y': counts[side].tolist()} for side in ['white', 'black']])
+
+def time_control_shares(table, selected_opening):
+    """
+    Computes the share of each time control category among the games of an opening.
+
+    Parameters:
+        table (pd.DataFrame): The opening table.
+        selected_opening (str): The chess opening to analyze.
+
+    Returns:
+        pd.DataFrame: 'Time Control Category' and 'Percentage' columns, empty if the opening has no games.
+    """
+    row = opening_row(table, 'opening', selected_opening)
+    counts = category_games(row) if row is not None else pd.Series(dtype=np.int64)
+    counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+    category_percentage = counts / counts.sum() * 100
+    return pd.DataFrame({'Time Control Category': category_percentage.index, 'Percentage': category_percentage.values})
 
-def plot_time_control_cat(game_data, selected_opening):
+@instrumented
+def plot_time_control_cat(df_category_percentage, selected_opening):
     """
     Plots the distribution of time control categories for a selected opening as a pie chart.
 
     Parameters:
-        game_data (pd.DataFrame): DataFrame containing all game data.
+        df_category_percentage (pd.DataFrame): Shares returned by time_control_shares.
         selected_opening (str): The chess opening to analyze.
 
     Effects:
         Renders a pie chart in Streamlit or displays a message if no data is available.
     """
-    opening_data = game_data[game_data['opening_name'] == selected_opening]
-    if not opening_data.empty:
-        category_percentage = opening_data['time_control_category'].value_counts(normalize=True) * 100
-        df_category_percentage = pd.DataFrame({'Time Control Category': category_percentage.index, 'Percentage': category_percentage.values})
-        custom_colors = ['#FFAFCC', '#BDE0FE', '#84A98C', '#FDFCDC']
-        fig = px.pie(df_category_percentage, names='Time Control Category', values='Percentage', color='Time Control Category', color_discrete_sequence=custom_colors, labels={'Time Control Category': 'Category', 'Percentage': 'Percentage'})
-        fig.update_layout(width=700, height=400, legend=dict(title="Categories", x=0.1, xanchor="center", yanchor="top", orientation="v"))
-        st.plotly_chart(fig)
+    if not df_category_percentage.empty:
+        categories = df_category_percentage['Time Control Category'].astype(str).tolist()
+        trace = {'labels': categories, 'values': df_category_percentage['Percentage'].tolist(),
+                 'marker': {'colors': TIME_CONTROL_COLORS[:len(categories)]}, 'hovertemplate': 'Category=%{label}<br>Percentage=%{value}<extra></extra>'}
+        # The unvalidated figure goes to Streamlit as is: a pie is cheaper to build than to round-trip through a JSON spec
+        st.plotly_chart(build_chart('share_pie', [trace]), use_container_width=False)
     else:
         st.write(f"No data available for the opening: {selected_opening}")
 
-def plot_winners_cat(include_draws, game_data, selected_opening):
+def winner_shares(table, selected_opening, include_draws):
+    """
+    Computes the share of each winner among the games of an opening, optionally excluding draws.
+
+    Parameters:
+        table (pd.DataFrame): The opening table.
+        selected_opening (str): The chess opening to analyze.
+        include_draws (bool): Whether to count draws.
+
+    Returns:
+        pd.DataFrame: 'Winner' and 'Percentage' columns, or None if the opening has no games.
+    """
+    row = opening_row(table, 'opening', selected_opening)
+    if row is None:
+        return None
+    counts = row[['white', 'black', 'draw'] if include_draws else ['white', 'black']].astype(np.int64)
+    counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+    winner_percentage = counts / counts.sum() * 100
+    return pd.DataFrame({'Winner': winner_percentage.index, 'Percentage': winner_percentage.values})
+
+@instrumented
+def plot_winners_cat(include_draws, df_winner_percentage, selected_opening):
     """
     Plots a pie chart of the winners distribution for a selected opening, optionally excluding draws.
 
     Parameters:
-        include_draws (bool): Whether to include draws in the plot.
-        game_data (pd.DataFrame): DataFrame containing all game data.
+        include_draws (bool): Whether draws are included in the plot.
+        df_winner_percentage (pd.DataFrame): Shares returned by winner_shares.
         selected_opening (str): The chess opening to analyze.
 
     Effects:
         Renders a pie chart in Streamlit or displays a message if no relevant data is available.
     """
-    opening_data = game_data[game_data['opening_name'] == selected_opening]
-    if not opening_data.empty:
-        if not include_draws:
-            opening_data = opening_data[opening_data['winner'] != 'draw']
-        if not opening_data.empty:
-            winner_percentage = opening_data['winner'].value_counts(normalize=True) * 100
-            df_winner_percentage = pd.DataFrame({'Winner': winner_percentage.index, 'Percentage': winner_percentage.values})
-            color_map = {'white': '#E2E2E2', 'black': '#22223B', 'draw': '#2A9D8F'}
-            if not include_draws:
-                color_map.pop('draw', None)
-            fig = px.pie(df_winner_percentage, names='Winner', values='Percentage', color='Winner', color_discrete_map=color_map)
-            fig.update_layout(width=700, height=400, legend=dict(title="Categories", x=0.1, xanchor="center", yanchor="top", orientation="v"))
-            st.plotly_chart(fig)
+    if df_winner_percentage is not None:
+        if not df_winner_percentage.empty:
+            winners = df_winner_percentage['Winner'].astype(str).tolist()
+            trace = {'labels': winners, 'values': df_winner_percentage['Percentage'].tolist(),
+                     'marker': {'colors': [WINNER_COLORS[winner] for winner in winners]}}
+            st.plotly_chart(build_chart('share_pie', [trace]), use_container_width=False)
         else:
             st.write(f"No relevant data available for the opening: {selected_opening}")
     else:
         st.write(f"No data available for the opening: {selected_opening}")
         
         
+@shared_result
+def statistics_figures(_stats, version, category, rated, increment, rating):
+    """
+    Builds the figures of the statistics tab for a combination of sidebar filters, sharing their JSON specs across sessions.
+
+    Parameters:
+        _stats (pd.DataFrame): Per-opening statistics of the filtered games, not empty.
+        version (str): Version of the dataset the statistics come from.
+        category (str): Time control category of the filters.
+        rated (bool): Rated flag of the filters, or None.
+        increment (int): Time increment of the filters, or None.
+        rating (tuple): Rating range of the filters, or None.
+
+    Returns:
+        dict: The 'most_played', 'top_openings', 'duration' and 'winning_rates' specs (see figure_spec),
+        and the 'most_played_openings' dataframe.
+    """
+    most_played_fig, most_played = plot_most_played_openings(_stats)
+    return {
+        'most_played': figure_spec(most_played_fig),
+        'most_played_openings': most_played,
+        'top_openings': figure_spec(plot_top_openings(_stats)),
+        'duration': figure_spec(plot_opening_vs_game_duration(_stats, most_played)),
+        'winning_rates': figure_spec(plot_winning_rates(_stats, category))
+    }
+
+@shared_result
+def game_figures(_data, version, category, rated, increment, rating, openings):
+    """
+    Builds the game-level figures of the statistics tab for a combination of sidebar filters, sharing their JSON
+    specs across sessions.
+
+    Parameters:
+        _data (pd.DataFrame): Game data loaded with load_data.
+        version (str): Dataset version the figures are cached under.
+        category (str): Time control category to keep.
+        rated (bool): Rated flag to keep, or None.
+        increment (int): Time increment to keep, or None.
+        rating (tuple): Rating range to keep, or None.
+        openings (tuple of str): Openings compared in the phase chart.
+
+    Returns:
+        dict: The 'phases' and 'castling' specs (see figure_spec), either of which may be None.
+    """
+    features = filter_move_features(_data, category, rated, increment, rating)
+    return {
+        'phases': figure_spec(plot_game_phases(features, list(openings))),
+        'castling': figure_spec(plot_castling_timing(features))
+    }
+
+@shared_result
+def rating_figures(_histograms, version, category, rated, increment, rating):
+    """
+    Builds the rating figures of the statistics tab from rating histograms, sharing their JSON specs across sessions.
+
+    Parameters:
+        _histograms (dict): Rating histograms of the games with the selected time increment, see get_rating_histograms.
+        version (str): Dataset version the figures are cached under.
+        category (str): Time control category to keep.
+        rated (bool): Rated flag to keep, or None.
+        increment (int): Time increment the histograms were built for, or None.
+        rating (tuple): Rating range to keep, or None.
+
+    Returns:
+        dict: The 'ratings' and 'rating_gap' specs (see figure_spec), either of which may be None.
+    """
+    return {
+        'ratings': figure_spec(plot_rating_distribution(rating_distribution(_histograms, category, rated, rating))),
+        'rating_gap': figure_spec(plot_rating_gap(rating_gap_rates(_histograms, category, rated, rating)))
+    }
+
+
 ######################################################################################################
 ##################################         OTHERS              ########################################
 
-def display_opening_details(data, opening_name):
+def opening_details(table, opening_name):
     """
-    Displays detailed information about a specific chess opening in a Streamlit dataframe.
+    Summarizes a specific chess opening in a one-row table.
 
     Parameters:
-        data (pd.DataFrame): The dataset containing 'opening_name' and other related columns.
+        table (pd.DataFrame): The opening table.
         opening_name (str): The specific opening to detail.
+
+    Returns:
+        pd.DataFrame: ECO code, opening ply, number of games, most frequent winner and time control category.
     """
-    opening_data = data[data['opening_name'] == opening_name]
-    most_winning_color = opening_data['winner'].mode().iloc[0] if not opening_data.empty else 'N/A'
-    most_played_time_category = opening_data['time_control_category'].mode().iloc[0] if not opening_data.empty else 'N/A'
-    games_count = len(opening_data)
+    row = opening_row(table, 'opening', opening_name)
     details = {
-        "Opening PLY": [opening_data['opening_ply'].iloc[0] if 'opening_ply' in opening_data.columns and not opening_data.empty else 'N/A'],
-        "Game Number": [games_count],
-        "Most Winner Color": [most_winning_color],
-        "Most Played Time category": [most_played_time_category]
+        "ECO": [row['opening_eco'] if row is not None else 'N/A'],
+        "Opening PLY": [row['opening_ply'] if row is not None else 'N/A'],
+        "Game Number": [row['games'] if row is not None else 0],
+        "Most Winner Color": [row['most_winner'] if row is not None else 'N/A'],
+        "Most Played Time category": [row['most_played_category'] if row is not None else 'N/A']
     }
-    st.dataframe(pd.DataFrame(details), hide_index=True)
+    return pd.DataFrame(details)
+
+def opening_rollups(table, opening_name):
+    """
+    Lays out the statistics of an opening next to those of the levels it rolls up into.
+
+    Parameters:
+        table (pd.DataFrame): The opening table.
+        opening_name (str): The specific opening to detail.
+
+    Returns:
+        pd.DataFrame: One row per level (opening, family, ECO code, ECO volume), or None if the opening is not in the table.
+    """
+    row = opening_row(table, 'opening', opening_name)
+    if row is None:
+        return None
+    eco = opening_row(table, 'eco', row['opening_eco'])
+    keys = [('opening', opening_name), ('family', row['parent']), ('eco', row['opening_eco']), ('volume', eco['parent'] if eco is not None else None)]
+    rows = table.loc[[key for key in keys if key in table.index]]
+    return pd.DataFrame({
+        'Level': rows.index.get_level_values('level').map(OPENING_LEVEL_LABELS),
+        'Name': rows.index.get_level_values('key'),
+        'Games': rows['games'].to_numpy(),
+        'White Wins %': 100 * rows['white_rate'].to_numpy(),
+        'Draws %': 100 * rows['draw_rate'].to_numpy(),
+        'Black Wins %': 100 * rows['black_rate'].to_numpy(),
+        'Avg White Rating': rows['average_white_rating'].to_numpy(),
+        'Avg Black Rating': rows['average_black_rating'].to_numpy(),
+        'Avg Duration (s)': rows['average_duration'].to_numpy()
+    })
+
+@instrumented
+def display_opening_details(details):
+    """
+    Displays detailed information about a specific chess opening in a Streamlit dataframe.
+
+    Parameters:
+        details (pd.DataFrame): Summary returned by opening_details.
+    """
+    st.dataframe(details, hide_index=True)
+
+@instrumented
+def display_opening_rollups(rollups):
+    """
+    Displays the statistics of an opening and of the levels it rolls up into.
+
+    Parameters:
+        rollups (pd.DataFrame): Rows returned by opening_rollups, or None.
+    """
+    if rollups is None:
+        return
+    st.dataframe(rollups, hide_index=True, column_config={
+        column: st.column_config.NumberColumn(format='%.1f') for column in rollups.columns if column not in ('Level', 'Name', 'Games')
+    })
+
+BOARD_SIZE = 350
+LAST_MOVE_ARROW_COLOR = '#D00000'
+PREWARM_OPENINGS = 20
+PREWARM_PLIES = 12
+
+def last_move_arrows(last_move):
+    """
+    Builds the arrow highlighting the last move played on the board.
+
+    Parameters:
+        last_move (chess.Move): The last move executed, or None.
+
+    Returns:
+        list of chess.svg.Arrow: The arrow for the move, or an empty list if there is none.
+    """
+    if last_move is None:
+        return []
+    return [chess.svg.Arrow(last_move.from_square, last_move.to_square, color=LAST_MOVE_ARROW_COLOR)]
 
-def display_chess_board(board, arrows=None):
+@instrumented
+def display_chess_board(board, arrows=None, size=BOARD_SIZE):
     """
     Generates and returns an SVG string representing a chess board with optional arrows.
 
+    Renders are shared across sessions through render_board_svg, keyed by position, arrows and size.
+
     Parameters:
         board (chess.Board): The chess board object.
         arrows (list of chess.svg.Arrow, optional): Arrows indicating moves or other highlights.
+        size (int): Size of the board image, in pixels.
+
+    Returns:
+        str: An SVG string of the chess board.
+    """
+    arrows = tuple((arrow.tail, arrow.head, arrow.color) for arrow in arrows or [])
+    return render_board_svg(board.fen(), arrows, size)
+
+@shared_result
+def render_board_svg(fen, arrows, size):
+    """
+    Renders a position as an SVG string.
+
+    Parameters:
+        fen (str): The position.
+        arrows (tuple): (tail, head, color) of every arrow to draw.
+        size (int): Size of the board image, in pixels.
 
     Returns:
         str: An SVG string of the chess board.
     """
-    return chess.svg.board(board=board, size=350, arrows=arrows)
+    return chess.svg.board(board=chess.Board(fen), size=size, arrows=[chess.svg.Arrow(tail, head, color=color) for tail, head, color in arrows])
+
+def svg_cache_stats():
+    """
+    Reports the usage of the shared board renders.
+
+    Returns:
+        dict: Number of cached renders, hits, misses and hit ratio.
+    """
+    results = get_result_cache()
+    with results['lock']:
+        entries = sum(1 for key in results['cache'] if key[0] == 'render_board_svg')
+        counts = results['stats'].get('render_board_svg', {'hits': 0, 'misses': 0})
+        hits, misses = counts['hits'], counts['misses']
+    return {'entries': entries, 'hits': hits, 'misses': misses, 'hit_ratio': hits / (hits + misses) if hits + misses else 0.0}
+
+@st.cache_resource(show_spinner=False)
+def prewarm_board_svgs(_data, version, openings=PREWARM_OPENINGS, plies=PREWARM_PLIES):
+    """
+    Renders the starting position and the first plies of the most played openings into the shared result cache.
+
+    The plies rendered are the ones shown in the board tab, i.e. those of the move list returned by
+    get_move_list, with the last move arrow. Runs once per dataset version.
+
+    Parameters:
+        _data (pd.DataFrame): Game data.
+        version (str): Dataset version the prewarm is cached under.
+        openings (int): Number of most played openings to prewarm.
+        plies (int): Number of plies to prewarm for each opening.
+
+    Returns:
+        int: Number of positions rendered.
+    """
+    rendered = 1
+    display_chess_board(chess.Board())
+    for opening in _data['opening_name'].value_counts().head(openings).index:
+        rendered += render_opening_plies(get_move_list(get_opening_games(_data, opening)), plies)
+    return rendered
+
+def render_opening_plies(moves, plies):
+    """
+    Renders the first plies of a move list into the shared result cache, as the board tab shows them.
+
+    Parameters:
+        moves (list of str): Moves in standard algebraic notation.
+        plies (int): Number of plies to render.
+
+    Returns:
+        int: Number of positions rendered.
+    """
+    count = min(plies, len(moves))
+    for index in range(count):
+        board, last_move = update_chess_board(moves, index)
+        display_chess_board(board, arrows=last_move_arrows(last_move))
+    return count
+
+@shared_result
+def build_position_timeline(moves):
+    """
+    Replays a move list once and records every position along the way.
+
+    Parameters:
+        moves (tuple of str): Moves in standard algebraic notation.
+
+    Returns:
+        dict: 'fens' holds the FEN before the first move and after every move, 'moves' the moves in UCI
+        notation. Replay stops at the first illegal move.
+    """
+    board = chess.Board()
+    fens = [board.fen()]
+    uci_moves = []
+    for san in moves:
+        try:
+            move = board.push_san(san)
+        except ValueError:
+            break
+        fens.append(board.fen())
+        uci_moves.append(move.uci())
+    return {'fens': tuple(fens), 'moves': tuple(uci_moves)}
 
+@instrumented
 def update_chess_board(moves, current_move_index):
     """
     Updates the chess board to a specified move index.
 
+    The move list is parsed once into a position timeline, so jumping to any ply costs the same
+    regardless of how far into the game it is.
+
     Parameters:
         moves (list of str): List of moves in standard algebraic notation.
         current_move_index (int): Index of the last move to execute on the board.
@@ -194,55 +3159,112 @@ def update_chess_board(moves, current_move_index):
     Returns:
         tuple: Returns a tuple containing the updated board and the last move executed.
     """
-    board = chess.Board()
-    last_move = None
-    for move in moves[:current_move_index + 1]:
-        last_move = board.push_san(move)
+    timeline = build_position_timeline(tuple(moves))
+    ply = max(0, min(current_move_index + 1, len(timeline['moves'])))
+    board = chess.Board(timeline['fens'][ply])
+    last_move = chess.Move.from_uci(timeline['moves'][ply - 1]) if ply > 0 else None
     return board, last_move
 
 
-def display_moves_list(op_data, selected_opening, game_data):
+def opening_move_pairs(table, selected_opening):
+    """
+    Lays out the moves of a selected opening as (White, Black) pairs, one row per turn.
+
+    The moves are the opening line played most often, up to the opening ply.
+
+    Parameters:
+        table (pd.DataFrame): The opening table.
+        selected_opening (str): The chess opening whose moves to lay out.
+
+    Returns:
+        pd.DataFrame: 'Turn', 'White Move' and 'Black Move' columns, or None if no data is available.
+    """
+    row = opening_row(table, 'opening', selected_opening)
+    if row is None:
+        return None
+    moves_limited = row['opening_moves'].split()
+    move_pairs = [(moves_limited[i], moves_limited[i+1] if i+1 < len(moves_limited) else '') for i in range(0, len(moves_limited), 2)]
+    df_moves = pd.DataFrame(move_pairs, columns=['White Move', 'Black Move'])
+    df_moves.index += 1
+    df_moves.reset_index(inplace=True)
+    df_moves.rename(columns={'index': 'Turn'}, inplace=True)
+    return df_moves
+
+@instrumented
+def display_moves_list(df_moves):
     """
     Displays a list of chess moves for a selected opening in a DataFrame format.
 
     Parameters:
-        op_data (pd.DataFrame): DataFrame containing opening moves data.
-        selected_opening (str): The chess opening whose moves to display.
-        game_data (pd.DataFrame): DataFrame containing detailed game data.
+        df_moves (pd.DataFrame): Move pairs returned by opening_move_pairs, or None.
     """
-    try:
-        moves_str = op_data.loc[op_data['opening_name'] == selected_opening, 'moves'].iloc[0]
-        opening_ply = game_data.loc[game_data['opening_name'] == selected_opening, 'opening_ply'].iloc[0]
-        moves = moves_str.split()
-        moves_limited = moves[:opening_ply]
-        move_pairs = [(moves_limited[i], moves_limited[i+1] if i+1 < len(moves_limited) else '') for i in range(0, len(moves_limited), 2)]
-        df_moves = pd.DataFrame(move_pairs, columns=['White Move', 'Black Move'])
-        df_moves.index += 1
-        df_moves.reset_index(inplace=True)
-        df_moves.rename(columns={'index': 'Turn'}, inplace=True)
-        num_rows = len(df_moves)
-        height = 150 if num_rows > 2 else num_rows * 50
-        st.dataframe(df_moves, height=height, hide_index=True)
-    except IndexError:
+    if df_moves is None:
         st.write("No moves data available for the selected opening.")
+        return
+    num_rows = len(df_moves)
+    height = 150 if num_rows > 2 else num_rows * 50
+    st.dataframe(df_moves, height=height, hide_index=True)
+
+def display_continuations(trie, moves):
+    """
+    Displays the continuations played from the current position and their results in a Streamlit dataframe.
+
+    Parameters:
+        trie (dict): Tree built by build_opening_trie.
+        moves (list of str): Moves played to reach the current position.
+    """
+    if len(moves) >= TRIE_MAX_PLIES:
+        st.write(f"Continuations are only indexed for the first {TRIE_MAX_PLIES} plies.")
+        return
+    stats = continuation_stats(trie, moves)
+    if stats is None or stats.empty:
+        st.write("No recorded continuations from this position.")
+        return
+    st.dataframe(stats.round(1), height=200, hide_index=True)
 
-def get_move_list(op_data, selected_opening):
+def display_transpositions(data, position_index, board, limit=TRANSPOSITION_ROWS):
     """
-    Retrieves a list of moves for a selected opening.
+    Displays the games that passed through the current position in a Streamlit dataframe.
+
+    Early positions are reached by most of the dataset, so only the first `limit` games are fetched
+    and shown, under the total count.
+
+    Parameters:
+        data (pd.DataFrame): Game data the index was built for.
+        position_index (np.ndarray): Index entries returned by get_position_index, or None.
+        board (chess.Board): The current position.
+        limit (int): Maximum number of games shown.
+    """
+    if position_index is None:
+        st.write("Position index not built. Run position_index.py to enable this view.")
+        return
+    rows, plies = games_through_position(position_index, board)
+    if len(rows) == 0:
+        st.write("No game reached this exact position.")
+        return
+    games = data.iloc[rows[:limit]][['id', 'opening_name', 'winner']].reset_index(drop=True)
+    games.insert(1, 'Ply', plies[:limit])
+    games.columns = ['ID', 'Ply', 'Opening', 'Winner']
+    if len(rows) > limit:
+        st.write(f"{len(rows)} games reached this exact position; the first {limit} are shown.")
+    else:
+        st.write(f"{len(rows)} games reached this exact position.")
+    st.dataframe(games, height=200, hide_index=True)
+
+@instrumented
+def get_move_list(games):
+    """
+    Retrieves the list of moves shown on the board for an opening, those of its first game.
 
     Parameters:
-        op_data (pd.DataFrame): DataFrame containing opening moves data.
-        selected_opening (str): The chess opening whose moves to retrieve.
+        games (pd.DataFrame): Games of the opening, e.g. returned by get_opening_games, in their original order.
 
     Returns:
         list of str: A list of moves, or an empty list if no data is available.
     """
-    try:
-        moves_str = op_data.loc[op_data['opening_name'] == selected_opening, 'moves'].iloc[0]
-        moves = moves_str.split()
-        return moves
-    except IndexError:
+    if games.empty:
         return []
+    return decode_moves(games.iloc[:1]).iloc[0].split()
 
 def handle_checkbox(row):
     """
@@ -254,23 +3276,22 @@ def handle_checkbox(row):
     if row['Select']:
         st.write("Selected:", row['rated'], row['turns'], row['white_rating'], row['black_rating'], row['winner'], row['victory_status'])
         
-def plot_opening_vs_game_duration(data, top_most_played):
+@instrumented
+def plot_opening_vs_game_duration(stats, top_most_played):
     """
     Plots a scatter plot comparing the average game duration of the top 10 chess openings against their name.
 
     Parameters:
-        data (pd.DataFrame): DataFrame containing chess game data.
+        stats (pd.DataFrame): Per-opening statistics containing 'games' and 'duration_sum'.
         top_most_played (pd.DataFrame): DataFrame containing the top 5 most played openings.
 
     Returns:
         plotly.graph_objs._figure.Figure: A Plotly figure object that can be used in Streamlit.
     """
-    
-    data['total_duration'] = data['initial_time'] + data['turns'] * data['increment']
-    grouped_data = data.groupby('opening_name').agg(average_duration=pd.NamedAgg(column='total_duration', aggfunc='mean'), count=pd.NamedAgg(column='total_duration', aggfunc='count')).reset_index()
+    grouped_data = pd.DataFrame({'average_duration': stats['duration_sum'] / stats['games'], 'count': stats['games']}).reset_index()
     top_openings = grouped_data.sort_values(by='count', ascending=False).head(10)
     top_openings = top_openings.merge(top_most_played[['Opening Name', 'color']], how='left', left_on='opening_name', right_on='Opening Name')
     default_color = '#cccccc'
-    fig = go.Figure(data=[go.Scatter(x=top_openings['opening_name'], y=top_openings['average_duration'], mode='markers', marker=dict(size=10, color=top_openings['color'].fillna(default_color), line=dict(width=0.5, color='white')))])
-    fig.update_layout(title='Top 10 Chess Openings in Game Duration', xaxis_title='Opening Name', yaxis_title='Average Game Duration (Seconds)', xaxis_tickangle=-45)
-    return fig
+    trace = {'x': top_openings['opening_name'].astype(str).tolist(), 'y': top_openings['average_duration'].round(1).tolist(),
+             'marker': {'color': top_openings['color'].fillna(default_color).tolist()}}
+    return build_chart('duration', [trace])